@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地中英文游戏名对照表
+在调用LLM之前查询，命中时无需联网即可得到游戏的官方英文名
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+
+from normalize import match_key, pinyin_key
+
+logger = logging.getLogger(__name__)
+
+# 已加载的对照表缓存，按文件路径存放
+_TABLES = {}
+_TABLES_LOCK = threading.Lock()
+
+
+class AliasTable:
+    """
+    中文名到英文名的对照表
+    支持精确匹配、繁简/全半角规范化匹配和拼音匹配
+    """
+
+    def __init__(self, path=None, use_pinyin=True):
+        self.path = path
+        self.use_pinyin = use_pinyin
+        self.entries = {}
+        self._by_key = {}
+        self._by_pinyin = {}
+        self._lock = threading.Lock()
+        self._mtime = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, chinese_name, english_name):
+        """
+        添加或更新一条对照记录
+
+        参数:
+            chinese_name (str): 中文游戏名
+            english_name (str): 官方英文名
+
+        返回:
+            bool: 记录是否有变化
+        """
+        chinese_name = (chinese_name or '').strip()
+        english_name = (english_name or '').strip()
+        if not chinese_name or not english_name:
+            return False
+        with self._lock:
+            if self.entries.get(chinese_name) == english_name:
+                return False
+            self.entries[chinese_name] = english_name
+            self._index(chinese_name, english_name)
+        return True
+
+    def _index(self, chinese_name, english_name):
+        key = match_key(chinese_name)
+        if key:
+            self._by_key[key] = english_name
+        if self.use_pinyin:
+            pkey = pinyin_key(chinese_name)
+            if pkey:
+                self._by_pinyin[pkey] = english_name
+
+    def lookup(self, game_name):
+        """
+        查找游戏英文名，依次尝试精确匹配、规范化匹配和拼音匹配
+
+        参数:
+            game_name (str): 中文游戏名
+
+        返回:
+            str: 英文名，未找到时返回None
+        """
+        if not game_name:
+            return None
+        name = game_name.strip()
+        if name in self.entries:
+            return self.entries[name]
+        english_name = self._by_key.get(match_key(name))
+        if english_name:
+            return english_name
+        if self.use_pinyin:
+            pkey = pinyin_key(name)
+            if pkey:
+                return self._by_pinyin.get(pkey)
+        return None
+
+    def load(self, path=None):
+        """
+        从JSON或CSV文件加载对照记录
+
+        JSON格式可以是 {"中文名": "英文名"}，也可以是包含
+        chinese_name/english_name 字段的对象列表；
+        CSV格式为两列：中文名,英文名（可带表头）
+
+        参数:
+            path (str, optional): 文件路径，默认为对照表自身路径
+
+        返回:
+            int: 加载的记录数
+        """
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return 0
+
+        count = 0
+        if path.lower().endswith('.csv'):
+            with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+                for row in csv.reader(f):
+                    if len(row) < 2 or row[0].strip() == 'chinese_name':
+                        continue
+                    count += self.add(row[0], row[1])
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                items = data.items()
+            else:
+                items = ((item.get('chinese_name'), item.get('english_name'))
+                         for item in data if isinstance(item, dict))
+            for chinese_name, english_name in items:
+                count += self.add(chinese_name, english_name)
+
+        if path == self.path:
+            self._mtime = os.path.getmtime(path)
+        return count
+
+    def save(self, path=None):
+        """
+        将对照表保存为JSON文件
+
+        参数:
+            path (str, optional): 文件路径，默认为对照表自身路径
+        """
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            data = dict(sorted(self.entries.items()))
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        self._mtime = os.path.getmtime(path)
+
+    def is_stale(self):
+        """
+        判断对照表文件是否在加载后被修改
+        """
+        if not self.path or not os.path.exists(self.path):
+            return False
+        return os.path.getmtime(self.path) != self._mtime
+
+
+def get_alias_table(config=None):
+    """
+    获取配置中指定的对照表（带缓存，文件变化时自动重新加载）
+
+    参数:
+        config (dict, optional): 配置字典，为None时加载默认配置
+
+    返回:
+        AliasTable: 对照表对象，未启用时返回None
+    """
+    if config is None:
+        from config import load_config
+        config = load_config()
+
+    alias_config = config.get("aliases", {})
+    if not alias_config.get("enabled", True):
+        return None
+
+    path = alias_config.get("path", "aliases.json")
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+
+    with _TABLES_LOCK:
+        table = _TABLES.get(path)
+        if table is None or table.is_stale():
+            table = AliasTable(path, use_pinyin=alias_config.get("pinyin", True))
+            table.load()
+            _TABLES[path] = table
+    return table
+
+
+def learn_alias(chinese_name, english_name, config=None):
+    """
+    将确认过的查询结果写入对照表，使下次查询无需调用LLM
+
+    参数:
+        chinese_name (str): 中文游戏名
+        english_name (str): IGN返回的官方英文名
+        config (dict, optional): 配置字典
+
+    返回:
+        bool: 是否写入了新记录
+    """
+    if config is None:
+        from config import load_config
+        config = load_config()
+
+    if not config.get("aliases", {}).get("auto_learn", True):
+        return False
+
+    table = get_alias_table(config)
+    if table is None or not table.add(chinese_name, english_name):
+        return False
+
+    try:
+        table.save()
+    except OSError as e:
+        logger.warning("保存游戏名对照表时出错: %s", e)
+        return False
+    return True
+
+
+def import_results(table, results_path):
+    """
+    从之前的JSON/JSONL查询结果中导入对照记录
+
+    参数:
+        table (AliasTable): 对照表
+        results_path (str): 结果文件路径
+
+    返回:
+        int: 新增或更新的记录数
+    """
+    count = 0
+    with open(results_path, 'r', encoding='utf-8') as f:
+        text = f.read().strip()
+    if not text:
+        return 0
+
+    if text.startswith('['):
+        records = json.loads(text)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    for record in records:
+        english_name = record.get('english_name')
+        if english_name and english_name != "未知":
+            count += table.add(record.get('chinese_name'), english_name)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='管理本地中英文游戏名对照表')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    lookup_parser = subparsers.add_parser('lookup', help='查询游戏英文名')
+    lookup_parser.add_argument('game_name', help='中文游戏名')
+
+    import_parser = subparsers.add_parser('import',
+                                          help='从CSV/JSON对照表或查询结果导入')
+    import_parser.add_argument('path', help='文件路径')
+    import_parser.add_argument('--results',
+                               action='store_true',
+                               help='文件为game_record输出的JSON/JSONL结果')
+
+    args = parser.parse_args()
+    table = get_alias_table()
+    if table is None:
+        print("游戏名对照表未启用")
+        sys.exit(1)
+
+    if args.command == 'lookup':
+        english_name = table.lookup(args.game_name)
+        if not english_name:
+            print(f"对照表中未找到游戏 '{args.game_name}'")
+            sys.exit(1)
+        print(english_name)
+    else:
+        if args.results:
+            count = import_results(table, args.path)
+        else:
+            count = table.load(args.path)
+        table.save()
+        print(f"已导入 {count} 条记录，对照表共 {len(table)} 条")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,695 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量查询工具
+run: 从文本文件（每行一个中文游戏名）批量查询，结果输出为JSONL
+refresh: 读取之前的JSONL结果，只重新查询过期或信息不完整的记录，并输出差异
+
+输入逐行读取、结果逐条写出，同时进行的查询数不超过窗口大小，
+内存占用与输入文件的大小无关
+"""
+
+import argparse
+import collections
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from config import load_config
+from metrics import incr, snapshot, write_metrics
+from normalize import canonical_title, normalize_details, title_key
+from sources import fetch_details
+from log import setup_logging
+from replay import install as install_replay
+from store import open_store
+from usage import format_summary as format_usage
+from deadline import Deadline, parse_duration, stage, submit
+from game_record import (get_game_details, get_game_details_llm, is_partial,
+                         lookup_game, now_iso)
+
+logger = logging.getLogger(__name__)
+
+# 表示信息尚未确定的字段值（如未发售的游戏、尚未评测的游戏）
+PENDING_VALUES = {"未知", "未评分", "需要从页面内容中提取", "未找到封面图"}
+
+# 刷新时比较的字段
+COMPARED_FIELDS = [
+    'english_name', 'cover_image', 'platforms', 'release_date', 'score', 'url'
+]
+
+# 命令行输出中最多列出的失败游戏数
+MAX_LISTED_FAILURES = 20
+
+
+def read_titles(path):
+    """
+    读取游戏名列表文件，每行一个游戏名，忽略空行和#开头的注释
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            title = line.strip()
+            if title and not title.startswith('#'):
+                yield title
+
+
+def iter_records(path):
+    """
+    逐条读取JSONL格式的查询结果
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_records(path):
+    """
+    读取JSONL格式的查询结果
+    """
+    return list(iter_records(path))
+
+
+def write_records(path, records):
+    """
+    将查询结果写入JSONL文件
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class RecordWriter:
+    """
+    逐条写出查询结果，并可同时分批写入数据库
+
+    先写入临时文件，结束时再替换目标文件，因此输出文件可以与输入文件相同
+
+    参数:
+        path (str): 输出JSONL文件
+        store (GameStore, optional): 同时写入的数据库
+        chunk_size (int, optional): 每个数据库事务写入的记录数
+    """
+
+    def __init__(self, path, store=None, chunk_size=500):
+        self.path = path
+        self.store = store
+        self.chunk_size = chunk_size
+        self._tmp_path = path + '.tmp'
+        self._file = open(self._tmp_path, 'w', encoding='utf-8')
+        self._pending = []
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        # 部分结果不写入数据库，避免覆盖之前的完整记录
+        if self.store is not None and not is_partial(record):
+            self._pending.append(record)
+            if len(self._pending) >= self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        self._file.flush()
+        if self._pending:
+            self.store.upsert_many(self._pending)
+            self._pending = []
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            logger.warning("已写出的结果保存在 %s", self._tmp_path)
+
+
+def bounded_map(fn, items, workers=4, window=None, executor=None):
+    """
+    在线程池中对items逐个调用fn，按输入顺序产生结果
+
+    与executor.map不同，items是逐个读取的，同时提交的任务不超过window个；
+    调用方处理完一个结果后才会提交下一个任务，因此输出写得慢时查询也会随之放慢
+
+    参数:
+        fn (callable): 对每一项调用的函数
+        items (iterable): 输入，可以是生成器
+        workers (int, optional): 并发线程数
+        window (int, optional): 最多同时进行的任务数，默认为workers的4倍
+        executor (ThreadPoolExecutor, optional): 使用已有的线程池（结束时不关闭），
+            为None时创建workers个线程的线程池
+
+    返回:
+        generator: 依次产生 (输入项, 结果)
+    """
+    window = max(window or workers * 4, workers)
+    items = iter(items)
+    in_flight = collections.deque()
+    if executor is None:
+        pool = ThreadPoolExecutor(max_workers=workers)
+    else:
+        pool = contextlib.nullcontext(executor)
+    with pool as executor:
+        for item in items:
+            in_flight.append((item, submit(executor, fn, item)))
+            if len(in_flight) >= window:
+                break
+        while in_flight:
+            item, future = in_flight.popleft()
+            result = future.result()
+            # 每取出一个结果再补充一个任务
+            for next_item in items:
+                in_flight.append((next_item, submit(executor, fn, next_item)))
+                break
+            yield item, result
+
+
+def parse_pool(processes=None):
+    """
+    创建用于页面解析的进程池，网络请求仍在线程中进行，
+    CPU密集的HTML解析和Jina内容预处理分散到多个CPU核上
+
+    参数:
+        processes (int, optional): 进程数，为None时使用CPU核数
+
+    返回:
+        ProcessPoolExecutor: 进程池
+    """
+    return ProcessPoolExecutor(max_workers=processes or os.cpu_count())
+
+
+class TitleDeduper:
+    """
+    合并同一游戏的不同写法（全角/半角、繁简、书名号、版本后缀），每个规范名只查询一次
+
+    规范名相同的游戏名正在查询时，后来者等待同一个查询的结果；
+    最近 cache_size 个成功的结果会被保留，供之后出现的写法直接使用。
+    结果复制给每种写法，chinese_name 为输入的原始写法
+
+    参数:
+        lookup (callable): 查询函数，参数为规范化后的游戏名
+        cache_size (int, optional): 保留的查询结果数
+    """
+
+    def __init__(self, lookup, cache_size=100000):
+        self.lookup = lookup
+        self.cache_size = cache_size
+        self._results = collections.OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, title):
+        key = title_key(title) or title
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                future, owner = self._results[key], False
+            elif key in self._in_flight:
+                future, owner = self._in_flight[key], False
+            else:
+                future, owner = Future(), True
+                self._in_flight[key] = future
+            if not owner:
+                incr("batch.dedup_hits")
+
+        if owner:
+            try:
+                future.set_result(self.lookup(canonical_title(title) or title))
+            except Exception as e:
+                future.set_exception(e)
+            with self._lock:
+                del self._in_flight[key]
+                details = future.result() if not future.exception() else None
+                # 失败和超时的结果不保留，之后出现的写法会重新查询
+                if details and not is_partial(details):
+                    self._results[key] = future
+                    if len(self._results) > self.cache_size:
+                        self._results.popitem(last=False)
+
+        details = future.result()
+        if not details:
+            return details
+        details = dict(details)
+        if details.get('chinese_name') != title:
+            details['canonical_name'] = details.get('chinese_name')
+            details['chinese_name'] = title
+        return details
+
+
+def iter_batch(titles,
+               method='original',
+               workers=4,
+               parse_executor=None,
+               timeout=None,
+               window=None,
+               dedup_cache=None):
+    """
+    并发查询一批游戏，按输入顺序逐个产生结果
+
+    参数:
+        titles (iterable): 中文游戏名，可以是生成器
+        method (str, optional): 获取详情的方法，original、llm 或 multi
+        workers (int, optional): 并发线程数
+        parse_executor (Executor, optional): 执行页面解析的进程池
+        timeout (float, optional): 每个游戏的查询时限（秒），为None时使用 timeouts.lookup
+        window (int, optional): 最多同时进行的查询数，默认为workers的4倍
+        dedup_cache (int, optional): 合并同一游戏的不同写法并保留最近的这么多个结果，
+            为None时不合并
+
+    返回:
+        generator: 依次产生 (游戏名, 游戏详情)，失败时详情为None，
+            超时时详情为部分结果
+    """
+    def lookup(title):
+        return lookup_game(title,
+                           method=method,
+                           interactive=False,
+                           parse_executor=parse_executor,
+                           timeout=timeout)
+
+    if dedup_cache is not None:
+        lookup = TitleDeduper(lookup, dedup_cache)
+    return bounded_map(lookup, titles, workers, window)
+
+
+def run_batch(titles,
+              method='original',
+              workers=4,
+              parse_executor=None,
+              timeout=None):
+    """
+    并发查询一批游戏
+
+    参数:
+        titles (list): 中文游戏名列表
+        method (str, optional): 获取详情的方法，original、llm 或 multi
+        workers (int, optional): 并发线程数
+        parse_executor (Executor, optional): 执行页面解析的进程池
+        timeout (float, optional): 每个游戏的查询时限（秒），为None时使用 timeouts.lookup
+
+    返回:
+        list: 与输入顺序一致的 (游戏名, 游戏详情) 列表，失败时详情为None，
+            超时时详情为部分结果
+    """
+    return list(iter_batch(titles, method, workers, parse_executor, timeout))
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def refresh_reason(record, now, ttl_hours, pending_ttl_hours):
+    """
+    判断一条记录是否需要重新查询
+
+    参数:
+        record (dict): 之前的查询结果
+        now (datetime): 当前时间
+        ttl_hours (float): 完整记录的有效期（小时）
+        pending_ttl_hours (float): 含有"未知"/"未评分"等字段的记录的有效期（小时）
+
+    返回:
+        str: 需要刷新的原因（partial/missing/pending/expired），不需要刷新时返回None
+    """
+    if is_partial(record):
+        return 'partial'
+    if not record.get('url'):
+        return 'missing'
+
+    fetched_at = _parse_time(record.get('fetched_at'))
+    age = now - fetched_at if fetched_at else None
+
+    pending = any(
+        isinstance(record.get(field), str) and record[field] in PENDING_VALUES
+        for field in COMPARED_FIELDS)
+    if pending and (age is None or age >= timedelta(hours=pending_ttl_hours)):
+        return 'pending'
+
+    if age is None or age >= timedelta(hours=ttl_hours):
+        return 'expired'
+
+    return None
+
+
+def diff_records(old, new):
+    """
+    比较两条记录，返回变化的字段
+
+    返回:
+        dict: {字段名: {"old": 旧值, "new": 新值}}
+    """
+    changes = {}
+    for field in COMPARED_FIELDS:
+        if old.get(field) != new.get(field):
+            changes[field] = {"old": old.get(field), "new": new.get(field)}
+    return changes
+
+
+def refresh_record(record, method='original', parse_executor=None,
+                   timeout=None):
+    """
+    重新查询一条记录，已有详情页URL时跳过翻译和搜索，并使用条件请求
+
+    参数:
+        record (dict): 之前的查询结果
+        method (str, optional): 获取详情的方法，original、llm 或 multi
+        parse_executor (Executor, optional): 执行页面解析的进程池
+        timeout (float, optional): 查询时限（秒），为None时使用 timeouts.lookup
+
+    返回:
+        tuple: (刷新后的记录, 状态, 变化的字段)
+            状态为 changed/unchanged/not_modified/failed 之一
+    """
+    game_url = record.get('url')
+    if not game_url or is_partial(record):
+        game_details = lookup_game(record.get('chinese_name', ''),
+                                   method=method,
+                                   interactive=False,
+                                   parse_executor=parse_executor,
+                                   timeout=timeout)
+        if is_partial(game_details):
+            return record, 'failed', {}
+    else:
+        # 已有URL时整个时限都用于获取详情
+        if timeout is None:
+            timeout = load_config().get("timeouts", {}).get("lookup")
+        deadline = Deadline(timeout, {"details": 1}) if timeout else None
+        with stage(deadline, "details"):
+            if method == 'llm':
+                game_details = get_game_details_llm(
+                    game_url, parse_executor=parse_executor)
+            elif method == 'multi':
+                game_details = fetch_details(game_url,
+                                             parse_executor=parse_executor)
+            else:
+                game_details = get_game_details(
+                    game_url,
+                    validators=record.get('validators'),
+                    parse_executor=parse_executor)
+
+    if not game_details:
+        return record, 'failed', {}
+
+    updated = dict(record)
+    updated['fetched_at'] = now_iso()
+    if game_details.get('not_modified'):
+        updated.update(normalize_details(updated))
+        return updated, 'not_modified', {}
+
+    for field in ('validators', 'status', 'timeout_stage'):
+        updated.pop(field, None)
+    updated.update(game_details)
+    updated.update(normalize_details(updated))
+    changes = diff_records(record, updated)
+    return updated, 'changed' if changes else 'unchanged', changes
+
+
+def iter_refresh(records,
+                 method='original',
+                 workers=4,
+                 config=None,
+                 force=False,
+                 parse_executor=None,
+                 timeout=None,
+                 window=None,
+                 stats=None):
+    """
+    增量刷新查询结果，按输入顺序逐条产生刷新后的记录
+    只重新查询过期、信息不完整或超时的记录，其余记录原样产生
+
+    参数:
+        records (iterable): 之前的查询结果，可以是生成器
+        method (str, optional): 获取详情的方法，original、llm 或 multi
+        workers (int, optional): 并发线程数
+        config (dict, optional): 配置字典，为None时加载默认配置
+        force (bool, optional): 是否忽略有效期刷新所有记录
+        parse_executor (Executor, optional): 执行页面解析的进程池
+        timeout (float, optional): 每条记录的查询时限（秒）
+        window (int, optional): 最多同时进行的查询数，默认为workers的4倍
+        stats (dict, optional): 各状态计数，在刷新过程中更新
+
+    返回:
+        generator: 依次产生 (刷新后的记录, 差异)，没有变化或未刷新时差异为None
+    """
+    if config is None:
+        config = load_config()
+    refresh_config = config.get("refresh", {})
+    ttl_hours = refresh_config.get("ttl_hours", 168)
+    pending_ttl_hours = refresh_config.get("pending_ttl_hours", 20)
+    if stats is None:
+        stats = {}
+    for status in ('skipped', 'changed', 'unchanged', 'not_modified',
+                   'failed'):
+        stats.setdefault(status, 0)
+
+    now = datetime.now(timezone.utc)
+
+    def refresh(record):
+        reason = 'forced' if force else refresh_reason(
+            record, now, ttl_hours, pending_ttl_hours)
+        if not reason:
+            return reason, (record, 'skipped', {})
+        return reason, refresh_record(record, method, parse_executor, timeout)
+
+    for _, (reason, (record, status, changes)) in bounded_map(
+            refresh, records, workers, window):
+        stats[status] += 1
+        diff = None
+        if status in ('changed', 'failed'):
+            diff = {
+                'chinese_name': record.get('chinese_name'),
+                'url': record.get('url'),
+                'reason': reason,
+                'status': status,
+                'changes': changes
+            }
+        yield record, diff
+
+
+def refresh_records(records,
+                    method='original',
+                    workers=4,
+                    config=None,
+                    force=False,
+                    parse_executor=None,
+                    timeout=None):
+    """
+    增量刷新一批查询结果，只重新查询过期、信息不完整或超时的记录
+
+    参数:
+        records (list): 之前的查询结果
+        method (str, optional): 获取详情的方法，original、llm 或 multi
+        workers (int, optional): 并发线程数
+        config (dict, optional): 配置字典，为None时加载默认配置
+        force (bool, optional): 是否忽略有效期刷新所有记录
+        parse_executor (Executor, optional): 执行页面解析的进程池
+        timeout (float, optional): 每条记录的查询时限（秒）
+
+    返回:
+        tuple: (刷新后的全部记录, 差异列表, 各状态计数)
+    """
+    stats = {}
+    refreshed = []
+    diffs = []
+    for record, diff in iter_refresh(records, method, workers, config, force,
+                                     parse_executor, timeout, stats=stats):
+        refreshed.append(record)
+        if diff:
+            diffs.append(diff)
+    return refreshed, diffs, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量查询游戏信息')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='批量查询游戏名列表')
+    run_parser.add_argument('input', help='游戏名列表文件，每行一个中文游戏名')
+    run_parser.add_argument('-o', '--output', required=True, help='输出JSONL文件')
+    run_parser.add_argument('--no-dedup',
+                            action='store_true',
+                            help='不合并同一游戏的不同写法（繁简、书名号、版本后缀）')
+
+    refresh_parser = subparsers.add_parser('refresh',
+                                           help='增量刷新之前的查询结果')
+    refresh_parser.add_argument('input', help='之前的JSONL查询结果')
+    refresh_parser.add_argument('-o',
+                                '--output',
+                                required=True,
+                                help='刷新后的JSONL文件（可与输入相同）')
+    refresh_parser.add_argument('--diff', help='差异输出文件（JSONL）')
+    refresh_parser.add_argument('--all',
+                                action='store_true',
+                                help='忽略有效期，刷新所有记录')
+
+    for sub in (run_parser, refresh_parser):
+        sub.add_argument('--method',
+                         choices=['original', 'llm', 'multi'],
+                         default='original',
+                         help='选择获取游戏详情的方法: original(原始方法)、llm(使用LLM API) 或 multi(按details配置使用多个数据源)')
+        sub.add_argument('--workers', type=int, help='并发线程数')
+        sub.add_argument('--window',
+                         type=int,
+                         help='最多同时进行的查询数（默认为batch.window或并发线程数的4倍）')
+        sub.add_argument('--db', help='同时将结果保存到指定的SQLite数据库')
+        sub.add_argument('--process-pool',
+                         action='store_true',
+                         help='在进程池中解析页面（进程数为batch.parse_processes或CPU核数）')
+        sub.add_argument('--metrics', help='结束时将运行指标（含熔断器状态）写入JSON文件')
+        sub.add_argument('--timeout',
+                         type=parse_duration,
+                         help='每个游戏的查询时限，如 8s、500ms（默认使用timeouts.lookup）')
+        sub.add_argument('--debug', action='store_true', help='输出调试日志')
+        sub.add_argument('--log-format',
+                         choices=['text', 'json'],
+                         help='日志格式（默认使用logging.format），日志输出到标准错误')
+        replay_group = sub.add_mutually_exclusive_group()
+        replay_group.add_argument('--record',
+                                  help='将所有对外HTTP请求的响应录制到归档文件')
+        replay_group.add_argument('--replay',
+                                  help='不访问网络，从归档文件回放响应（延迟和错误注入见replay配置）')
+
+    args = parser.parse_args()
+    config = load_config()
+    setup_logging(args.debug, args.log_format, config)
+    install_replay(args.record, args.replay, config)
+    workers = args.workers or config.get("batch", {}).get("workers", 4)
+    save_to_store = args.db or config.get("store", {}).get("enabled", False)
+    if args.process_pool:
+        pool = parse_pool(config.get("batch", {}).get("parse_processes"))
+    else:
+        pool = contextlib.nullcontext()
+
+    try:
+        with pool as parse_executor:
+            run_command(args, config, workers, save_to_store, parse_executor)
+    finally:
+        report_metrics(args.metrics)
+
+
+def report_metrics(path=None):
+    """
+    输出未处于正常状态的熔断器，并在指定path时写入全部运行指标
+    """
+    for name, state in snapshot().get("breakers", {}).items():
+        if state["state"] != "closed":
+            logger.warning("熔断器 %s: %s", name, state['state'])
+    if path:
+        write_metrics(path)
+
+
+def report_usage():
+    """
+    输出本次运行的LLM token用量
+    """
+    summary = format_usage()
+    if summary:
+        logger.info("LLM用量: %s", summary)
+
+
+def run_command(args, config, workers, save_to_store, parse_executor):
+    """
+    执行run或refresh子命令，输入逐行读取，结果逐条写出
+    """
+    window = args.window or config.get("batch", {}).get("window")
+    store = open_store(args.db, config) if save_to_store else None
+    try:
+        if args.command == 'run':
+            batch_config = config.get("batch", {})
+            if args.no_dedup or not batch_config.get("dedup", True):
+                dedup_cache = None
+            else:
+                dedup_cache = batch_config.get("dedup_cache", 100000)
+            run_titles(args, workers, parse_executor, window, store,
+                       dedup_cache)
+        else:
+            refresh_file(args, config, workers, parse_executor, window, store)
+    finally:
+        if store is not None:
+            store.close()
+
+
+def run_titles(args, workers, parse_executor, window, store,
+               dedup_cache=None):
+    counts = {'success': 0, 'timeout': 0, 'failed': 0}
+    failures = []
+    with RecordWriter(args.output, store) as writer:
+        for title, details in iter_batch(read_titles(args.input), args.method,
+                                         workers, parse_executor,
+                                         args.timeout, window, dedup_cache):
+            if not details:
+                counts['failed'] += 1
+                failure = f"查询失败: {title}"
+            elif is_partial(details):
+                counts['timeout'] += 1
+                failure = (f"查询超时: {title}"
+                           f"（{details['timeout_stage']}阶段）")
+            else:
+                counts['success'] += 1
+                failure = None
+            if details:
+                writer.write(details)
+            if failure and len(failures) < MAX_LISTED_FAILURES:
+                failures.append(failure)
+
+    logger.info("完成: 成功 %d 条，超时 %d 条，失败 %d 条", counts['success'],
+                counts['timeout'], counts['failed'])
+    dedup_hits = snapshot()["counters"].get("batch.dedup_hits")
+    if dedup_hits:
+        logger.info("合并重复游戏名，节省 %d 次查询", dedup_hits)
+    report_usage()
+    for failure in failures:
+        logger.warning("%s", failure)
+    if counts['timeout'] + counts['failed'] > len(failures):
+        logger.warning("……共 %d 条", counts['timeout'] + counts['failed'])
+    if counts['timeout'] or counts['failed']:
+        sys.exit(1)
+
+
+def refresh_file(args, config, workers, parse_executor, window, store):
+    stats = {}
+    diff_file = open(args.diff, 'w', encoding='utf-8') if args.diff else None
+    try:
+        with RecordWriter(args.output, store) as writer:
+            for record, diff in iter_refresh(iter_records(args.input),
+                                             method=args.method,
+                                             workers=workers,
+                                             config=config,
+                                             force=args.all,
+                                             parse_executor=parse_executor,
+                                             timeout=args.timeout,
+                                             window=window,
+                                             stats=stats):
+                writer.write(record)
+                if diff:
+                    line = json.dumps(diff, ensure_ascii=False)
+                    print(line)
+                    if diff_file:
+                        diff_file.write(line + '\n')
+    finally:
+        if diff_file:
+            diff_file.close()
+    logger.info("刷新完成: %s",
+                ", ".join(f"{k} {v}" for k, v in stats.items()))
+    report_usage()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量查询内存基准测试
+生成大量合成游戏名，在本地模拟的LLM和IGN GraphQL服务上运行批量查询，
+定期记录进程的常驻内存（RSS），验证内存占用不随输入规模增长
+
+用法:
+    python benchmark_batch.py --lines 1000000 --workers 16
+"""
+
+import argparse
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """
+    模拟LLM Chat Completions接口和IGN GraphQL接口
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _game(self, slug):
+        return {
+            "url": f"/games/{slug}",
+            "metadata": {
+                "names": {
+                    "name": slug
+                }
+            },
+            "objectRegions": [{
+                "releases": [{
+                    "date": "2021-03-26",
+                    "platformAttributes": [{
+                        "name": "PC"
+                    }]
+                }]
+            }]
+        }
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        variables = json.loads(query.get('variables', ['{}'])[0])
+        if query.get('operationName') == ['SearchObjectsByName']:
+            slug = re.sub(r'\W+', '-', variables.get('term', '')).strip('-')
+            self._send_json({
+                "data": {
+                    "searchObjectsByName": {
+                        "objects": [self._game(slug.lower())]
+                    }
+                }
+            })
+        else:
+            self._send_json(
+                {"data": {
+                    "getObjectBySlug": self._game(variables.get('slug'))
+                }})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if isinstance(body, list):
+            self._send_json([{
+                "data": {
+                    "getObjectBySlug": self._game(op['variables']['slug'])
+                }
+            } for op in body])
+            return
+        prompt = body['messages'][-1]['content']
+        match = re.search(r'《(.+?)》', prompt)
+        name = f"Game {match.group(1)}" if match else "Game"
+        content = f"1. {name}"
+        usage = {
+            "prompt_tokens": len(prompt),
+            "completion_tokens": len(content.split()),
+            "total_tokens": len(prompt) + len(content.split())
+        }
+        if body.get('stream'):
+            chunks = [{"choices": [{"delta": {"content": content}}]}]
+            if (body.get('stream_options') or {}).get('include_usage'):
+                chunks.append({"choices": [], "usage": usage})
+            payload = ("".join(
+                f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                for chunk in chunks) + "data: [DONE]\n\n").encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        else:
+            self._send_json({
+                "choices": [{
+                    "message": {
+                        "content": content
+                    }
+                }],
+                "usage": usage
+            })
+
+
+def serve(port):
+    ThreadingHTTPServer(('127.0.0.1', port), StandInHandler).serve_forever()
+
+
+def current_rss_mb():
+    """
+    返回当前进程的常驻内存（MB）
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except OSError:
+        # 非Linux系统只能得到峰值
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+def write_input(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(lines):
+            f.write(f"测试游戏{i}\n")
+
+
+def write_config(path, port):
+    base = f"http://127.0.0.1:{port}"
+    config = {
+        "llm": {
+            "provider": "openai",
+            "search": {
+                "api_key": "benchmark",
+                "api_base": f"{base}/v1"
+            },
+            "api": {
+                "api_key": "benchmark",
+                "api_base": f"{base}/v1"
+            }
+        },
+        "aliases": {
+            "enabled": False,
+            "auto_learn": False
+        },
+        "graphql": {
+            "url": f"{base}/graphql",
+            "hash_cache": None
+        }
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量查询内存基准测试')
+    parser.add_argument('--lines', type=int, default=1000000, help='合成输入的行数')
+    parser.add_argument('--workers', type=int, default=16, help='并发线程数')
+    parser.add_argument('--window', type=int, help='最多同时进行的查询数')
+    parser.add_argument('--port', type=int, default=8899, help='本地模拟服务的端口')
+    parser.add_argument('--samples', type=int, default=10, help='输出的RSS采样点数')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='game_record_bench_')
+    input_path = os.path.join(workdir, 'titles.txt')
+    output_path = os.path.join(workdir, 'results.jsonl')
+    config_path = os.path.join(workdir, 'config.json')
+    write_input(input_path, args.lines)
+    write_config(config_path, args.port)
+    os.environ["GAME_RECORD_CONFIG"] = config_path
+
+    # 模拟服务运行在单独的进程中，不计入本进程的内存
+    server = subprocess.Popen(
+        [sys.executable,
+         os.path.abspath(__file__), '--serve', '--port',
+         str(args.port)])
+    time.sleep(1)
+
+    from batch import RecordWriter, iter_batch, read_titles
+
+    samples = []
+    processed = 0
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(1):
+            samples.append((processed, current_rss_mb()))
+
+    print(f"输入: {args.lines} 行，并发线程 {args.workers}，工作目录 {workdir}")
+    start_rss = current_rss_mb()
+    start = time.monotonic()
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        # 未调用setup_logging，每次查询的进度日志不会输出
+        with RecordWriter(output_path) as writer:
+            for _, details in iter_batch(read_titles(input_path),
+                                         workers=args.workers,
+                                         window=args.window):
+                if details:
+                    writer.write(details)
+                processed += 1
+    finally:
+        done.set()
+        server.terminate()
+    elapsed = time.monotonic() - start
+
+    step = max(1, len(samples) // args.samples)
+    print(f"{'已处理':>10} {'RSS(MB)':>10}")
+    for count, rss in samples[::step]:
+        print(f"{count:>10} {rss:>10.1f}")
+    peak = max([rss for _, rss in samples] or [current_rss_mb()])
+    print(f"\n完成 {processed} 条，用时 {elapsed:.1f} 秒"
+          f"（{processed / elapsed:.0f} 条/秒）")
+    print(f"起始RSS {start_rss:.1f} MB，峰值RSS {peak:.1f} MB，"
+          f"结束RSS {current_rss_mb():.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+上游服务熔断器
+某个接口连续失败达到阈值后熔断，之后的调用直接走备用路径；
+熔断一段时间后放行少量探测请求（半开），探测成功则恢复
+"""
+
+import logging
+import threading
+import time
+
+import requests
+
+import metrics
+from deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# 各接口的熔断器
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+class CircuitBreaker:
+    """
+    单个接口的熔断器，可在多个线程间共享
+
+    参数:
+        name (str): 接口名称
+        failure_threshold (int): 连续失败多少次后熔断
+        reset_seconds (float): 熔断多久后进入半开状态
+        half_open_probes (int): 半开状态下同时放行的探测请求数
+    """
+
+    def __init__(self,
+                 name,
+                 failure_threshold=5,
+                 reset_seconds=60.0,
+                 half_open_probes=1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_probes = half_open_probes
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and (time.monotonic() - self._opened_at >=
+                                    self.reset_seconds):
+            self._state = HALF_OPEN
+            self._probes = 0
+            logger.info("熔断器 %s 进入半开状态，放行探测请求", self.name)
+        return self._state
+
+    def allow(self):
+        """
+        判断是否可以调用该接口
+
+        返回:
+            bool: 为False时应直接使用备用路径
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+        metrics.incr(f"breaker.{self.name}.rejected")
+        return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("熔断器 %s 探测成功，恢复调用", self.name)
+            self._state = CLOSED
+            self._failures = 0
+        metrics.incr(f"breaker.{self.name}.successes")
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            state = self._current_state()
+            if state == HALF_OPEN or (state == CLOSED and self._failures >=
+                                      self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                tripped = True
+            else:
+                tripped = False
+        metrics.incr(f"breaker.{self.name}.failures")
+        if tripped:
+            metrics.incr(f"breaker.{self.name}.trips")
+            logger.warning("熔断器 %s 已熔断（连续失败 %d 次），%g秒内直接使用备用路径",
+                           self.name, self._failures, self.reset_seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures
+            }
+
+
+def get_breaker(name, config=None):
+    """
+    获取指定接口的熔断器，同名接口共享一个实例
+
+    参数:
+        name (str): 接口名称，如 ign_graphql
+        config (dict, optional): 配置字典，为None时加载默认配置
+
+    返回:
+        CircuitBreaker: 熔断器
+    """
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(name)
+        if breaker is not None:
+            return breaker
+
+    if config is None:
+        from config import load_config
+        config = load_config()
+    breaker_config = config.get("breakers", {})
+    breaker = CircuitBreaker(
+        name,
+        failure_threshold=breaker_config.get("failure_threshold", 5),
+        reset_seconds=breaker_config.get("reset_seconds", 60),
+        half_open_probes=breaker_config.get("half_open_probes", 1))
+
+    with _BREAKERS_LOCK:
+        return _BREAKERS.setdefault(name, breaker)
+
+
+def breaker_states():
+    """
+    返回所有熔断器的当前状态
+    """
+    with _BREAKERS_LOCK:
+        breakers = list(_BREAKERS.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+
+def is_upstream_failure(error):
+    """
+    判断请求异常是否说明上游服务本身出了问题
+    连接失败、超时、5xx、429和无法解析的响应计为失败；404等与具体游戏有关的错误
+    以及查询时限用完不计入
+    """
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return isinstance(error, (requests.RequestException, ValueError))
+
+
+metrics.register("breakers", breaker_states)
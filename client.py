@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+游戏信息查询的库接口
+在服务中嵌入时创建一个 GameRecordClient 并长期复用：配置只读取一次，查询线程池、
+HTTP连接、LLM提供商、熔断器和各类缓存在所有调用之间共享
+
+用法:
+    from client import GameRecordClient
+
+    with GameRecordClient(workers=16) as client:
+        details = client.lookup("双人成行")
+        for title, details in client.lookup_many(titles):
+            ...
+
+    async with GameRecordClient() as client:
+        details = await client.alookup("双人成行")
+        async for title, details in client.alookup_many(titles):
+            ...
+"""
+
+import asyncio
+import collections
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from batch import TitleDeduper, bounded_map
+from config import load_config, use_config
+from deadline import submit
+from game_record import lookup_game
+
+logger = logging.getLogger(__name__)
+
+
+class GameRecordClient:
+    """
+    可复用的游戏信息查询客户端，可在多个线程和协程中共享
+
+    参数:
+        config (dict, optional): 配置字典，为None时读取配置文件（只读取一次）
+        method (str, optional): 默认的详情获取方法，original、llm 或 multi
+        workers (int, optional): 查询线程数，默认为 batch.workers
+        timeout (float, optional): 每次查询的时限（秒），默认为 timeouts.lookup
+        dedup (bool, optional): lookup_many 是否合并同一游戏的不同写法，默认为 batch.dedup
+        parse_executor (Executor, optional): 执行页面解析的进程池
+    """
+
+    def __init__(self,
+                 config=None,
+                 method='original',
+                 workers=None,
+                 timeout=None,
+                 dedup=None,
+                 parse_executor=None):
+        self.config = config if config is not None else load_config()
+        batch_config = self.config.get("batch", {})
+        self.method = method
+        self.workers = workers or batch_config.get("workers", 4)
+        self.timeout = timeout
+        self.dedup = batch_config.get("dedup",
+                                      True) if dedup is None else dedup
+        self.dedup_cache = batch_config.get("dedup_cache", 100000)
+        self.parse_executor = parse_executor
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix="lookup")
+
+    def close(self):
+        """
+        等待进行中的查询结束并关闭线程池
+        """
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await asyncio.to_thread(self.close)
+
+    def lookup(self, title, method=None, timeout=None):
+        """
+        查询一个游戏，搜索到多个结果时自动选择相似度最高的
+
+        参数:
+            title (str): 中文游戏名
+            method (str, optional): 获取详情的方法，为None时使用客户端的默认方法
+            timeout (float, optional): 查询时限（秒），为None时使用客户端的默认时限
+
+        返回:
+            dict: 游戏详情，失败时返回None，超时时返回部分结果
+        """
+        with use_config(self.config):
+            return lookup_game(title,
+                               method=method or self.method,
+                               interactive=False,
+                               parse_executor=self.parse_executor,
+                               timeout=self.timeout if timeout is None else timeout)
+
+    def _lookup_fn(self, method, timeout):
+        lookup = functools.partial(self.lookup, method=method, timeout=timeout)
+        if self.dedup:
+            lookup = TitleDeduper(lookup, self.dedup_cache)
+        return lookup
+
+    def lookup_many(self, titles, method=None, timeout=None, window=None):
+        """
+        在客户端的线程池中并发查询一批游戏，按输入顺序逐个产生结果
+
+        参数:
+            titles (iterable): 中文游戏名，可以是生成器
+            method (str, optional): 获取详情的方法
+            timeout (float, optional): 每个游戏的查询时限（秒）
+            window (int, optional): 最多同时进行的查询数，默认为线程数的4倍
+
+        返回:
+            generator: 依次产生 (游戏名, 游戏详情)
+        """
+        return bounded_map(self._lookup_fn(method, timeout),
+                           titles,
+                           self.workers,
+                           window,
+                           executor=self._executor)
+
+    async def alookup(self, title, method=None, timeout=None):
+        """
+        lookup的异步版本，查询在客户端的线程池中进行
+        """
+        return await asyncio.wrap_future(
+            submit(self._executor, self.lookup, title, method, timeout))
+
+    async def alookup_many(self, titles, method=None, timeout=None, window=None):
+        """
+        lookup_many的异步版本
+
+        返回:
+            async generator: 依次产生 (游戏名, 游戏详情)
+        """
+        lookup = self._lookup_fn(method, timeout)
+        window = max(window or self.workers * 4, self.workers)
+        titles = iter(titles)
+        in_flight = collections.deque()
+        for title in titles:
+            in_flight.append(
+                (title, asyncio.wrap_future(submit(self._executor, lookup,
+                                                   title))))
+            if len(in_flight) >= window:
+                break
+        try:
+            while in_flight:
+                title, future = in_flight[0]
+                details = await future
+                in_flight.popleft()
+                for next_title in titles:
+                    in_flight.append((next_title,
+                                      asyncio.wrap_future(
+                                          submit(self._executor, lookup,
+                                                 next_title))))
+                    break
+                yield title, details
+        finally:
+            for _, future in in_flight:
+                future.cancel()
@@ -5,30 +5,57 @@
 包含LLM API配置和其他设置
 """
 
+import contextlib
+import contextvars
+import copy
 import json
+import logging
 import os
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+# use_config设置的当前配置，随上下文传递到线程池中
+_CURRENT = contextvars.ContextVar("config", default=None)
+
 # 默认配置
 DEFAULT_CONFIG = {
     # LLM配置
     "llm": {
-        "provider": "openai",  # 可选: openai, azure, 等
+        "provider": "openai",  # 可选: openai, azure, huoshan；search/api中可单独设置provider
+        "pool_size": 16,  # 每个提供商复用的HTTP连接数
+        "key_wait_seconds": 30,  # 所有API密钥都被限流时最多等待的秒数
+        # token预算，超出后不再调用LLM：翻译只查对照表，详情直接从IGN获取
+        "budget": {
+            "lookup_tokens": None,  # 每个查询最多使用的token数，None表示不限制
+            "run_tokens": None  # 每次运行（如一次批量查询）最多使用的token数
+        },
+        # 页面解析结果缓存，页面内容没有实质变化时不再调用LLM
+        "cache": {
+            "enabled": True,  # 是否启用
+            "path": "llm_cache.db",  # 缓存数据库路径（相对路径基于程序目录）
+            "ttl_days": None  # 结果的有效期（天），None表示一直有效
+        },
         # 搜索相关配置
         "search": {
             "api_key": "",  # API密钥
+            "keys": [],  # 多个API密钥，请求分配给负载最低的密钥；每项为密钥字符串或 {"api_key", "api_base", "max_concurrency"}
             "api_base": "",  # 自定义API URL
             "model": "gpt-3.5-turbo",  # 使用的模型
             "temperature": 0.3,  # 温度参数
             "max_tokens": 150,  # 最大输出token数
+            "stream": True,  # 流式接收回复，解析到足够的候选后提前结束
+            "candidates": 1,  # 需要的候选英文名数量
         },
         # API相关配置
         "api": {
             "api_key": "",  # API密钥
+            "keys": [],  # 多个API密钥，格式同search.keys
             "api_base": "",  # 自定义API URL
             "model": "gpt-3.5-turbo",  # 使用的模型
             "temperature": 0.3,  # 温度参数
             "max_tokens": 1000,  # 最大输出token数
+            "json_mode": False,  # 要求服务只返回JSON对象（response_format: json_object），服务不支持时自动关闭
         },
         # Azure OpenAI特定配置
         "azure": {
@@ -37,6 +64,141 @@ DEFAULT_CONFIG = {
         }
     },
 
+    # 本地中英文游戏名对照表配置
+    "aliases": {
+        "enabled": True,  # 调用LLM前先查询对照表
+        "path": "aliases.json",  # 对照表文件（JSON或CSV），相对路径基于程序目录
+        "auto_learn": True,  # 查询成功后将结果写入对照表
+        "pinyin": True  # 启用拼音匹配（需要安装pypinyin）
+    },
+
+    # 封面图本地化配置
+    "covers": {
+        "dir": "covers",  # 封面图存储目录，按内容哈希分目录存放
+        "thumbnail_sizes": [320, 160],  # 缩略图最长边像素（需要安装Pillow）
+        "workers": 8,  # 并发下载线程数
+        "thumbnail_workers": None  # 缩略图进程数，None表示CPU核数
+    },
+
+    # 批量查询配置
+    "batch": {
+        "workers": 4,  # 并发线程数
+        "parse_processes": None,  # --process-pool时的解析进程数，None表示CPU核数
+        "window": None,  # 最多同时进行的查询数，None表示并发线程数的4倍
+        "dedup": True,  # 合并同一游戏的不同写法（繁简、书名号、版本后缀），每个只查询一次
+        "dedup_cache": 100000  # 合并时保留的查询结果数
+    },
+
+    # 增量刷新配置
+    "refresh": {
+        "ttl_hours": 168,  # 完整记录的有效期（小时）
+        "pending_ttl_hours": 20  # 含"未知"/"未评分"字段的记录的有效期（小时）
+    },
+
+    # 本地数据库配置
+    "store": {
+        "enabled": False,  # 是否自动将查询结果保存到数据库
+        "path": "game_record.db"  # SQLite数据库路径，相对路径基于程序目录
+    },
+
+    # HTTP回放配置（--replay），用于离线测试和吞吐量实验
+    "replay": {
+        "latency": "recorded",  # 每个响应的延迟："recorded"使用录制时的耗时，或固定秒数
+        "latency_scale": 1.0,  # 延迟的倍数
+        "error_rate": 0.0,  # 以此概率返回HTTP 503
+        "timeout_rate": 0.0,  # 以此概率抛出超时
+        "seed": None  # 随机数种子，设置后单线程回放时注入的错误可以重现
+    },
+
+    # IGN详情缓存预热配置（prewarm.py）
+    "prewarm": {
+        "use_cache": True,  # 查询时优先使用预热过的详情缓存（store.path数据库中）
+        "max_age_days": 30,  # 缓存详情的有效期（天），None表示一直有效
+        "rate": 1.0,  # 预热时每秒最多请求IGN的次数
+        "max_pages": 20,  # 每个平台和年份最多抓取的列表页数
+        # 列表页地址，{platform}、{year}、{page} 会被替换
+        "listing_url": "https://www.ign.com/games/browse?platform={platform}&releaseYear={year}&page={page}"
+    },
+
+    # 分布式查询队列配置（workqueue.py）
+    "queue": {
+        "path": "work_queue.db",  # 队列数据库路径，或其他节点上队列服务的地址（http://主机:端口）
+        "token": None,  # 队列服务的访问令牌，设置后工作进程需使用相同的令牌
+        "lease_seconds": 300,  # 领取的租约期限（秒），工作进程每1/3期限续约一次
+        "max_attempts": 3,  # 每个游戏名最多领取的次数
+        "poll_seconds": 10  # work --follow 在队列为空时的轮询间隔（秒）
+    },
+
+    # Jina页面读取配置
+    "jina": {
+        "base_url": "https://r.jina.ai/",  # Jina Reader地址
+        "max_bytes": 65536,  # 最多读取的字节数
+        "tail_bytes": 4096,  # 找到所有关键信息后继续读取的字节数
+        "chunk_size": 8192  # 每次读取的块大小
+    },
+
+    # 多数据源获取详情配置（--method multi）
+    "details": {
+        "strategy": "sequential",  # sequential: 按成本依次尝试; race: 同时请求取最先完整的结果
+        "sources": ["local", "ign_graphql", "ign_html"],  # 可选: local, ign_graphql, ign_html, jina_llm
+        "deadlines": {  # 各数据源的最长等待时间（秒）
+            "local": 1,
+            "ign_graphql": 5,
+            "ign_html": 10,
+            "jina_llm": 30
+        },
+        "catalogue": None,  # 本地目录文件（JSONL），local数据源同时查询本地数据库
+        "race_workers": 16  # 并发请求数据源的线程数
+    },
+
+    # IGN GraphQL配置
+    "graphql": {
+        "url": "https://mollusk.apis.ign.com/graphql",  # GraphQL API地址
+        "hash_cache": "ign_hashes.json",  # 持久化查询哈希的缓存文件
+        "hash_ttl_hours": 24,  # 哈希缓存有效期（小时），过期后重新获取
+        "discovery_page": "https://www.ign.com/games/it-takes-two",  # 用于查找哈希的IGN页面
+        "discovery_max_chunks": 60,  # 最多检查的JS文件数
+        "min_refresh_seconds": 300,  # 两次重新获取之间的最短间隔（秒）
+        # 批量获取详情：把多个线程同时请求的slug合并为一个批量请求
+        "batch": {
+            "enabled": False,
+            "size": 20,  # 每批最多包含的slug数
+            "linger_ms": 20,  # 等待凑批的最长时间（毫秒）
+            "max_in_flight": 4  # 同时进行的批量请求数
+        }
+    },
+
+    # 熔断配置：接口连续失败后直接使用备用路径（如GraphQL失败时直接爬取网页）
+    "breakers": {
+        "failure_threshold": 5,  # 连续失败多少次后熔断
+        "reset_seconds": 60,  # 熔断多久后放行探测请求
+        "half_open_probes": 1  # 探测时同时放行的请求数
+    },
+
+    # 访问IGN和Jina的HTTP连接
+    "http": {
+        "pool_size": 32  # 复用的连接数，不少于并发线程数时连接不会被丢弃
+    },
+
+    # 超时配置
+    "timeouts": {
+        "connect": 5,  # 每个HTTP请求的连接超时（秒）
+        "read": 30,  # 每个HTTP请求的读取超时（秒）
+        "lookup": None,  # 单次查询的总时限（秒），None表示不限制
+        "stages": {  # 总时限在各阶段间的分配比例，未用完的时间顺延给后面的阶段
+            "translate": 0.3,
+            "search": 0.2,
+            "details": 0.5
+        }
+    },
+
+    # 日志配置：日志输出到标准错误（或file指定的文件），标准输出只用于查询结果
+    "logging": {
+        "level": "INFO",  # 日志级别，命令行指定--debug时为DEBUG
+        "format": "text",  # 日志格式: text 或 json（每行一个JSON对象）
+        "file": None  # 日志文件路径，None表示输出到标准错误
+    },
+
     # 搜索配置
     "search": {
         "max_results": 5  # 最大搜索结果数
@@ -49,6 +211,21 @@ DEFAULT_CONFIG = {
 }
 
 
+@contextlib.contextmanager
+def use_config(config):
+    """
+    在当前上下文中使用给定的配置：其中的 load_config() 直接返回该配置，不再读取配置文件
+
+    参数:
+        config (dict): 配置字典
+    """
+    token = _CURRENT.set(config)
+    try:
+        yield config
+    finally:
+        _CURRENT.reset(token)
+
+
 def load_config(config_path=None):
     """
     加载配置文件
@@ -57,14 +234,18 @@ def load_config(config_path=None):
         config_path (str, optional): 配置文件路径，如果为None则使用默认路径
         
     返回:
-        dict: 配置字典
+        dict: 配置字典；在use_config中且未指定路径时返回use_config设置的配置
     """
-    # 如果未指定配置文件路径，则使用默认路径
+    # 如果未指定配置文件路径，则使用环境变量GAME_RECORD_CONFIG或默认路径
     if config_path is None:
-        config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                                   "config.json")
+        current = _CURRENT.get()
+        if current is not None:
+            return current
+        config_path = os.environ.get("GAME_RECORD_CONFIG") or os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "config.json")
 
-    config = DEFAULT_CONFIG.copy()
+    # 深拷贝，合并用户配置时不会修改DEFAULT_CONFIG中的嵌套字典
+    config = copy.deepcopy(DEFAULT_CONFIG)
 
     # 尝试从配置文件加载
     try:
@@ -74,8 +255,7 @@ def load_config(config_path=None):
                 # 递归更新配置
                 deep_update(config, user_config)
     except Exception as e:
-        print(f"警告: 加载配置文件时出错: {e}")
-        print(f"使用默认配置继续运行")
+        logger.warning("加载配置文件时出错，使用默认配置继续运行: %s", e)
 
     # 尝试从环境变量加载API密钥
     if not config["llm"]["search"]["api_key"]:
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+游戏封面图本地化工具
+并发下载封面图，按内容哈希存储（相同图片只保存一份），
+并在进程池中生成缩略图，将本地路径写回查询结果
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import requests
+
+from deadline import request_timeout
+
+logger = logging.getLogger(__name__)
+
+# Pillow为可选依赖，未安装时只下载原图，不生成缩略图
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+DEFAULT_HEADERS = {
+    'User-Agent':
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+def _cover_dir(covers_config):
+    cover_dir = covers_config.get("dir", "covers")
+    if not os.path.isabs(cover_dir):
+        cover_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 cover_dir)
+    return cover_dir
+
+
+def _guess_extension(url, content_type):
+    ext = None
+    if content_type:
+        ext = mimetypes.guess_extension(content_type.split(';')[0].strip())
+    if not ext:
+        ext = os.path.splitext(url.split('?')[0])[1]
+    if ext in ('.jpe', '.jpeg'):
+        ext = '.jpg'
+    return ext if ext and len(ext) <= 5 else '.img'
+
+
+def store_blob(data, cover_dir, ext):
+    """
+    按内容哈希保存文件，已存在时不重复写入
+
+    参数:
+        data (bytes): 文件内容
+        cover_dir (str): 存储根目录
+        ext (str): 文件扩展名
+
+    返回:
+        tuple: (内容哈希, 文件路径)
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    path = os.path.join(cover_dir, digest[:2], f"{digest}{ext}")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return digest, path
+
+
+def download_cover(url, cover_dir, session=None):
+    """
+    下载一张封面图并按内容哈希保存
+
+    参数:
+        url (str): 封面图URL
+        cover_dir (str): 存储根目录
+        session (requests.Session, optional): 复用的HTTP会话
+
+    返回:
+        tuple: (内容哈希, 文件路径)，下载失败时返回None
+    """
+    http = session or requests
+    try:
+        response = http.get(url, headers=DEFAULT_HEADERS,
+                            timeout=request_timeout())
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.warning("下载封面图时出错: %s: %s", url, e)
+        return None
+
+    ext = _guess_extension(url, response.headers.get('Content-Type'))
+    return store_blob(response.content, cover_dir, ext)
+
+
+def make_thumbnail(source_path, thumb_path, size):
+    """
+    生成缩略图（在子进程中运行）
+
+    参数:
+        source_path (str): 原图路径
+        thumb_path (str): 缩略图路径
+        size (int): 缩略图最长边像素
+
+    返回:
+        str: 缩略图路径，失败时返回None
+    """
+    if os.path.exists(thumb_path):
+        return thumb_path
+    try:
+        with Image.open(source_path) as image:
+            image = image.convert('RGB')
+            image.thumbnail((size, size))
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            tmp_path = f"{thumb_path}.{os.getpid()}.tmp"
+            image.save(tmp_path, 'JPEG', quality=85, optimize=True)
+            os.replace(tmp_path, thumb_path)
+        return thumb_path
+    except Exception as e:
+        logger.warning("生成缩略图时出错: %s: %s", source_path, e)
+        return None
+
+
+def cache_covers(records, config=None):
+    """
+    为一批查询结果下载封面图并生成缩略图
+    相同URL只下载一次，相同内容只保存一份
+
+    参数:
+        records (list): 游戏详情字典列表，会被原地更新
+        config (dict, optional): 配置字典，为None时加载默认配置
+
+    返回:
+        list: 更新后的游戏详情列表，新增 cover_local 和 cover_thumbnails 字段
+    """
+    if config is None:
+        from config import load_config
+        config = load_config()
+
+    covers_config = config.get("covers", {})
+    cover_dir = _cover_dir(covers_config)
+    sizes = covers_config.get("thumbnail_sizes", [320, 160])
+    workers = covers_config.get("workers", 8)
+    thumbnail_workers = covers_config.get("thumbnail_workers") or None
+
+    urls = []
+    for record in records:
+        url = record.get('cover_image')
+        if url and url.startswith('http') and url not in urls:
+            urls.append(url)
+    if not urls:
+        return records
+
+    # 并发下载原图
+    with requests.Session() as session:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            stored = dict(
+                zip(
+                    urls,
+                    executor.map(
+                        lambda url: download_cover(url, cover_dir, session),
+                        urls)))
+
+    # 在进程池中生成缩略图，缩略图同样按原图哈希命名
+    thumbnails = {}
+    if Image is None:
+        if sizes:
+            logger.warning("未安装Pillow，跳过缩略图生成。请运行: pip install Pillow")
+    elif sizes:
+        jobs = {}
+        for result in stored.values():
+            if not result:
+                continue
+            digest, path = result
+            for size in sizes:
+                thumb_path = os.path.join(cover_dir, "thumbs", str(size),
+                                          digest[:2], f"{digest}.jpg")
+                jobs[(digest, size)] = (path, thumb_path, size)
+        with ProcessPoolExecutor(max_workers=thumbnail_workers) as executor:
+            futures = {
+                key: executor.submit(make_thumbnail, *job)
+                for key, job in jobs.items()
+            }
+            for key, future in futures.items():
+                thumbnails[key] = future.result()
+
+    for record in records:
+        result = stored.get(record.get('cover_image'))
+        if not result:
+            continue
+        digest, path = result
+        record['cover_local'] = path
+        record['cover_thumbnails'] = {
+            str(size): thumbnails[(digest, size)]
+            for size in sizes if thumbnails.get((digest, size))
+        }
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='下载查询结果中的游戏封面图并生成缩略图')
+    parser.add_argument('input', help='查询结果文件（JSON或JSONL）')
+    parser.add_argument('-o', '--output', help='输出JSONL文件，默认输出到标准输出')
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        text = f.read().strip()
+    if text.startswith('['):
+        records = json.loads(text)
+    elif text.startswith('{') and '\n{' not in text:
+        records = [json.loads(text)]
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    cache_covers(records)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
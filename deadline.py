@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+查询时间预算
+为一次查询设置总时限，并按比例分配给翻译、搜索和获取详情各阶段。
+当前时限通过contextvars传递，所有HTTP请求都从这里获取超时时间
+"""
+
+import contextlib
+import contextvars
+import re
+import threading
+import time
+
+import requests
+
+# 各阶段占总时限的比例，前面阶段未用完的时间会顺延给后面的阶段
+DEFAULT_STAGES = {"translate": 0.3, "search": 0.2, "details": 0.5}
+
+# 每个请求的默认超时（秒），首次使用时从配置中读取
+_DEFAULT_TIMEOUTS = {"connect": 5.0, "read": 30.0}
+_DEFAULT_LOCK = threading.Lock()
+_CONFIGURED = False
+
+_CURRENT = contextvars.ContextVar("game_record_deadline", default=None)
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """
+    查询时限已用完
+    继承自requests的Timeout，已有的请求异常处理会把它当作一次超时处理
+    """
+
+    def __init__(self, stage=None):
+        super().__init__(f"查询时限已用完（{stage or '未知'}阶段）")
+        self.stage = stage
+
+
+class Deadline:
+    """
+    一次查询的时间预算
+
+    参数:
+        seconds (float): 总时限（秒）
+        stages (dict, optional): 各阶段占总时限的比例
+    """
+
+    def __init__(self, seconds, stages=None):
+        self.seconds = seconds
+        self.stages = dict(stages or DEFAULT_STAGES)
+        self.expires_at = time.monotonic() + seconds
+        self.stage_name = None
+        self.stage_expires_at = None
+        self.exhausted_stage = None
+
+    def remaining(self):
+        """
+        总时限剩余的秒数
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def stage_remaining(self):
+        """
+        当前阶段剩余的秒数（不超过总时限剩余时间）
+        """
+        remaining = self.remaining()
+        if self.stage_expires_at is not None:
+            remaining = min(remaining,
+                            self.stage_expires_at - time.monotonic())
+        return max(0.0, remaining)
+
+    def expired(self):
+        return self.stage_remaining() <= 0
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        进入一个阶段，并将本时限设为当前时限
+        阶段可用时间 = 剩余时间 × 本阶段比例 / 本阶段及之后各阶段比例之和
+        """
+        names = list(self.stages)
+        later = names[names.index(name):] if name in names else [name]
+        total_share = sum(self.stages.get(n, 0) for n in later)
+        share = self.stages.get(name, 0)
+        allowance = self.remaining() * (share / total_share
+                                        if total_share else 1.0)
+
+        previous = (self.stage_name, self.stage_expires_at)
+        self.stage_name = name
+        self.stage_expires_at = time.monotonic() + allowance
+        token = _CURRENT.set(self)
+        try:
+            yield self
+        except DeadlineExceeded:
+            self.exhausted_stage = self.exhausted_stage or name
+            raise
+        finally:
+            if self.stage_remaining() <= 0:
+                self.exhausted_stage = self.exhausted_stage or name
+            _CURRENT.reset(token)
+            self.stage_name, self.stage_expires_at = previous
+
+
+def current():
+    """
+    返回当前上下文中的时限，没有时返回None
+    """
+    return _CURRENT.get()
+
+
+def stage(deadline, name):
+    """
+    deadline不为None时进入其指定阶段，否则什么也不做
+    """
+    if deadline is None:
+        return contextlib.nullcontext()
+    return deadline.stage(name)
+
+
+def request_timeout():
+    """
+    返回下一个HTTP请求应使用的 (连接超时, 读取超时)
+
+    没有时限时使用 timeouts.connect / timeouts.read 配置；
+    有时限时不超过当前阶段的剩余时间，时间已用完时抛出DeadlineExceeded
+    """
+    if not _CONFIGURED:
+        from config import load_config
+        configure(load_config())
+    with _DEFAULT_LOCK:
+        connect, read = _DEFAULT_TIMEOUTS["connect"], _DEFAULT_TIMEOUTS["read"]
+    deadline = _CURRENT.get()
+    if deadline is None:
+        return (connect, read)
+    remaining = deadline.stage_remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded(deadline.stage_name)
+    return (min(connect, remaining), min(read, remaining))
+
+
+def configure(config):
+    """
+    从配置中读取默认的连接和读取超时
+    """
+    global _CONFIGURED
+    timeouts = config.get("timeouts", {})
+    with _DEFAULT_LOCK:
+        for key in ("connect", "read"):
+            if timeouts.get(key):
+                _DEFAULT_TIMEOUTS[key] = float(timeouts[key])
+        _CONFIGURED = True
+
+
+def submit(executor, fn, *args, **kwargs):
+    """
+    向线程池提交任务，并把当前时限传递到工作线程中
+    """
+    context = contextvars.copy_context()
+    return executor.submit(context.run, fn, *args, **kwargs)
+
+
+def parse_duration(text):
+    """
+    解析时长字符串，如 "8s"、"500ms"、"1.5m"、"6h" 或 "8"（秒）
+
+    返回:
+        float: 秒数
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*', str(text))
+    if not match:
+        raise ValueError(f"无法解析时长: {text}")
+    value = float(match.group(1))
+    unit = match.group(2) or 's'
+    return value * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
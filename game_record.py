@@ -2,311 +2,354 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import codecs
 import json
+import logging
+import re
 import sys
+import threading
+from datetime import datetime, timezone
 
 import requests
 from bs4 import BeautifulSoup
-
-
-def translate_to_english(game_name, api_key=None, api_base=None, model=None):
+from requests.adapters import HTTPAdapter
+
+import metrics
+import usage
+from aliases import learn_alias
+from breaker import get_breaker, is_upstream_failure
+from config import load_config
+from covers import cache_covers
+from deadline import Deadline, DeadlineExceeded
+from deadline import current as current_deadline
+from deadline import parse_duration, request_timeout, stage
+from llm import LLMError, extract_json, get_provider
+from llm_cache import cache_key, get_extraction_cache
+from log import setup_logging
+from normalize import normalize_details
+from replay import install as install_replay
+from store import get_detail_cache, open_store
+
+logger = logging.getLogger(__name__)
+
+# 访问IGN和Jina的HTTP会话，所有线程复用连接
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def http_session():
+    """
+    返回访问IGN和Jina共用的HTTP会话，连接池大小为 http.pool_size
+    """
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            pool_size = load_config().get("http", {}).get("pool_size", 32)
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size,
+                                  pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _SESSION = session
+        return _SESSION
+
+
+def translate_to_english(game_name,
+                         api_key=None,
+                         api_base=None,
+                         model=None,
+                         use_aliases=True):
     """
     使用LLM API查找游戏的英文名称（通过搜索而非简单翻译）
     
     支持多种LLM服务，包括OpenAI、Azure OpenAI和火山引擎等
+    调用LLM之前会先查询本地中英文对照表，命中时直接返回
     
     参数:
         game_name (str): 中文游戏名
         api_key (str, optional): API密钥，如果为None则从配置文件或环境变量获取
         api_base (str, optional): 自定义API URL，如果为None则从配置文件或使用默认URL
         model (str, optional): 使用的模型名称，如果为None则从配置文件或使用默认模型
+        use_aliases (bool, optional): 是否先查询本地对照表，默认为True
     
     返回:
         str: 查找到的游戏英文名
     """
-    import json
-    import os
+    candidates = translate_candidates(game_name,
+                                      count=1,
+                                      api_key=api_key,
+                                      api_base=api_base,
+                                      model=model,
+                                      use_aliases=use_aliases)
+    return candidates[0] if candidates else None
+
+
+def translate_candidates(game_name,
+                         count=None,
+                         api_key=None,
+                         api_base=None,
+                         model=None,
+                         use_aliases=True):
+    """
+    使用LLM API查找游戏最可能的几个英文名称
 
-    import requests
+    默认以流式方式接收回复，解析到前count个完整的候选名称后立即关闭连接，
+    无需等待模型生成完整的列表
 
-    from config import load_config
+    参数:
+        game_name (str): 中文游戏名
+        count (int, optional): 需要的候选数量，为None时使用 llm.search.candidates
+        api_key (str, optional): API密钥，如果为None则从配置文件或环境变量获取
+        api_base (str, optional): 自定义API URL，如果为None则从配置文件或使用默认URL
+        model (str, optional): 使用的模型名称，如果为None则从配置文件或使用默认模型
+        use_aliases (bool, optional): 是否先查询本地对照表，默认为True
 
+    返回:
+        list: 按可能性排序的英文名列表，失败时返回空列表
+    """
     # 加载配置
     config = load_config()
-    llm_config = config.get("llm", {})
-    search_config = llm_config.get("search", {})
-
-    # 获取LLM提供商
-    provider = llm_config.get("provider", "openai").lower()
-
-    # 设置API密钥
-    if not api_key:
-        api_key = search_config.get("api_key", "")
-        if not api_key:
-            # 尝试从环境变量获取
-            if provider == "openai":
-                api_key = os.environ.get("OPENAI_API_KEY", "")
-            elif provider == "azure":
-                api_key = os.environ.get("AZURE_OPENAI_API_KEY", "")
-            elif provider == "huoshan":
-                api_key = os.environ.get("HUOSHAN_API_KEY", "")
-
-    if not api_key:
-        print(f"错误: 未设置API密钥。请在配置文件中设置或通过环境变量提供。")
-        return None
-
-    # 设置API基础URL
-    if not api_base:
-        api_base = search_config.get("api_base", "")
-        if not api_base:
-            if provider == "huoshan":
-                api_base = "https://ark.cn-beijing.volces.com/api/v3/bots/chat/completions"
-
-    # 设置模型
-    if not model:
-        model = search_config.get("model", "")
-        if not model:
-            if provider == "openai":
-                model = "gpt-3.5-turbo"
-            elif provider == "azure":
-                model = "gpt-35-turbo"
-            elif provider == "huoshan":
-                model = "bot-20250402210548-cns6x"
-
-    # 设置温度和最大token数
-    temperature = search_config.get("temperature", 0.3)
-    max_tokens = search_config.get("max_tokens", 150)
+    search_config = config.get("llm", {}).get("search", {})
+    if count is None:
+        count = search_config.get("candidates", 1)
+
+    # 优先查询本地对照表，命中时无需调用LLM
+    if use_aliases:
+        from aliases import get_alias_table
+        alias_table = get_alias_table(config)
+        if alias_table is not None:
+            english_name = alias_table.lookup(game_name)
+            if english_name:
+                return [english_name]
+
+    # 超出token预算后只使用对照表
+    if not usage.allow("search"):
+        logger.info("超出LLM token预算，对照表中没有游戏 '%s'，跳过翻译", game_name)
+        return []
+
+    # 获取LLM提供商（复用长期存在的客户端）
+    try:
+        provider = get_provider("search", config, api_key, api_base, model)
+    except LLMError as e:
+        logger.error("%s", e)
+        return []
 
     # 系统提示和用户提示
     system_prompt = "You are a video game expert. Your task is to find the official English name of video games. Use your knowledge and search capabilities to find the most accurate English title. If there are multiple possible English names, list the most likely ones in order of probability. If you're uncertain, indicate this clearly."
     user_prompt = f"请根据搜索结果找出游戏《{game_name}》的官方英文名称。不要简单翻译，而是查找真实的英文名称。如果有多个可能的结果，请列出最可能的几个。格式要求：1. 最可能的英文名称 2. 次可能的英文名称（如果有）"
+    messages = [{
+        "role": "system",
+        "content": system_prompt
+    }, {
+        "role": "user",
+        "content": user_prompt
+    }]
 
     try:
-        # 根据不同的提供商调用不同的API
-        if provider == "openai":
-            # OpenAI API调用
-            try:
-                import openai
-                openai.api_key = api_key
-                if api_base:
-                    openai.api_base = api_base
-
-                response = openai.ChatCompletion.create(
-                    model=model,
-                    messages=[{
-                        "role": "system",
-                        "content": system_prompt
-                    }, {
-                        "role": "user",
-                        "content": user_prompt
-                    }],
-                    temperature=temperature,
-                    max_tokens=max_tokens)
-
-                result = response.choices[0].message.content.strip()
-            except ImportError:
-                print("错误: 未安装openai库。请运行: pip install openai")
-                return None
-            except Exception as e:
-                print(f"OpenAI API调用出错: {e}")
-                return None
-
-        elif provider == "azure":
-            # Azure OpenAI API调用
-            try:
-                import openai
-                azure_config = llm_config.get("azure", {})
-                api_version = azure_config.get("api_version", "2023-05-15")
-                endpoint = azure_config.get("endpoint", "")
-
-                if not endpoint and api_base:
-                    endpoint = api_base
-
-                if not endpoint:
-                    print("错误: 未设置Azure OpenAI端点。")
-                    return None
-
-                openai.api_type = "azure"
-                openai.api_key = api_key
-                openai.api_base = endpoint
-                openai.api_version = api_version
-
-                response = openai.ChatCompletion.create(
-                    deployment_id=model,
-                    messages=[{
-                        "role": "system",
-                        "content": system_prompt
-                    }, {
-                        "role": "user",
-                        "content": user_prompt
-                    }],
-                    temperature=temperature,
-                    max_tokens=max_tokens)
-
-                result = response.choices[0].message.content.strip()
-            except ImportError:
-                print("错误: 未安装openai库。请运行: pip install openai")
-                return None
-            except Exception as e:
-                print(f"Azure OpenAI API调用出错: {e}")
-                return None
-
-        elif provider == "huoshan":
-            # 火山引擎API调用
-            if not api_base:
-                print("错误: 未设置火山引擎API URL。")
-                return None
-
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-
-            payload = {
-                "model":
-                model,
-                "messages": [{
-                    "role": "system",
-                    "content": system_prompt
-                }, {
-                    "role": "user",
-                    "content": user_prompt
-                }],
-                "temperature":
-                temperature,
-                "max_tokens":
-                max_tokens
-            }
-
-            response = requests.post(api_base, headers=headers, json=payload)
-
-            # 检查响应状态
-            if response.status_code != 200:
-                print(f"火山引擎API调用失败: HTTP {response.status_code}")
-                return None
-
-            # 解析响应
-            try:
-                response_data = response.json()
-
-                # 提取结果（根据火山引擎API的响应格式调整）
-                if "choices" in response_data and len(
-                        response_data["choices"]) > 0:
-                    if "message" in response_data["choices"][0]:
-                        result = response_data["choices"][0]["message"][
-                            "content"].strip()
-                    else:
-                        print("错误: 响应格式不符合预期")
-                        return None
-                else:
-                    print("错误: 响应中没有choices字段")
-                    return None
-            except json.JSONDecodeError:
-                print(f"错误: 无法解析API响应为JSON")
-                return None
-            except Exception as e:
-                print(f"处理火山引擎API响应时出错: {e}")
-                return None
-        else:
-            print(f"错误: 不支持的LLM提供商: {provider}")
-            return None
+        try:
+            if search_config.get("stream", True):
+                candidates, result = _stream_candidates(
+                    provider, messages, count)
+            else:
+                result = provider.complete(messages).strip()
+                candidates = _parse_candidates(result, final=True)[:count]
+        except LLMError as e:
+            logger.warning("%s调用出错: %s", provider.label, e)
+            return []
+
+        # 如果没有找到编号格式，尝试其他方法提取
+        if not candidates:
+            english_name = _pick_english_name(result)
+            if english_name:
+                candidates = [english_name]
+        return candidates
+
+    except Exception as e:
+        logger.warning("查找游戏英文名过程中出错: %s", e)
+        return []
+
+
+# 编号格式的候选名称，如"1. God of War: Ghost of Sparta"，同一行内可能有多个
+_CANDIDATE_RE = re.compile(
+    r'(?:^|\s)[*_]*(\d{1,2})\.\s+(.+?)(?=\s+[*_]*\d{1,2}\.\s|$)')
+
+
+def _parse_candidates(text, final=False):
+    """
+    从模型回复中解析编号格式的候选名称
+
+    参数:
+        text (str): 已接收的回复内容
+        final (bool): 回复是否已经完整，为False时最后一个仍在生成的候选会被忽略
+
+    返回:
+        list: 候选英文名列表
+    """
+    lines = text.split('\n')
+    if not final:
+        partial = lines.pop()
+    candidates = []
+    for line in lines:
+        candidates += _CANDIDATE_RE.findall(line.strip())
+    if not final:
+        # 最后一行尚未结束，只有后面已经出现下一个编号的候选才是完整的
+        candidates += _CANDIDATE_RE.findall(partial.strip())[:-1]
+
+    names = []
+    for _, name in candidates:
+        # 去除可能的星号或其他装饰字符
+        name = name.replace('*', '').strip()
+        if name:
+            names.append(name)
+    return names
+
+
+def _stream_candidates(provider, messages, count):
+    """
+    流式接收模型回复，得到count个完整候选后立即关闭连接
+
+    返回:
+        tuple: (候选英文名列表, 已接收的回复内容)
+    """
+    buffer = ''
+    stream = provider.stream(messages)
+    try:
+        for delta in stream:
+            buffer += delta
+            candidates = _parse_candidates(buffer)
+            if len(candidates) >= count:
+                return candidates[:count], buffer
+            deadline = current_deadline()
+            if deadline is not None and deadline.expired():
+                # 时限已到，使用已经收到的内容
+                logger.info("查询时限已到，停止接收翻译结果")
+                break
+    finally:
+        stream.close()
+    return _parse_candidates(buffer, final=True)[:count], buffer.strip()
 
-        # 处理结果，提取第一个（最可能的）英文名称
-        lines = result.split('\n')
-        english_name = None
 
-        # 遍历所有行，查找格式为"1. 游戏名"的行
+def _pick_english_name(result):
+    """
+    从没有编号格式的回复中挑选游戏英文名
+    """
+    lines = result.split('\n')
+    english_name = None
+
+    # 跳过可能的介绍性文本，查找实际的游戏名
+    for line in lines:
+        line = line.strip()
+        # 避免选择介绍性文本
+        if line and not line.startswith('根据') and not line.startswith(
+                '这是') and len(line) > 1:
+            english_name = line
+            break
+
+    # 如果仍然没有找到，使用第一行非空文本
+    if not english_name:
         for line in lines:
-            line = line.strip()
-            # 检查是否是编号格式（如"1. God of War: Ghost of Sparta"）
-            if line.startswith('1. '):
-                english_name = line[3:].strip()
-                # 去除可能的星号或其他装饰字符
-                english_name = english_name.replace('*',
-                                                    '').replace('**',
-                                                                '').strip()
+            if line.strip():
+                english_name = line.strip()
                 break
 
-        # 如果没有找到编号格式，尝试其他方法提取
-        if not english_name and lines:
-            # 跳过可能的介绍性文本，查找实际的游戏名
-            for line in lines:
-                line = line.strip()
-                # 避免选择介绍性文本
-                if line and not line.startswith('根据') and not line.startswith(
-                        '这是') and len(line) > 1:
-                    english_name = line
-                    break
+    return english_name or result  # 找不到时返回完整结果
 
-        # 如果仍然没有找到，使用第一行非空文本
-        if not english_name:
-            for line in lines:
-                if line.strip():
-                    english_name = line.strip()
-                    break
 
-        if english_name:
-            return english_name
-        else:
-            return result  # 返回完整结果
+def graphql_headers(client_version, extra_headers=None):
+    """
+    构建IGN GraphQL API的请求头
+    """
+    return {
+        "accept": "*/*",
+        "accept-language": "zh-CN,zh;q=0.9",
+        "apollographql-client-name": "kraken",
+        "apollographql-client-version": client_version,
+        "content-type": "application/json",
+        "user-agent":
+        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36",
+        **(extra_headers or {})
+    }
 
-    except Exception as e:
-        print(f"查找游戏英文名过程中出错: {e}")
-        return None
 
+def graphql_get(operation, variables, extra_headers=None):
+    """
+    以持久化查询的方式调用IGN GraphQL API
+    服务器返回PersistedQueryNotFound时，重新获取查询哈希并重试一次
+
+    参数:
+        operation (str): 操作名，如 SearchObjectsByName
+        variables (dict): 查询变量
+        extra_headers (dict, optional): 附加的请求头（如条件请求头）
+
+    返回:
+        tuple: (响应对象, 解析后的JSON；304时为None)
+
+    异常:
+        requests.RequestException: 请求失败或响应不是JSON
+    """
+    from query_hashes import get_query_hashes, is_not_found
+
+    config = load_config()
+    api_url = config.get("graphql", {}).get(
+        "url", "https://mollusk.apis.ign.com/graphql")
+    query_hashes = get_query_hashes(config)
+
+    for attempt in range(2):
+        params = {
+            "operationName": operation,
+            "variables": json.dumps(variables),
+            "extensions": json.dumps({
+                "persistedQuery": {
+                    "version": 1,
+                    "sha256Hash": query_hashes.get(operation)
+                }
+            })
+        }
+        response = http_session().get(api_url,
+                                      params=params,
+                                      headers=graphql_headers(
+                                          query_hashes.client_version,
+                                          extra_headers),
+                                      timeout=request_timeout())
+        if response.status_code == 304:
+            return response, None
+        try:
+            data = response.json()
+        except ValueError:
+            # 非JSON响应优先按HTTP状态报错
+            response.raise_for_status()
+            raise
+
+        if attempt == 0 and is_not_found(data):
+            logger.warning("GraphQL查询 %s 的哈希已失效", operation)
+            if query_hashes.refresh():
+                continue
+        return response, data
 
-def search_ign(game_name_en):
+
+def search_ign(game_name_en, interactive=True):
     """
     在IGN网站搜索游戏并返回可能的游戏列表
     使用IGN的GraphQL API进行搜索，返回所有可能的匹配结果
+    interactive为False时（如批量查询）不询问用户，直接选择相似度最高的游戏
+    预热过的详情缓存中有唯一同名游戏时直接返回其URL，不再请求IGN
     """
-    # GraphQL API URL
-    api_url = "https://mollusk.apis.ign.com/graphql"
+    detail_cache = get_detail_cache()
+    if detail_cache is not None:
+        game_url = detail_cache.cached_url(game_name_en)
+        if game_url:
+            metrics.incr("prewarm.title_hits")
+            logger.debug("在预热缓存中找到游戏 '%s': %s", game_name_en, game_url)
+            return game_url
 
     # 构建GraphQL查询参数
     variables = {"term": game_name_en, "count": 20, "objectType": "Game"}
 
-    # 查询参数
-    params = {
-        "operationName":
-        "SearchObjectsByName",
-        "variables":
-        json.dumps(variables),
-        "extensions":
-        json.dumps({
-            "persistedQuery": {
-                "version":
-                1,
-                "sha256Hash":
-                "e1c2e012a21b4a98aaa618ef1b43eb0cafe9136303274a34f5d9ea4f2446e884"
-            }
-        })
-    }
-
-    # 请求头
-    headers = {
-        "accept":
-        "*/*",
-        "accept-language":
-        "zh-CN,zh;q=0.9",
-        "apollographql-client-name":
-        "kraken",
-        "apollographql-client-version":
-        "v0.90.0",
-        "content-type":
-        "application/json",
-        "user-agent":
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36"
-    }
-
     try:
-        # 发送GraphQL请求
-        response = requests.get(api_url, params=params, headers=headers)
+        # 发送GraphQL请求，查询哈希失效时会自动更新后重试
+        response, data = graphql_get("SearchObjectsByName", variables)
         response.raise_for_status()
 
-        # 解析JSON响应
-        data = response.json()
-
         # 检查是否有搜索结果
         if "data" in data and "searchObjectsByName" in data[
                 "data"] and "objects" in data["data"]["searchObjectsByName"]:
@@ -370,37 +413,44 @@ def search_ign(game_name_en):
                                     reverse=True)
 
                 # 如果找到多个可能的游戏，让用户选择
-                if len(possible_games) > 1:
-                    print("\n找到多个可能的游戏，请选择：")
+                if len(possible_games) > 1 and interactive:
+                    # 选择菜单输出到标准错误，标准输出只用于查询结果
+                    print("\n找到多个可能的游戏，请选择：", file=sys.stderr)
                     for i, game in enumerate(possible_games, 1):
                         print(
-                            f"{i}. {game['name']} (相似度: {game['similarity']:.2f})"
-                        )
-                        print(f"   发售日期: {game['release_date']}")
-                        print(f"   平台: {', '.join(game['platforms'])}")
-                        print(f"   URL: {game['url']}\n")
+                            f"{i}. {game['name']} (相似度: {game['similarity']:.2f})",
+                            file=sys.stderr)
+                        print(f"   发售日期: {game['release_date']}",
+                              file=sys.stderr)
+                        print(f"   平台: {', '.join(game['platforms'])}",
+                              file=sys.stderr)
+                        print(f"   URL: {game['url']}\n", file=sys.stderr)
 
                     while True:
                         try:
-                            choice = int(input("请输入选择的游戏编号: "))
+                            print("请输入选择的游戏编号: ",
+                                  end='',
+                                  file=sys.stderr,
+                                  flush=True)
+                            choice = int(input())
                             if 1 <= choice <= len(possible_games):
                                 return possible_games[choice - 1]["url"]
                             else:
-                                print("无效的选择，请重新输入")
+                                print("无效的选择，请重新输入", file=sys.stderr)
                         except ValueError:
-                            print("请输入有效的数字")
+                            print("请输入有效的数字", file=sys.stderr)
 
                 # 如果只有一个游戏，直接返回
                 return possible_games[0]["url"]
 
-        print(f"在IGN上未找到游戏 '{game_name_en}' 的详情页")
+        logger.info("在IGN上未找到游戏 '%s' 的详情页", game_name_en)
         return None
 
     except requests.RequestException as e:
-        print(f"搜索IGN时出错: {e}")
+        logger.warning("搜索IGN时出错: %s", e)
         return None
     except (KeyError, json.JSONDecodeError) as e:
-        print(f"解析IGN API响应时出错: {e}")
+        logger.warning("解析IGN API响应时出错: %s", e)
         return None
 
 
@@ -432,347 +482,566 @@ def calculate_similarity(str1, str2):
     return intersection / union if union > 0 else 0.0
 
 
-def get_game_details(game_url):
+def get_game_details(game_url, validators=None, parse_executor=None):
     """
     从IGN游戏详情页获取信息
-    使用GraphQL API获取详细信息，包括游戏封面图
+    使用GraphQL API获取详细信息，包括游戏封面图，失败时回退到网页爬取
+
+    传入上次结果中的validators（ETag/Last-Modified）时发送条件请求，
+    服务器返回304时返回 {"url": game_url, "not_modified": True}
+
+    传入parse_executor（如ProcessPoolExecutor）时，回退的HTML解析在该执行器中进行
+
+    没有validators时优先使用预热过的详情缓存（prewarm.max_age_days 内获取的）
     """
     if not game_url:
         return None
 
-    # 从URL中提取游戏slug
-    import re
-    slug_match = re.search(r'/games/([^/]+)', game_url)
-    if not slug_match:
-        print(f"无法从URL中提取游戏ID: {game_url}")
+    game_slug = extract_slug(game_url)
+    if not game_slug:
+        logger.warning("无法从URL中提取游戏ID: %s", game_url)
         return None
 
-    game_slug = slug_match.group(1)
+    detail_cache = None if validators else get_detail_cache()
+    if detail_cache is not None:
+        game_details = detail_cache.cached_details(
+            game_slug,
+            load_config().get("prewarm", {}).get("max_age_days"))
+        if game_details:
+            metrics.incr("prewarm.detail_hits")
+            logger.debug("使用预热缓存中的游戏详情: %s", game_url)
+            return game_details
+
+    # 首先尝试使用GraphQL API获取详细信息
+    game_details = fetch_details_graphql(game_url, validators)
+    if game_details:
+        return game_details
+
+    # 如果API调用失败，回退到网页爬取方法
+    logger.info("尝试通过网页爬取获取游戏详情: %s", game_url)
+    return fetch_details_html(game_url, validators, parse_executor)
+
+
+def extract_slug(game_url):
+    """
+    从IGN详情页URL中提取游戏slug
+    """
+    slug_match = re.search(r'/games/([^/?#]+)', game_url or '')
+    return slug_match.group(1) if slug_match else None
+
+
+def _conditional_headers(validators):
+    """
+    根据上次记录的校验信息构建条件请求头，内容未变化时服务器只返回304
+    """
+    conditional_headers = {}
+    if validators:
+        if validators.get('etag'):
+            conditional_headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            conditional_headers['If-Modified-Since'] = validators[
+                'last_modified']
+    return conditional_headers
+
+
+def fetch_details_graphql(game_url, validators=None, batched=None):
+    """
+    通过IGN的GraphQL API获取游戏详情
+
+    参数:
+        game_url (str): 游戏详情页URL
+        validators (dict, optional): 上次记录的ETag/Last-Modified
+        batched (bool, optional): 是否与其他线程的请求合并为批量请求，
+            为None时在没有validators且启用了 graphql.batch 时合并
+
+    返回:
+        dict: 游戏详情，API调用失败或没有数据时返回None
+    """
+    game_slug = extract_slug(game_url)
+    if not game_slug:
+        return None
 
-    # GraphQL API URL
-    api_url = "https://mollusk.apis.ign.com/graphql"
+    if batched is None:
+        batched = not validators and load_config().get("graphql", {}).get(
+            "batch", {}).get("enabled", False)
+    if batched:
+        from graphql_batch import get_loader
+        return get_loader().fetch(game_url)
 
     # 构建GraphQL查询参数 - 使用游戏slug获取详细信息
     variables = {"slug": game_slug}
 
-    # 查询参数 - 使用getObjectBySlug操作获取详细信息
-    params = {
-        "operationName":
-        "GetObjectBySlug",
-        "variables":
-        json.dumps(variables),
-        "extensions":
-        json.dumps({
-            "persistedQuery": {
-                "version":
-                1,
-                "sha256Hash":
-                "e8a0b931f1c950df2bac5f0291ed08fe7c5cbc519a73fd4a20dc61c4996d3b4f"
-            }
-        })
-    }
+    # 持久化查询失效等情况下接口会持续失败，熔断后直接回退到网页爬取
+    breaker = get_breaker("ign_graphql")
+    if not breaker.allow():
+        logger.debug("IGN GraphQL接口已熔断，跳过")
+        return None
 
-    # 请求头
-    headers = {
-        "accept":
-        "*/*",
-        "accept-language":
-        "zh-CN,zh;q=0.9",
-        "apollographql-client-name":
-        "kraken",
-        "apollographql-client-version":
-        "v0.90.0",
-        "content-type":
-        "application/json",
-        "user-agent":
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36"
-    }
+    try:
+        response, data = graphql_get("GetObjectBySlug", variables,
+                                     _conditional_headers(validators))
+        if response.status_code == 304:
+            breaker.record_success()
+            logger.debug("游戏详情未变化: %s", game_url)
+            return {'url': game_url, 'not_modified': True}
+        response.raise_for_status()
+    except (requests.RequestException, ValueError) as e:
+        if is_upstream_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        logger.warning("通过GraphQL API获取游戏详情时出错: %s", e)
+        return None
+
+    # 返回errors而没有数据（如PersistedQueryNotFound）说明查询本身不可用
+    if data.get("errors") and not (data.get("data")
+                                   or {}).get("getObjectBySlug"):
+        breaker.record_failure()
+        logger.warning("IGN GraphQL接口返回错误: %s",
+                       data['errors'][0].get('message'))
+        return None
+    breaker.record_success()
 
     try:
-        # 首先尝试使用GraphQL API获取详细信息
-        try:
-            response = requests.get(api_url, params=params, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+        # 如果API调用成功并返回了游戏数据，解析它
+        if "data" in data and "getObjectBySlug" in data["data"] and data[
+                "data"]["getObjectBySlug"]:
+            game_details = parse_graphql_game(data["data"]["getObjectBySlug"],
+                                              game_url)
 
-            # 如果API调用成功并返回了游戏数据，解析它
-            if "data" in data and "getObjectBySlug" in data["data"] and data[
-                    "data"]["getObjectBySlug"]:
-                game_data = data["data"]["getObjectBySlug"]
-
-                # 提取游戏信息
-                game_details = {}
-
-                # 获取游戏英文名
-                if "metadata" in game_data and "names" in game_data["metadata"]:
-                    game_details['english_name'] = game_data["metadata"][
-                        "names"]["name"]
-
-                # 获取封面图URL
-                if "metadata" in game_data and "imageUrl" in game_data[
-                        "metadata"]:
-                    game_details['cover_image'] = game_data["metadata"][
-                        "imageUrl"]
-                elif "promoImages" in game_data and len(
-                        game_data["promoImages"]) > 0:
-                    for image in game_data["promoImages"]:
-                        if "url" in image:
-                            game_details['cover_image'] = image["url"]
-                            break
-
-                # 获取平台信息
-                if "objectRegions" in game_data and len(
-                        game_data["objectRegions"]) > 0:
-                    platforms = []
-                    for region in game_data["objectRegions"]:
-                        if "releases" in region and len(
-                                region["releases"]) > 0:
-                            for release in region["releases"]:
-                                if "platformAttributes" in release:
-                                    for platform in release[
-                                            "platformAttributes"]:
-                                        if "name" in platform and platform[
-                                                "name"] not in platforms:
-                                            platforms.append(platform["name"])
-                    game_details['platforms'] = platforms
-
-                # 获取发售日期
-                release_date = "未知"
-                if "objectRegions" in game_data and len(
-                        game_data["objectRegions"]) > 0:
-                    for region in game_data["objectRegions"]:
-                        if "releases" in region and len(
-                                region["releases"]) > 0:
-                            for release in region["releases"]:
-                                if "date" in release and release["date"]:
-                                    release_date = release["date"]
-                                    break
-                            if release_date != "未知":
-                                break
-                game_details['release_date'] = release_date
-
-                # 获取评分
-                if "reviewObject" in game_data and game_data[
-                        "reviewObject"] and "score" in game_data[
-                            "reviewObject"]:
-                    game_details['score'] = str(
-                        game_data["reviewObject"]["score"])
-                else:
-                    game_details['score'] = "未评分"
-
-                # 添加详情页URL
-                game_details['url'] = game_url
-
-                return game_details
-        except (requests.RequestException, KeyError,
-                json.JSONDecodeError) as e:
-            print(f"通过GraphQL API获取游戏详情时出错: {e}")
-            # 如果API调用失败，回退到网页爬取方法
-            print("尝试通过网页爬取获取游戏详情...")
-
-        # 回退方法：通过网页爬取获取游戏详情
-        response = requests.get(
+            # 记录缓存校验信息，供下次刷新时发送条件请求
+            response_validators = _response_validators(response)
+            if response_validators:
+                game_details['validators'] = response_validators
+
+            return game_details
+    except (KeyError, TypeError) as e:
+        logger.warning("解析GraphQL API响应时出错: %s", e)
+    return None
+
+
+def parse_graphql_game(game_data, game_url):
+    """
+    解析GraphQL API返回的游戏对象
+
+    参数:
+        game_data (dict): getObjectBySlug返回的游戏对象
+        game_url (str): 游戏详情页URL
+
+    返回:
+        dict: 游戏详情
+    """
+    # 提取游戏信息
+    game_details = {}
+
+    # 获取游戏英文名
+    if "metadata" in game_data and "names" in game_data["metadata"]:
+        game_details['english_name'] = game_data["metadata"]["names"]["name"]
+
+    # 获取封面图URL
+    if "metadata" in game_data and "imageUrl" in game_data["metadata"]:
+        game_details['cover_image'] = game_data["metadata"]["imageUrl"]
+    elif "promoImages" in game_data and len(game_data["promoImages"]) > 0:
+        for image in game_data["promoImages"]:
+            if "url" in image:
+                game_details['cover_image'] = image["url"]
+                break
+
+    # 获取平台信息
+    if "objectRegions" in game_data and len(game_data["objectRegions"]) > 0:
+        platforms = []
+        for region in game_data["objectRegions"]:
+            if "releases" in region and len(region["releases"]) > 0:
+                for release in region["releases"]:
+                    if "platformAttributes" in release:
+                        for platform in release["platformAttributes"]:
+                            if "name" in platform and platform[
+                                    "name"] not in platforms:
+                                platforms.append(platform["name"])
+        game_details['platforms'] = platforms
+
+    # 获取发售日期
+    release_date = "未知"
+    if "objectRegions" in game_data and len(game_data["objectRegions"]) > 0:
+        for region in game_data["objectRegions"]:
+            if "releases" in region and len(region["releases"]) > 0:
+                for release in region["releases"]:
+                    if "date" in release and release["date"]:
+                        release_date = release["date"]
+                        break
+                if release_date != "未知":
+                    break
+    game_details['release_date'] = release_date
+
+    # 获取评分
+    if "reviewObject" in game_data and game_data[
+            "reviewObject"] and "score" in game_data["reviewObject"]:
+        game_details['score'] = str(game_data["reviewObject"]["score"])
+    else:
+        game_details['score'] = "未评分"
+
+    # 添加详情页URL
+    game_details['url'] = game_url
+
+    return game_details
+
+
+def fetch_details_html(game_url, validators=None, parse_executor=None):
+    """
+    通过爬取IGN详情页获取游戏详情
+
+    参数:
+        game_url (str): 游戏详情页URL
+        validators (dict, optional): 上次记录的ETag/Last-Modified
+        parse_executor (Executor, optional): 执行HTML解析的进程池
+
+    返回:
+        dict: 游戏详情，请求失败时返回None
+    """
+    breaker = get_breaker("ign_html")
+    if not breaker.allow():
+        logger.debug("IGN网页接口已熔断，跳过")
+        return None
+
+    try:
+        response = http_session().get(
             game_url,
             headers={
                 'User-Agent':
-                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            })
+                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+                **_conditional_headers(validators)
+            },
+            timeout=request_timeout())
+        if response.status_code == 304:
+            breaker.record_success()
+            logger.debug("游戏详情未变化: %s", game_url)
+            return {'url': game_url, 'not_modified': True}
         response.raise_for_status()
+        breaker.record_success()
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        game_details = _run_parser(parse_game_html, parse_executor,
+                                   response.text, game_url)
 
-        # 提取游戏信息
-        game_details = {}
+        # 记录缓存校验信息，供下次刷新时发送条件请求
+        response_validators = _response_validators(response)
+        if response_validators:
+            game_details['validators'] = response_validators
 
-        # 获取游戏英文名
-        title_element = soup.select_one('h1')
-        if title_element:
-            game_details['english_name'] = title_element.text.strip()
-        else:
-            # 尝试从title标签获取
-            title_tag = soup.select_one('title')
-            if title_tag:
-                title_text = title_tag.text.strip()
-                # 通常格式为"游戏名 - IGN"
-                if " - IGN" in title_text:
-                    game_details['english_name'] = title_text.replace(
-                        " - IGN", "").strip()
-
-        # 获取封面图URL
-        # 尝试多种可能的选择器来获取封面图
-        cover_image = None
-        # 尝试获取主图片
-        main_image = soup.select_one('meta[property="og:image"]')
-        if main_image and main_image.get('content'):
-            cover_image = main_image.get('content')
-
-        # 如果没有找到，尝试其他选择器
-        if not cover_image:
-            image_element = soup.select_one('.article-header img')
-            if image_element and image_element.get('src'):
-                cover_image = image_element.get('src')
-
-        # 如果仍然没有找到，尝试更多选择器
-        if not cover_image:
-            image_element = soup.select_one('.grid-image-container img')
-            if image_element and image_element.get('src'):
-                cover_image = image_element.get('src')
-
-        if cover_image:
-            game_details['cover_image'] = cover_image
+        return game_details
+
+    except requests.RequestException as e:
+        if is_upstream_failure(e):
+            breaker.record_failure()
         else:
-            game_details['cover_image'] = "未找到封面图"
+            breaker.record_success()
+        logger.warning("获取游戏详情时出错: %s", e)
+        return None
 
-        # 获取平台信息 - 从meta标签中提取
-        platforms = []
-        keywords_meta = soup.select_one('meta[name="cXenseParse:keywords"]')
-        if keywords_meta and keywords_meta.get('content'):
-            # 格式通常为",游戏名,平台1,平台2,..."
-            keywords = keywords_meta.get('content').split(',')
-            # 第一个元素通常是空的，第二个是游戏名，之后的都是平台
-            if len(keywords) > 2:
-                platforms = [
-                    platform.strip() for platform in keywords[2:]
-                    if platform.strip()
-                ]
-
-        # 如果meta标签中没有找到，尝试其他选择器
-        if not platforms:
-            platforms_element = soup.select_one('div[data-testid="platforms"]')
-            if platforms_element:
-                platforms = [
-                    platform.text.strip()
-                    for platform in platforms_element.select('span')
-                ]
-            else:
-                platform_elements = soup.select('.platformsText span')
-                if platform_elements:
-                    platforms = [p.text.strip() for p in platform_elements]
 
-        game_details['platforms'] = platforms
+def parse_game_html(html, game_url):
+    """
+    解析IGN游戏详情页HTML，提取游戏信息
+    纯CPU计算，不依赖网络，可以放到进程池中执行
 
-        # 获取发售日期 - 尝试多种选择器和模式
-        release_date = "未知"
-
-        # 尝试查找包含"Release Date"的元素
-        release_elements = soup.find_all(
-            string=lambda text: text and "Release Date" in text)
-        for element in release_elements:
-            parent = element.parent
-            if parent:
-                # 查找相邻的日期文本
-                next_sibling = parent.next_sibling
-                if next_sibling and next_sibling.string and next_sibling.string.strip(
-                ):
-                    release_date = next_sibling.string.strip()
-                    break
-                # 或者查找父元素的下一个元素
-                next_element = parent.find_next()
-                if next_element and next_element.string and next_element.string.strip(
-                ):
-                    release_date = next_element.string.strip()
-                    break
+    参数:
+        html (str): 详情页HTML
+        game_url (str): 详情页URL
 
-        # 如果上面的方法没有找到，尝试其他选择器
-        if release_date == "未知":
-            release_date_element = soup.select_one(
-                'div[data-testid="release-date"]')
-            if release_date_element:
-                release_date = release_date_element.text.strip()
-            else:
-                release_date_div = soup.select_one('.releaseDate')
-                if release_date_div:
-                    release_date = release_date_div.text.strip()
-
-        game_details['release_date'] = release_date
-
-        # 获取评分 - 尝试多种选择器和模式
-        score = "未评分"
-
-        # 尝试查找包含评分的元素
-        score_elements = soup.find_all(
-            ['div', 'span'],
-            class_=lambda c: c and
-            ('score' in c.lower() or 'rating' in c.lower()))
-        for element in score_elements:
-            if element.text and element.text.strip() and element.text.strip(
-            ).replace('.', '').isdigit():
-                score = element.text.strip()
+    返回:
+        dict: 游戏详情
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # 提取游戏信息
+    game_details = {}
+
+    # 获取游戏英文名
+    title_element = soup.select_one('h1')
+    if title_element:
+        game_details['english_name'] = title_element.text.strip()
+    else:
+        # 尝试从title标签获取
+        title_tag = soup.select_one('title')
+        if title_tag:
+            title_text = title_tag.text.strip()
+            # 通常格式为"游戏名 - IGN"
+            if " - IGN" in title_text:
+                game_details['english_name'] = title_text.replace(
+                    " - IGN", "").strip()
+
+    # 获取封面图URL
+    # 尝试多种可能的选择器来获取封面图
+    cover_image = None
+    # 尝试获取主图片
+    main_image = soup.select_one('meta[property="og:image"]')
+    if main_image and main_image.get('content'):
+        cover_image = main_image.get('content')
+
+    # 如果没有找到，尝试其他选择器
+    if not cover_image:
+        image_element = soup.select_one('.article-header img')
+        if image_element and image_element.get('src'):
+            cover_image = image_element.get('src')
+
+    # 如果仍然没有找到，尝试更多选择器
+    if not cover_image:
+        image_element = soup.select_one('.grid-image-container img')
+        if image_element and image_element.get('src'):
+            cover_image = image_element.get('src')
+
+    if cover_image:
+        game_details['cover_image'] = cover_image
+    else:
+        game_details['cover_image'] = "未找到封面图"
+
+    # 获取平台信息 - 从meta标签中提取
+    platforms = []
+    keywords_meta = soup.select_one('meta[name="cXenseParse:keywords"]')
+    if keywords_meta and keywords_meta.get('content'):
+        # 格式通常为",游戏名,平台1,平台2,..."
+        keywords = keywords_meta.get('content').split(',')
+        # 第一个元素通常是空的，第二个是游戏名，之后的都是平台
+        if len(keywords) > 2:
+            platforms = [
+                platform.strip() for platform in keywords[2:]
+                if platform.strip()
+            ]
+
+    # 如果meta标签中没有找到，尝试其他选择器
+    if not platforms:
+        platforms_element = soup.select_one('div[data-testid="platforms"]')
+        if platforms_element:
+            platforms = [
+                platform.text.strip()
+                for platform in platforms_element.select('span')
+            ]
+        else:
+            platform_elements = soup.select('.platformsText span')
+            if platform_elements:
+                platforms = [p.text.strip() for p in platform_elements]
+
+    game_details['platforms'] = platforms
+
+    # 获取发售日期 - 尝试多种选择器和模式
+    release_date = "未知"
+
+    # 尝试查找包含"Release Date"的元素
+    release_elements = soup.find_all(
+        string=lambda text: text and "Release Date" in text)
+    for element in release_elements:
+        parent = element.parent
+        if parent:
+            # 查找相邻的日期文本
+            next_sibling = parent.next_sibling
+            if next_sibling and next_sibling.string and next_sibling.string.strip(
+            ):
+                release_date = next_sibling.string.strip()
+                break
+            # 或者查找父元素的下一个元素
+            next_element = parent.find_next()
+            if next_element and next_element.string and next_element.string.strip(
+            ):
+                release_date = next_element.string.strip()
                 break
 
-        # 如果上面的方法没有找到，尝试其他选择器
-        if score == "未评分":
-            score_element = soup.select_one('span[data-testid="score"]')
-            if score_element:
-                score = score_element.text.strip()
-            else:
-                score_box = soup.select_one('.scoreBox-score')
-                if score_box:
-                    score = score_box.text.strip()
+    # 如果上面的方法没有找到，尝试其他选择器
+    if release_date == "未知":
+        release_date_element = soup.select_one(
+            'div[data-testid="release-date"]')
+        if release_date_element:
+            release_date = release_date_element.text.strip()
+        else:
+            release_date_div = soup.select_one('.releaseDate')
+            if release_date_div:
+                release_date = release_date_div.text.strip()
+
+    game_details['release_date'] = release_date
+
+    # 获取评分 - 尝试多种选择器和模式
+    score = "未评分"
+
+    # 尝试查找包含评分的元素
+    score_elements = soup.find_all(
+        ['div', 'span'],
+        class_=lambda c: c and
+        ('score' in c.lower() or 'rating' in c.lower()))
+    for element in score_elements:
+        if element.text and element.text.strip() and element.text.strip(
+        ).replace('.', '').isdigit():
+            score = element.text.strip()
+            break
+
+    # 如果上面的方法没有找到，尝试其他选择器
+    if score == "未评分":
+        score_element = soup.select_one('span[data-testid="score"]')
+        if score_element:
+            score = score_element.text.strip()
+        else:
+            score_box = soup.select_one('.scoreBox-score')
+            if score_box:
+                score = score_box.text.strip()
 
-        game_details['score'] = score
+    game_details['score'] = score
 
-        # 添加详情页URL
-        game_details['url'] = game_url
+    # 添加详情页URL
+    game_details['url'] = game_url
 
-        return game_details
+    return game_details
 
-    except requests.RequestException as e:
-        print(f"获取游戏详情时出错: {e}")
-        return None
 
+def _run_parser(parser, parse_executor, *args):
+    """
+    执行解析函数，提供进程池时在子进程中执行，避免CPU密集的解析阻塞网络I/O线程
+    """
+    if parse_executor is None:
+        return parser(*args)
+    return parse_executor.submit(parser, *args).result()
 
-def get_game_details_llm(game_url, api_key=None, api_base=None, model=None):
+
+def _response_validators(response):
     """
-    通过火山引擎API获取游戏详情
-    使用Jina处理后的URL和火山引擎API来解析游戏信息
+    从响应头中提取ETag和Last-Modified
     """
-    import json
-    import os
+    validators = {}
+    if response.headers.get('ETag'):
+        validators['etag'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        validators['last_modified'] = response.headers['Last-Modified']
+    return validators
 
-    from config import load_config
 
-    # 加载配置
-    config = load_config()
-    llm_config = config.get("llm", {})
-    api_config = llm_config.get("api", {})
+# Jina页面内容中各项游戏信息的特征，全部出现后即可停止读取
+JINA_MARKERS = {
+    'title': re.compile(r'^Title:', re.MULTILINE),
+    'image': re.compile(r'!\[[^\]]*\]\(https?://'),
+    'platforms': re.compile(r'PlayStation|Xbox|Nintendo|\bPC\b'),
+    'release_date': re.compile(r'Release Date|Released|Coming'),
+}
 
-    # 获取API密钥
-    if not api_key:
-        api_key = api_config.get("api_key", "")
-        if not api_key:
-            api_key = os.environ.get("HUOSHAN_API_KEY", "")
 
-    if not api_key:
-        print("错误: 未设置火山引擎API密钥")
-        return None
+def fetch_jina_content(game_url, config=None):
+    """
+    流式获取Jina处理后的页面内容
+    游戏信息通常位于页面开头，读取到所有关键信息后再多读一小段即停止，
+    并且最多只读取 jina.max_bytes 字节，避免下载和保存整个页面
+
+    参数:
+        game_url (str): 游戏详情页URL
+        config (dict, optional): 配置字典，为None时加载默认配置
+
+    返回:
+        str: 页面内容（可能被截断）
+    """
+    if config is None:
+        from config import load_config
+        config = load_config()
+
+    jina_config = config.get("jina", {})
+    max_bytes = jina_config.get("max_bytes", 65536)
+    tail_bytes = jina_config.get("tail_bytes", 4096)
+    chunk_size = jina_config.get("chunk_size", 8192)
+
+    jina_url = jina_config.get("base_url", "https://r.jina.ai/") + game_url
+    logger.debug("正在获取Jina处理后的页面内容: %s", jina_url)
+
+    chunks = []
+    received = 0
+    stop_at = max_bytes
+    pending_markers = set(JINA_MARKERS)
+    with http_session().get(jina_url, stream=True,
+                            timeout=request_timeout()) as response:
+        response.raise_for_status()
+        # 未声明charset时按UTF-8解码（requests对text/*默认使用ISO-8859-1）
+        encoding = 'utf-8'
+        if 'charset' in response.headers.get('Content-Type', ''):
+            encoding = response.encoding or encoding
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            if not chunk:
+                continue
+            chunk = chunk[:stop_at - received]
+            received += len(chunk)
+            text = decoder.decode(chunk)
+            chunks.append(text)
+
+            if pending_markers:
+                # 与上一块的结尾拼接检查，避免特征跨块被截断
+                window = chunks[-2][-64:] + text if len(chunks) > 1 else text
+                pending_markers = {
+                    name
+                    for name in pending_markers
+                    if not JINA_MARKERS[name].search(window)
+                }
+                if not pending_markers:
+                    stop_at = min(max_bytes, received + tail_bytes)
+
+            if received >= stop_at:
+                logger.debug("已获取足够的页面内容，提前结束读取（%d 字节）", received)
+                break
+            deadline = current_deadline()
+            if deadline is not None and deadline.expired():
+                logger.info("查询时限已到，提前结束读取（%d 字节）", received)
+                break
+        chunks.append(decoder.decode(b'', final=True))
+
+    return ''.join(chunks)
 
-    # 设置API基础URL
-    if not api_base:
-        api_base = api_config.get("api_base", "")
-        if not api_base:
-            api_base = "https://ark.cn-beijing.volces.com/api/v3/chat/completions"
 
-    # 设置模型
-    if not model:
-        model = api_config.get("model", "")
-        if not model:
-            model = "ep-20250205181853-r9rxr"  # 使用不联网的模型
+def preprocess_jina_content(page_content):
+    """
+    精简Jina处理后的页面内容，减少发送给LLM的token数
+    去掉普通链接的URL和图片URL中的多余参数，合并空行和重复行
+    纯CPU计算，可以放到进程池中执行
 
-    # 设置温度和最大token数
-    temperature = api_config.get("temperature", 0.3)
-    max_tokens = api_config.get("max_tokens", 1000)
+    参数:
+        page_content (str): Jina返回的Markdown内容
 
-    # 构建Jina处理后的URL
-    jina_url = f"https://r.jina.ai/{game_url}"
+    返回:
+        str: 精简后的内容
+    """
+    # 图片链接保留地址但去掉查询参数，普通链接只保留文字
+    page_content = re.sub(r'(!\[[^\]]*\]\([^)?\s]+)\?[^)\s]*', r'\1',
+                          page_content)
+    page_content = re.sub(r'(?<!!)\[([^\]]*)\]\([^)]*\)', r'\1', page_content)
+
+    lines = []
+    for line in page_content.splitlines():
+        line = line.strip()
+        # 跳过空行、纯符号行和连续重复的行
+        if not line or not re.search(r'\w', line):
+            continue
+        if lines and lines[-1] == line:
+            continue
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def get_game_details_llm(game_url,
+                         api_key=None,
+                         api_base=None,
+                         model=None,
+                         parse_executor=None):
+    """
+    通过LLM API获取游戏详情
+    使用Jina处理后的URL和 llm.api 配置的LLM服务来解析游戏信息
+    传入parse_executor时，页面内容的预处理在该执行器中进行
+    """
+    # 加载配置
+    config = load_config()
 
+    # 获取LLM提供商（复用长期存在的客户端）
     try:
-        # 获取Jina处理后的页面内容
-        print(f"\n正在获取Jina处理后的页面内容: {jina_url}")
-        response = requests.get(jina_url)
-        response.raise_for_status()
-        page_content = response.text
-        print(f"获取到的页面内容长度: {len(page_content)}")
+        provider = get_provider("api", config, api_key, api_base, model)
+    except LLMError as e:
+        logger.error("%s", e)
+        return None
+
+    try:
+        # 获取Jina处理后的页面内容（流式读取，获取到足够信息后提前结束）
+        page_content = fetch_jina_content(game_url, config)
+        page_content = _run_parser(preprocess_jina_content, parse_executor,
+                                   page_content)
+        logger.debug("获取到的页面内容长度: %d", len(page_content))
 
         # 构建系统提示
         system_prompt = """你是一个专业的游戏信息提取助手。请从以下网页内容中提取游戏信息，并以JSON格式返回。
@@ -786,119 +1055,232 @@ def get_game_details_llm(game_url, api_key=None, api_base=None, model=None):
 
 请确保提取的信息准确无误。如果某些信息无法找到，请使用"未知"或"未评分"等默认值。"""
 
+        # 页面内容没有实质变化时使用之前的解析结果
+        cache = get_extraction_cache(config)
+        key = cache_key(page_content, provider.model, system_prompt)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                metrics.incr("llm.cache_hits")
+                logger.debug("页面内容未变化，使用缓存的解析结果")
+                return cached
+
         # 构建用户提示
         user_prompt = f"请从以下网页内容中提取游戏信息：\n\n{page_content}"
 
-        # 调用火山引擎API
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "model":
-            model,
-            "messages": [{
+        # 调用LLM API
+        try:
+            content = provider.complete([{
                 "role": "system",
                 "content": system_prompt
             }, {
                 "role": "user",
                 "content": user_prompt
-            }],
-            "temperature":
-            temperature,
-            "max_tokens":
-            max_tokens
-        }
-
-        response = requests.post(api_base, headers=headers, json=payload)
-        response.raise_for_status()
+            }])
+        except LLMError as e:
+            logger.warning("%s调用失败: %s", provider.label, e)
+            return None
 
-        result = response.json()
-
-        # 解析API响应
-        if "choices" in result and len(result["choices"]) > 0:
-            content = result["choices"][0]["message"]["content"]
-
-            try:
-                # 清理Markdown标记
-                if content.startswith('```json'):
-                    content = content[7:]  # 移除 ```json
-                if content.endswith('```'):
-                    content = content[:-3]  # 移除结尾的 ```
-                content = content.strip()
-
-                # 尝试解析JSON
-                game_details = json.loads(content)
-                # 确保所有必要字段都存在
-                required_fields = [
-                    'english_name', 'cover_image', 'platforms', 'release_date',
-                    'score', 'url'
-                ]
-                for field in required_fields:
-                    if field not in game_details:
-                        game_details[
-                            field] = "未知" if field != 'score' else "未评分"
-                return game_details
-            except json.JSONDecodeError as e:
-                print(f"\nJSON解析错误: {e}")
-                print(f"原始内容: {content}")
-                return None
-        else:
-            print("\n错误: API返回的响应格式不正确")
-            print(f"完整响应: {result}")
+        # 解析API响应（容忍代码块、前后的说明文字、单引号和多余的逗号）
+        game_details = extract_json(content)
+        if game_details is None:
+            logger.warning("LLM返回的内容中没有有效的JSON")
+            logger.debug("原始内容: %s", content)
             return None
 
+        # 确保所有必要字段都存在
+        required_fields = [
+            'english_name', 'cover_image', 'platforms', 'release_date',
+            'score', 'url'
+        ]
+        for field in required_fields:
+            if field not in game_details:
+                game_details[field] = "未知" if field != 'score' else "未评分"
+        if cache is not None:
+            cache.put(key, game_details, game_url, provider.model)
+        return game_details
+
     except Exception as e:
-        print(f"\n通过火山引擎API获取游戏详情时出错: {e}")
-        import traceback
-        print(f"错误堆栈: {traceback.format_exc()}")
+        logger.warning("通过LLM API获取游戏详情时出错: %s",
+                       e,
+                       exc_info=logger.isEnabledFor(logging.DEBUG))
         return None
 
 
+def lookup_game(game_name_zh,
+                method='original',
+                interactive=True,
+                parse_executor=None,
+                timeout=None):
+    """
+    完整的查询流程：查找英文名、在IGN搜索、获取游戏详情
+
+    设置了总时限时，时限按 timeouts.stages 的比例分配给翻译、搜索和获取详情三个阶段，
+    所有请求的超时都不超过所在阶段的剩余时间。时限用完时不再继续后面的步骤，
+    返回带有 status: "timeout" 的部分结果
+
+    参数:
+        game_name_zh (str): 中文游戏名
+        method (str, optional): 获取详情的方法，original、llm 或 multi（多数据源）
+        interactive (bool, optional): 搜索到多个结果时是否让用户选择，
+            为False时自动选择相似度最高的结果
+        parse_executor (Executor, optional): 执行页面解析的进程池
+        timeout (float, optional): 总时限（秒），为None时使用 timeouts.lookup
+
+    返回:
+        dict: 游戏详情，任一步骤失败时返回None，超时时返回部分结果
+    """
+    timeouts = load_config().get("timeouts", {})
+    if timeout is None:
+        timeout = timeouts.get("lookup")
+    deadline = Deadline(timeout, timeouts.get("stages")) if timeout else None
+    found = {}
+
+    with usage.track():
+        return _lookup_stages(game_name_zh, method, interactive, parse_executor,
+                              deadline, found)
+
+
+def _lookup_stages(game_name_zh, method, interactive, parse_executor, deadline,
+                   found):
+    """
+    lookup_game的各个步骤，LLM调用的token计入当前查询的用量
+    """
+    try:
+        # 翻译成英文
+        logger.info("查找游戏 '%s' 的信息", game_name_zh)
+        with stage(deadline, "translate"):
+            game_name_en = translate_to_english(game_name_zh)
+        if not game_name_en:
+            logger.info("无法将游戏名翻译为英文: %s", game_name_zh)
+            return _timeout_record(game_name_zh, deadline, found)
+        logger.info("游戏英文名: %s", game_name_en)
+        found['translated_name'] = game_name_en
+
+        # 在IGN搜索游戏
+        logger.debug("在IGN搜索游戏信息")
+        with stage(deadline, "search"):
+            game_url = search_ign(game_name_en, interactive=interactive)
+        if not game_url:
+            logger.info("在IGN上未找到游戏信息: %s", game_name_en)
+            return _timeout_record(game_name_zh, deadline, found)
+        found['url'] = game_url
+
+        # 获取游戏详情
+        logger.debug("获取游戏详细信息: %s", game_url)
+        with stage(deadline, "details"):
+            if method == 'llm' and not usage.allow("api"):
+                # 超出token预算，直接从IGN获取详情
+                game_details = get_game_details(game_url,
+                                                parse_executor=parse_executor)
+            elif method == 'llm':
+                game_details = get_game_details_llm(
+                    game_url, parse_executor=parse_executor)
+            elif method == 'multi':
+                from sources import fetch_details
+                game_details = fetch_details(game_url,
+                                             parse_executor=parse_executor)
+            else:
+                game_details = get_game_details(game_url,
+                                                parse_executor=parse_executor)
+    except DeadlineExceeded as e:
+        logger.info("%s", e)
+        return _timeout_record(game_name_zh, deadline, found)
+
+    if not game_details:
+        logger.info("无法获取游戏详情: %s", game_name_zh)
+        return _timeout_record(game_name_zh, deadline, found)
+
+    # 添加原始中文名、翻译后的英文名和获取时间
+    game_details['chinese_name'] = game_name_zh
+    game_details['translated_name'] = game_name_en
+    game_details['fetched_at'] = now_iso()
+    # 规范化的发售日期、平台和评分，与原始值一起保存
+    game_details.update(normalize_details(game_details))
+
+    # 将确认过的英文名写入本地对照表
+    english_name = game_details.get('english_name')
+    if english_name and english_name != "未知":
+        learn_alias(game_name_zh, english_name)
+
+    return game_details
+
+
+def _timeout_record(game_name_zh, deadline, found):
+    """
+    步骤失败时，如果是因为时限用完，返回包含已获取信息的部分结果，否则返回None
+    部分结果不会写入对照表
+    """
+    if deadline is None or not deadline.exhausted_stage:
+        return None
+    logger.warning("查询 '%s' 的时限（%g秒）在%s阶段用完，返回部分结果", game_name_zh,
+                   deadline.seconds, deadline.exhausted_stage)
+    record = {'chinese_name': game_name_zh}
+    record.update(found)
+    record['status'] = 'timeout'
+    record['timeout_stage'] = deadline.exhausted_stage
+    record['fetched_at'] = now_iso()
+    return record
+
+
+def is_partial(record):
+    """
+    判断查询结果是否为超时产生的部分结果
+    """
+    return bool(record) and record.get('status') == 'timeout'
+
+
+def now_iso():
+    """
+    返回当前UTC时间的ISO 8601字符串
+    """
+    return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+
+
 def main():
     # 解析命令行参数
     parser = argparse.ArgumentParser(description='获取游戏信息并输出JSON')
     parser.add_argument('game_name', help='中文游戏名')
-    parser.add_argument('--debug', action='store_true', help='启用调试输出')
+    parser.add_argument('--debug', action='store_true', help='输出调试日志')
+    parser.add_argument('--log-format',
+                        choices=['text', 'json'],
+                        help='日志格式（默认使用logging.format），日志输出到标准错误')
     parser.add_argument('--method',
-                        choices=['original', 'llm'],
+                        choices=['original', 'llm', 'multi'],
                         default='original',
-                        help='选择获取游戏详情的方法: original(原始方法) 或 llm(使用火山引擎API)')
+                        help='选择获取游戏详情的方法: original(原始方法)、llm(使用LLM API) 或 multi(按details配置使用多个数据源)')
+    parser.add_argument('--download-cover',
+                        action='store_true',
+                        help='下载封面图到本地并生成缩略图')
+    parser.add_argument('--db', help='将结果保存到指定的SQLite数据库')
+    parser.add_argument('--timeout',
+                        type=parse_duration,
+                        help='单次查询的总时限，如 8s、500ms（默认使用timeouts.lookup）')
+    replay_group = parser.add_mutually_exclusive_group()
+    replay_group.add_argument('--record', help='将所有对外HTTP请求的响应录制到归档文件')
+    replay_group.add_argument('--replay', help='不访问网络，从归档文件回放响应')
     args = parser.parse_args()
+    config = load_config()
+    setup_logging(args.debug, args.log_format, config)
+    install_replay(args.record, args.replay, config)
 
-    # 获取中文游戏名
-    game_name_zh = args.game_name
-
-    # 翻译成英文
-    print(f"查找游戏 '{game_name_zh}' 的信息...")
-    game_name_en = translate_to_english(game_name_zh)
-    if not game_name_en:
-        print("无法将游戏名翻译为英文")
-        sys.exit(1)
-    print(f"游戏英文名: {game_name_en}")
-
-    # 在IGN搜索游戏
-    print("在IGN搜索游戏信息...")
-    game_url = search_ign(game_name_en)
-    if not game_url:
-        print("在IGN上未找到游戏信息")
-        sys.exit(1)
-
-    # 获取游戏详情
-    print("获取游戏详细信息...")
-    if args.method == 'llm':
-        game_details = get_game_details_llm(game_url)
-    else:
-        game_details = get_game_details(game_url)
-
+    game_details = lookup_game(args.game_name,
+                               method=args.method,
+                               timeout=args.timeout)
     if not game_details:
-        print("无法获取游戏详情")
         sys.exit(1)
-
-    # 添加原始中文名和翻译后的英文名
-    game_details['chinese_name'] = game_name_zh
-    game_details['translated_name'] = game_name_en
+    if is_partial(game_details):
+        print(json.dumps(game_details, ensure_ascii=False, indent=2))
+        sys.exit(2)
+
+    # 下载封面图并生成缩略图
+    if args.download_cover:
+        cache_covers([game_details])
+
+    # 保存到本地数据库
+    if args.db or config.get("store", {}).get("enabled", False):
+        with open_store(args.db, config) as store:
+            store.upsert(game_details)
 
     # 输出JSON
     print(json.dumps(game_details, ensure_ascii=False, indent=2))
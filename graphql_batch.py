@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IGN GraphQL详情批量获取
+多个线程请求游戏详情时，把短时间内到达的slug合并成一个批量请求
+（一次POST多个GetObjectBySlug操作），再把结果分发给各自的调用方
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import requests
+
+from breaker import get_breaker, is_upstream_failure
+from deadline import current as current_deadline
+from deadline import request_timeout
+from game_record import (extract_slug, fetch_details_graphql, graphql_headers,
+                         parse_graphql_game)
+from query_hashes import get_query_hashes, is_not_found
+
+logger = logging.getLogger(__name__)
+
+OPERATION = "GetObjectBySlug"
+RESULT_FIELD = "getObjectBySlug"
+
+_LOADER = None
+_LOADER_LOCK = threading.Lock()
+
+
+class BatchNotSupported(Exception):
+    """
+    服务器不接受批量请求（返回的不是与请求一一对应的结果列表）
+    """
+
+
+class DetailLoader:
+    """
+    GraphQL详情批量加载器，可在多个线程间共享
+
+    第一个slug到达后最多等待linger秒，期间到达的slug合并为一批，
+    达到batch_size时立即发送；同一批中重复的slug只请求一次。
+    服务器不支持批量请求时自动改为逐个请求
+
+    参数:
+        api_url (str): GraphQL API地址
+        batch_size (int): 每批最多包含的slug数
+        linger (float): 等待凑批的最长时间（秒）
+        max_in_flight (int): 同时进行的批量请求数
+    """
+
+    def __init__(self, api_url, batch_size=20, linger=0.02, max_in_flight=4):
+        self.api_url = api_url
+        self.batch_size = batch_size
+        self.linger = linger
+        self.supported = True
+        self._pending = {}
+        self._first_at = None
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight,
+                                            thread_name_prefix="graphql-batch")
+        self._session = requests.Session()
+        self._thread = threading.Thread(target=self._run,
+                                        name="graphql-batch-dispatch",
+                                        daemon=True)
+        self._thread.start()
+
+    def load(self, game_url):
+        """
+        将一个详情请求加入队列
+
+        参数:
+            game_url (str): 游戏详情页URL
+
+        返回:
+            Future: 结果为游戏详情，获取失败时为None
+        """
+        slug = extract_slug(game_url)
+        with self._condition:
+            if slug in self._pending:
+                return self._pending[slug][1]
+            future = Future()
+            self._pending[slug] = (game_url, future)
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+            self._condition.notify()
+        return future
+
+    def fetch(self, game_url):
+        """
+        获取一个游戏的详情并等待结果，等待时间不超过当前查询剩余的时限
+        """
+        future = self.load(game_url)
+        deadline = current_deadline()
+        timeout = deadline.stage_remaining() if deadline else None
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            logger.info("等待批量获取游戏详情超时: %s", game_url)
+            return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # 凑满一批或等待时间到达后发送
+                while len(self._pending) < self.batch_size:
+                    remaining = self._first_at + self.linger - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                slugs = list(self._pending)[:self.batch_size]
+                batch = [(slug, ) + self._pending.pop(slug) for slug in slugs]
+                self._first_at = time.monotonic() if self._pending else None
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        try:
+            if self.supported:
+                results = self._fetch_batch(batch)
+            else:
+                results = None
+        except BatchNotSupported as e:
+            logger.warning("GraphQL接口不支持批量请求，改为逐个请求: %s", e)
+            self.supported = False
+            results = None
+        except Exception as e:
+            logger.warning("批量获取游戏详情时出错: %s", e)
+            results = [None] * len(batch)
+
+        if results is None:
+            results = [
+                fetch_details_graphql(game_url, batched=False)
+                for _, game_url, _ in batch
+            ]
+        for (_, _, future), game_details in zip(batch, results):
+            future.set_result(game_details)
+
+    def _fetch_batch(self, batch):
+        breaker = get_breaker("ign_graphql")
+        if not breaker.allow():
+            logger.debug("IGN GraphQL接口已熔断，跳过")
+            return [None] * len(batch)
+
+        query_hashes = get_query_hashes()
+        for attempt in range(2):
+            operations = [{
+                "operationName": OPERATION,
+                "variables": {
+                    "slug": slug
+                },
+                "extensions": {
+                    "persistedQuery": {
+                        "version": 1,
+                        "sha256Hash": query_hashes.get(OPERATION)
+                    }
+                }
+            } for slug, _, _ in batch]
+            try:
+                response = self._session.post(
+                    self.api_url,
+                    json=operations,
+                    headers=graphql_headers(query_hashes.client_version),
+                    timeout=request_timeout())
+                if response.status_code in (400, 404, 405, 415, 501):
+                    raise BatchNotSupported(f"HTTP {response.status_code}")
+                response.raise_for_status()
+                data = response.json()
+            except (requests.RequestException, ValueError) as e:
+                if is_upstream_failure(e):
+                    breaker.record_failure()
+                raise
+            if not isinstance(data, list) or len(data) != len(batch):
+                raise BatchNotSupported("响应不是结果列表")
+
+            if attempt == 0 and any(is_not_found(item) for item in data):
+                logger.warning("GraphQL查询 %s 的哈希已失效", OPERATION)
+                if query_hashes.refresh():
+                    continue
+            break
+
+        logger.debug("批量获取 %d 个游戏的详情", len(batch))
+        results = []
+        failed = 0
+        for (_, game_url, _), item in zip(batch, data):
+            game_object = ((item or {}).get("data") or {}).get(RESULT_FIELD)
+            if game_object:
+                try:
+                    results.append(parse_graphql_game(game_object, game_url))
+                    continue
+                except (KeyError, TypeError) as e:
+                    logger.warning("解析GraphQL API响应时出错: %s", e)
+            elif (item or {}).get("errors"):
+                failed += 1
+            results.append(None)
+
+        if failed == len(batch):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return results
+
+
+def get_loader(config=None):
+    """
+    获取共享的详情批量加载器
+
+    参数:
+        config (dict, optional): 配置字典，为None时加载默认配置
+
+    返回:
+        DetailLoader: 批量加载器
+    """
+    global _LOADER
+    with _LOADER_LOCK:
+        if _LOADER is None:
+            if config is None:
+                from config import load_config
+                config = load_config()
+            graphql_config = config.get("graphql", {})
+            batch_config = graphql_config.get("batch", {})
+            _LOADER = DetailLoader(
+                graphql_config.get("url",
+                                   "https://mollusk.apis.ign.com/graphql"),
+                batch_size=batch_config.get("size", 20),
+                linger=batch_config.get("linger_ms", 20) / 1000,
+                max_in_flight=batch_config.get("max_in_flight", 4))
+        return _LOADER
@@ -0,0 +1,694 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM服务提供商封装
+统一OpenAI、Azure OpenAI和火山引擎的调用方式，每个提供商使用一个长期复用的HTTP会话，
+支持普通调用和流式调用，可在多线程中共享。
+每个提供商可以配置多个API密钥，并发请求分配给当前负载最低的密钥
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+import usage
+from deadline import current as current_deadline
+from deadline import request_timeout
+
+logger = logging.getLogger(__name__)
+
+# 各提供商的默认设置，按用途（search: 联网查找英文名，api: 解析页面内容）区分
+PROVIDER_DEFAULTS = {
+    "openai": {
+        "label": "OpenAI API",
+        "env": "OPENAI_API_KEY",
+        "api_base": {
+            "search": "https://api.openai.com/v1/chat/completions",
+            "api": "https://api.openai.com/v1/chat/completions"
+        },
+        "model": {
+            "search": "gpt-3.5-turbo",
+            "api": "gpt-3.5-turbo"
+        }
+    },
+    "azure": {
+        "label": "Azure OpenAI API",
+        "env": "AZURE_OPENAI_API_KEY",
+        "api_base": {},
+        "model": {
+            "search": "gpt-35-turbo",
+            "api": "gpt-35-turbo"
+        }
+    },
+    "huoshan": {
+        "label": "火山引擎API",
+        "env": "HUOSHAN_API_KEY",
+        "api_base": {
+            "search":
+            "https://ark.cn-beijing.volces.com/api/v3/bots/chat/completions",
+            "api": "https://ark.cn-beijing.volces.com/api/v3/chat/completions"
+        },
+        "model": {
+            "search": "bot-20250402210548-cns6x",
+            "api": "ep-20250205181853-r9rxr"
+        }
+    }
+}
+
+# 已创建的提供商实例缓存
+_PROVIDERS = {}
+_PROVIDERS_LOCK = threading.Lock()
+
+# 各API密钥的使用状态，同一密钥在不同用途（search/api）间共享
+_API_KEYS = {}
+_KEYS_CONDITION = threading.Condition()
+
+# 遇到这些状态码时换一个密钥重试
+RETRY_STATUS = {401, 403, 429}
+# 表示额度用尽（而不是短时限流）的错误码
+QUOTA_ERROR_CODES = {"insufficient_quota", "billing_hard_limit_reached"}
+# 认证失败或额度用尽的密钥停用多久（秒）
+DISABLE_SECONDS = 3600
+# 429响应没有说明何时恢复时暂停多久（秒）
+DEFAULT_COOLDOWN = 10
+
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "": 1}
+
+
+class LLMError(Exception):
+    """
+    LLM调用失败（配置缺失、HTTP错误或响应格式不符合预期）
+    """
+
+
+def parse_reset(value):
+    """
+    解析限流头中的恢复时间，如 "1s"、"6m0s"、"20ms"、"30"
+
+    返回:
+        float: 秒数，无法解析时为None
+    """
+    parts = re.findall(r'(\d+(?:\.\d+)?)(ms|s|m|h|)', value or '')
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+class ApiKey:
+    """
+    单个API密钥的使用状态
+
+    参数:
+        api_key (str): API密钥
+        api_base (str): 该密钥使用的API地址
+        max_concurrency (int, optional): 该密钥同时进行的最大请求数，None表示不限
+    """
+
+    def __init__(self, api_key, api_base, max_concurrency=None):
+        self.api_key = api_key
+        self.api_base = api_base
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.available_at = 0.0
+        self.last_used = 0.0
+        self.remaining_requests = None
+        self.remaining_tokens = None
+
+    @property
+    def name(self):
+        # 日志和指标中只显示密钥末尾几位
+        return f"...{self.api_key[-4:]}"
+
+    def available(self, now):
+        return now >= self.available_at and (
+            not self.max_concurrency or self.in_flight < self.max_concurrency)
+
+    def snapshot(self):
+        return {
+            "api_base": self.api_base,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "rate_limited": self.rate_limited,
+            "paused_seconds": round(max(0, self.available_at - time.monotonic()),
+                                    1),
+            "remaining_requests": self.remaining_requests,
+            "remaining_tokens": self.remaining_tokens
+        }
+
+
+class KeyPool:
+    """
+    一个提供商的API密钥池，可在多个线程间共享
+
+    每次请求选择可用密钥中进行中请求最少的一个（相同时选择最久未使用的），
+    根据响应中的限流头和429/401/403响应暂停用完额度的密钥
+
+    参数:
+        keys (list): ApiKey列表
+        max_wait (float, optional): 所有密钥都不可用时最多等待的秒数
+    """
+
+    def __init__(self, keys, max_wait=30):
+        self.keys = list(keys)
+        self.max_wait = max_wait
+
+    def acquire(self):
+        """
+        取出一个可用的密钥，用完后需调用release
+        所有密钥都不可用时等待，等待时间不超过max_wait和当前查询剩余的时限
+
+        返回:
+            ApiKey: 密钥
+
+        异常:
+            LLMError: 等待后仍没有可用的密钥
+        """
+        deadline = current_deadline()
+        limit = time.monotonic() + self.max_wait
+        if deadline is not None:
+            limit = min(limit, time.monotonic() + deadline.remaining())
+        with _KEYS_CONDITION:
+            while True:
+                now = time.monotonic()
+                candidates = [key for key in self.keys if key.available(now)]
+                if candidates:
+                    key = min(candidates,
+                              key=lambda key: (key.in_flight, key.last_used))
+                    key.in_flight += 1
+                    key.requests += 1
+                    key.last_used = now
+                    return key
+                # 都在暂停时等到最早恢复的密钥，都达到并发上限时等待其他请求结束
+                resume_at = min((key.available_at
+                                 for key in self.keys if key.available_at > now),
+                                default=limit)
+                if resume_at > limit:
+                    raise LLMError("所有API密钥都已达到限额，暂时不可用")
+                _KEYS_CONDITION.wait(max(resume_at - now, 0.01))
+
+    def release(self, key):
+        with _KEYS_CONDITION:
+            key.in_flight -= 1
+            _KEYS_CONDITION.notify_all()
+
+    def record(self, key, response):
+        """
+        根据响应更新密钥的剩余额度，额度用完或被限流时暂停使用该密钥
+        """
+        headers = response.headers
+        now = time.monotonic()
+        pause = 0
+        paused_for = None
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None or not remaining.isdigit():
+                continue
+            setattr(key, f"remaining_{kind}", int(remaining))
+            if int(remaining) == 0:
+                pause = max(
+                    pause,
+                    parse_reset(headers.get(f"x-ratelimit-reset-{kind}")) or 0)
+
+        if response.status_code == 429:
+            key.rate_limited += 1
+            metrics.incr("llm.rate_limited")
+            if _error_code(response) in QUOTA_ERROR_CODES:
+                pause = DISABLE_SECONDS
+                paused_for = "额度已用尽"
+            else:
+                pause = max(pause,
+                            parse_reset(headers.get("retry-after"))
+                            or DEFAULT_COOLDOWN)
+                paused_for = "被限流"
+        elif response.status_code in (401, 403):
+            pause = DISABLE_SECONDS
+            paused_for = f"认证失败（HTTP {response.status_code}）"
+
+        if pause:
+            with _KEYS_CONDITION:
+                key.available_at = max(key.available_at, now + pause)
+            if paused_for:
+                logger.warning("API密钥 %s %s，暂停使用 %g 秒", key.name,
+                               paused_for, pause)
+
+
+def _error_code(response):
+    try:
+        error = response.json().get("error")
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(error, dict):
+        return None
+    return error.get("code") or error.get("type")
+
+
+def get_api_key(provider, api_key, api_base, max_concurrency=None):
+    """
+    获取API密钥的共享状态，同一提供商、地址和密钥只创建一个实例
+    """
+    with _KEYS_CONDITION:
+        key = _API_KEYS.get((provider, api_key, api_base))
+        if key is None:
+            key = ApiKey(api_key, api_base, max_concurrency)
+            _API_KEYS[(provider, api_key, api_base)] = key
+        return key
+
+
+def key_states():
+    """
+    返回所有API密钥的使用状态
+    """
+    with _KEYS_CONDITION:
+        return {
+            f"{provider} {key.name}": key.snapshot()
+            for (provider, _, _), key in _API_KEYS.items()
+        }
+
+
+class LLMProvider:
+    """
+    兼容OpenAI Chat Completions协议的LLM服务
+
+    参数:
+        keys (list): ApiKey列表，请求在这些密钥间分配
+        model (str): 模型名称
+        role (str, optional): 用途，用于统计token用量
+        json_mode (bool, optional): 非流式调用时要求服务只返回JSON对象
+            （response_format: json_object），服务不支持时自动关闭
+    """
+
+    label = "LLM API"
+    # 流式调用时请求在最后一段中返回usage（stream_options.include_usage）
+    stream_usage = True
+
+    def __init__(self,
+                 keys,
+                 model,
+                 temperature=0.3,
+                 max_tokens=150,
+                 pool_size=16,
+                 max_wait=30,
+                 role="api",
+                 json_mode=False):
+        self.key_pool = KeyPool(keys, max_wait)
+        self.model = model
+        self.role = role
+        self.json_mode = json_mode
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def url(self, key):
+        return key.api_base
+
+    def headers(self, key):
+        return {
+            "Authorization": f"Bearer {key.api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def payload(self, messages, stream=False, **overrides):
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+        if self.json_mode and not stream:
+            payload["response_format"] = {"type": "json_object"}
+        payload.update(overrides)
+        if stream:
+            payload["stream"] = True
+            if self.stream_usage:
+                payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    def _post(self, messages, stream=False, **overrides):
+        """
+        使用密钥池中的一个密钥发送请求，被限流或认证失败时换一个密钥重试
+
+        返回:
+            tuple: (响应, 使用的密钥)，用完响应后需调用 self.key_pool.release(密钥)
+        """
+        attempts = len(self.key_pool.keys)
+        attempt = 0
+        while True:
+            key = self.key_pool.acquire()
+            try:
+                response = self.session.post(self.url(key),
+                                             headers=self.headers(key),
+                                             json=self.payload(
+                                                 messages, stream, **overrides),
+                                             stream=stream,
+                                             timeout=request_timeout())
+            except requests.RequestException as e:
+                self.key_pool.release(key)
+                raise LLMError(f"请求失败: {e}") from e
+            self.key_pool.record(key, response)
+            if response.status_code == 200:
+                return response, key
+            rejected_json_mode = (self.json_mode and not stream
+                                  and response.status_code == 400
+                                  and "response_format" in response.text)
+            response.close()
+            self.key_pool.release(key)
+            if rejected_json_mode:
+                self.json_mode = False
+                logger.warning("%s不支持JSON模式，改为普通输出", self.label)
+                continue
+            attempt += 1
+            if (response.status_code not in RETRY_STATUS
+                    or attempt == attempts):
+                raise LLMError(f"HTTP {response.status_code}")
+
+    def complete(self, messages, **overrides):
+        """
+        发送对话请求并返回完整回复
+
+        参数:
+            messages (list): 对话消息列表
+            **overrides: 覆盖默认请求参数（如temperature、max_tokens）
+
+        返回:
+            str: 模型回复内容
+        """
+        start = time.monotonic()
+        response, key = self._post(messages, **overrides)
+        try:
+            data = response.json()
+        except ValueError as e:
+            raise LLMError("无法解析API响应为JSON") from e
+        finally:
+            self.key_pool.release(key)
+
+        choices = data.get("choices") or []
+        if not choices:
+            raise LLMError("响应中没有choices字段")
+        message = choices[0].get("message")
+        if not message or message.get("content") is None:
+            raise LLMError("响应格式不符合预期")
+        self._record_usage(data.get("usage"), messages, message["content"],
+                           start)
+        return message["content"]
+
+    def _record_usage(self, reported, messages, content, start):
+        seconds = time.monotonic() - start
+        if reported and reported.get("prompt_tokens") is not None:
+            usage.record(self.role, reported["prompt_tokens"],
+                         reported.get("completion_tokens") or 0, seconds)
+        else:
+            usage.record(self.role,
+                         usage.estimate_messages(messages),
+                         usage.estimate_tokens(content),
+                         seconds,
+                         estimated=True)
+
+    def stream(self, messages, **overrides):
+        """
+        以流式方式发送对话请求，逐段返回回复内容
+        调用方提前停止迭代（或关闭生成器）时会立即关闭连接
+
+        参数:
+            messages (list): 对话消息列表
+            **overrides: 覆盖默认请求参数
+
+        返回:
+            generator: 逐段产生的回复文本
+        """
+        start = time.monotonic()
+        response, key = self._post(messages, stream=True, **overrides)
+        received = []
+        reported = None
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError as e:
+                    raise LLMError("无法解析流式响应") from e
+                reported = chunk.get("usage") or reported
+                for choice in chunk.get("choices") or []:
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        received.append(content)
+                        yield content
+        finally:
+            response.close()
+            self.key_pool.release(key)
+            # 提前停止时收不到最后的usage，按已收到的内容估计
+            self._record_usage(reported, messages, ''.join(received), start)
+
+    async def acomplete(self, messages, **overrides):
+        """
+        complete的异步版本，在线程中执行阻塞的HTTP请求
+        """
+        return await asyncio.to_thread(self.complete, messages, **overrides)
+
+
+class OpenAIProvider(LLMProvider):
+    label = "OpenAI API"
+
+    def url(self, key):
+        # 兼容只配置了 https://api.openai.com/v1 这类基础地址的情况
+        base = key.api_base.rstrip('/')
+        if not base.endswith('/chat/completions'):
+            base += '/chat/completions'
+        return base
+
+
+class AzureProvider(LLMProvider):
+    label = "Azure OpenAI API"
+    # 较早的api-version不接受stream_options
+    stream_usage = False
+
+    def __init__(self, keys, model, api_version="2023-05-15", **kwargs):
+        super().__init__(keys, model, **kwargs)
+        self.api_version = api_version
+
+    def url(self, key):
+        return (f"{key.api_base.rstrip('/')}/openai/deployments/{self.model}"
+                f"/chat/completions?api-version={self.api_version}")
+
+    def headers(self, key):
+        return {"api-key": key.api_key, "Content-Type": "application/json"}
+
+
+class HuoshanProvider(LLMProvider):
+    label = "火山引擎API"
+
+
+PROVIDER_CLASSES = {
+    "openai": OpenAIProvider,
+    "azure": AzureProvider,
+    "huoshan": HuoshanProvider
+}
+
+
+def get_provider(role, config=None, api_key=None, api_base=None, model=None):
+    """
+    获取指定用途的LLM提供商实例，相同配置的实例会被复用
+
+    参数:
+        role (str): 用途，search（联网查找英文名）或 api（解析页面内容）
+        config (dict, optional): 配置字典，为None时加载默认配置
+        api_key (str, optional): 覆盖配置中的API密钥
+        api_base (str, optional): 覆盖配置中的API URL
+        model (str, optional): 覆盖配置中的模型名称
+
+    返回:
+        LLMProvider: 提供商实例
+
+    异常:
+        LLMError: 提供商不受支持或缺少必要配置
+    """
+    if config is None:
+        from config import load_config
+        config = load_config()
+
+    llm_config = config.get("llm", {})
+    role_config = llm_config.get(role, {})
+    provider = (role_config.get("provider") or llm_config.get(
+        "provider", "openai")).lower()
+
+    if provider not in PROVIDER_CLASSES:
+        raise LLMError(f"不支持的LLM提供商: {provider}")
+    defaults = PROVIDER_DEFAULTS[provider]
+
+    # 设置API基础URL和模型
+    kwargs = {}
+    if provider == "azure":
+        azure_config = llm_config.get("azure", {})
+        api_base = azure_config.get("endpoint") or api_base or role_config.get(
+            "api_base")
+        kwargs["api_version"] = azure_config.get("api_version", "2023-05-15")
+    else:
+        api_base = api_base or role_config.get(
+            "api_base") or defaults["api_base"].get(role)
+    model = model or role_config.get("model") or defaults["model"].get(role)
+
+    # 设置API密钥：参数 > 配置文件（keys列表或api_key） > 环境变量
+    # keys中的每一项可以是密钥字符串，或 {"api_key", "api_base", "max_concurrency"}
+    if api_key:
+        entries = [api_key]
+    else:
+        entries = role_config.get("keys") or [
+            role_config.get("api_key") or os.environ.get(defaults["env"], "")
+        ]
+    keys = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"api_key": entry}
+        if not entry.get("api_key"):
+            continue
+        key_base = entry.get("api_base") or api_base
+        if not key_base:
+            if provider == "azure":
+                raise LLMError("未设置Azure OpenAI端点。")
+            raise LLMError(f"未设置{defaults['label']} URL。")
+        keys.append(
+            get_api_key(provider, entry["api_key"], key_base,
+                        entry.get("max_concurrency")))
+    if not keys:
+        raise LLMError("未设置API密钥。请在配置文件中设置或通过环境变量提供。")
+
+    kwargs["temperature"] = role_config.get("temperature",
+                                            llm_config.get("temperature", 0.3))
+    kwargs["max_tokens"] = role_config.get(
+        "max_tokens",
+        llm_config.get("max_tokens", 150 if role == "search" else 1000))
+    kwargs["pool_size"] = llm_config.get("pool_size", 16)
+    kwargs["max_wait"] = llm_config.get("key_wait_seconds", 30)
+    kwargs["role"] = role
+    kwargs["json_mode"] = role_config.get("json_mode", False)
+
+    cache_key = (provider, role, tuple(id(key) for key in keys), model,
+                 tuple(sorted(kwargs.items())))
+    with _PROVIDERS_LOCK:
+        instance = _PROVIDERS.get(cache_key)
+        if instance is None:
+            instance = PROVIDER_CLASSES[provider](keys, model, **kwargs)
+            _PROVIDERS[cache_key] = instance
+    return instance
+
+
+_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)```', re.DOTALL | re.IGNORECASE)
+_CLOSERS = {'{': '}', '[': ']'}
+
+
+def _strip_trailing_comma(out):
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ',':
+        del out[i]
+
+
+def _scan_object(text, start):
+    """
+    从start处的"{"扫描到与之配对的"}"，同时把单引号字符串改为双引号、
+    去掉"}"和"]"前多余的逗号；回复被截断时补全未闭合的字符串和括号
+
+    返回:
+        tuple: (修正后的JSON文本, 扫描结束的位置)
+    """
+    out = []
+    stack = []
+    quote = None
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if quote:
+            if ch == '\\' and i + 1 < len(text):
+                following = text[i + 1]
+                # JSON中没有\'转义
+                out.append("'" if following == "'" else ch + following)
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                out.append('\\"')
+            else:
+                out.append(ch)
+        elif ch in '"\'':
+            quote = ch
+            out.append('"')
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+        elif ch in '}]':
+            _strip_trailing_comma(out)
+            out.append(ch)
+            if stack:
+                stack.pop()
+            if not stack:
+                return ''.join(out), i + 1
+        else:
+            out.append(ch)
+        i += 1
+
+    if quote:
+        out.append('"')
+    for closer in reversed(stack):
+        _strip_trailing_comma(out)
+        out.append(closer)
+    return ''.join(out), len(text)
+
+
+def extract_json(text):
+    """
+    从模型回复中提取JSON对象
+    依次尝试直接解析、解析代码块中的内容、解析回复中第一个完整的对象（忽略前后的说明文字），
+    后者会修正单引号字符串、多余的逗号和被截断的结尾
+
+    参数:
+        text (str): 模型回复
+
+    返回:
+        dict: 解析出的对象，找不到时返回None
+    """
+    text = text.strip()
+    match = _FENCE_RE.search(text)
+    if match:
+        text = match.group(1).strip()
+    try:
+        value = json.loads(text, strict=False)
+        if isinstance(value, dict):
+            return value
+    except ValueError:
+        pass
+
+    start = text.find('{')
+    while start != -1:
+        candidate, end = _scan_object(text, start)
+        try:
+            value = json.loads(candidate, strict=False)
+            if isinstance(value, dict):
+                metrics.incr("llm.json_repaired")
+                return value
+        except ValueError:
+            pass
+        start = text.find('{', end)
+    return None
+
+
+metrics.register("llm_keys", key_states)
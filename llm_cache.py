@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM解析结果缓存
+按页面内容的指纹、模型和提示词缓存LLM从Jina页面中提取的游戏详情，
+页面没有实质变化时直接使用之前的结果，不再调用LLM
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extractions (
+    key TEXT PRIMARY KEY,
+    url TEXT,
+    model TEXT,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+# 每次访问都可能变化、与游戏信息无关的行：相对时间、发布/更新时间、时刻
+_VOLATILE_RE = re.compile(
+    r'\b\d+\s*(?:seconds?|minutes?|mins?|hours?|hrs?|days?|weeks?|months?|years?)\s+ago\b'
+    r'|\d+\s*(?:秒|分钟|小时|天|周|个月|年)前'
+    r'|\b(?:updated|posted|published)\b'
+    r'|\b\d{1,2}:\d{2}(?::\d{2})?\b', re.IGNORECASE)
+
+_INSTANCE = None
+_INSTANCE_LOCK = threading.Lock()
+
+
+def content_fingerprint(page_content):
+    """
+    计算页面内容的指纹
+    忽略相对时间、发布和更新时间等每次访问都可能变化的行，合并空白并转为小写，
+    只有与游戏信息有关的内容变化时指纹才会变化
+
+    参数:
+        page_content (str): 预处理后的Jina页面内容
+
+    返回:
+        str: 十六进制的sha256
+    """
+    lines = []
+    for line in page_content.splitlines():
+        if _VOLATILE_RE.search(line):
+            continue
+        line = ' '.join(line.split()).lower()
+        if line:
+            lines.append(line)
+    return hashlib.sha256('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+def cache_key(page_content, model, prompt):
+    """
+    缓存键：页面指纹、模型和提示词，修改提示词或更换模型后旧的结果不再使用
+    """
+    digest = hashlib.sha256()
+    for part in (model or '', prompt, content_fingerprint(page_content)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    LLM解析结果缓存，可在多个线程间共享
+
+    参数:
+        path (str): SQLite数据库路径
+        ttl_days (float, optional): 结果的有效期（天），None表示一直有效
+    """
+
+    def __init__(self, path, ttl_days=None):
+        self.path = path
+        self.ttl_days = ttl_days
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, key):
+        """
+        返回缓存的解析结果，没有或已过期时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result, created_at FROM extractions WHERE key = ?",
+                (key, )).fetchone()
+        if row is None:
+            return None
+        if self.ttl_days is not None and time.time(
+        ) - row[1] > self.ttl_days * 86400:
+            return None
+        return json.loads(row[0])
+
+    def put(self, key, result, url=None, model=None):
+        """
+        保存解析结果
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO extractions (key, url, model, result, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, url, model, json.dumps(result, ensure_ascii=False),
+                 time.time()))
+
+
+def get_extraction_cache(config=None):
+    """
+    获取共享的解析结果缓存
+
+    参数:
+        config (dict, optional): 配置字典，为None时加载默认配置
+
+    返回:
+        ExtractionCache: 缓存，llm.cache.enabled 为false时返回None
+    """
+    global _INSTANCE
+    if config is None:
+        from config import load_config
+        config = load_config()
+    cache_config = config.get("llm", {}).get("cache", {})
+    if not cache_config.get("enabled", True):
+        return None
+
+    with _INSTANCE_LOCK:
+        if _INSTANCE is None:
+            path = cache_config.get("path", "llm_cache.db")
+            if not os.path.isabs(path) and path != ':memory:':
+                path = os.path.join(
+                    os.path.dirname(os.path.abspath(__file__)), path)
+            try:
+                _INSTANCE = ExtractionCache(path, cache_config.get("ttl_days"))
+            except sqlite3.Error as e:
+                logger.warning("打开LLM解析结果缓存时出错: %s", e)
+                return None
+        return _INSTANCE
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志配置
+各模块通过 logging.getLogger(__name__) 输出进度和错误，这里统一设置级别和格式。
+日志经队列交给后台线程写出，查询线程不会因写日志而阻塞；
+日志写到标准错误（或logging.file指定的文件），标准输出只用于查询结果
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# LogRecord自带的属性，其余属性为通过extra传入的字段
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_LISTENER = None
+_HANDLER = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    将每条日志格式化为一行JSON，extra传入的字段原样输出
+    """
+
+    def format(self, record):
+        entry = {
+            "time":
+            datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec='milliseconds'),
+            "level":
+            record.levelname,
+            "logger":
+            record.name,
+            "thread":
+            record.threadName,
+            "message":
+            record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    在调用线程中合并消息参数、格式化异常，只把字符串交给后台线程，
+    格式（文本或JSON）由后台线程的处理器决定
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(debug=False, log_format=None, config=None):
+    """
+    配置日志输出，命令行入口启动时调用；重复调用时替换之前的配置
+
+    参数:
+        debug (bool, optional): 输出调试日志（忽略logging.level）
+        log_format (str, optional): text 或 json，为None时使用 logging.format
+        config (dict, optional): 配置字典，为None时加载默认配置
+    """
+    global _LISTENER, _HANDLER
+    if config is None:
+        from config import load_config
+        config = load_config()
+    log_config = config.get("logging", {})
+    level = logging.DEBUG if debug else log_config.get("level", "INFO")
+    log_format = log_format or log_config.get("format", "text")
+
+    if log_config.get("file"):
+        handler = logging.FileHandler(log_config["file"], encoding='utf-8')
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        root.removeHandler(_HANDLER)
+    else:
+        atexit.register(stop_logging)
+
+    log_queue = queue.SimpleQueue()
+    _HANDLER = _QueueHandler(log_queue)
+    root.addHandler(_HANDLER)
+    root.setLevel(level)
+    _LISTENER = logging.handlers.QueueListener(log_queue,
+                                               handler,
+                                               respect_handler_level=True)
+    _LISTENER.start()
+
+
+def stop_logging():
+    """
+    写出队列中剩余的日志并停止后台线程
+    """
+    global _LISTENER
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        for handler in _LISTENER.handlers:
+            handler.close()
+        _LISTENER = None
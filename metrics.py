@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标
+进程内的计数器和状态收集，批量查询结束时可输出为JSON
+"""
+
+import json
+import threading
+
+_COUNTERS = {}
+_COLLECTORS = {}
+_LOCK = threading.Lock()
+
+
+def incr(name, value=1):
+    """
+    增加计数器的值
+
+    参数:
+        name (str): 计数器名称，如 "breaker.ign_graphql.failures"
+        value (int, optional): 增加的值
+    """
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + value
+
+
+def register(name, collector):
+    """
+    注册状态收集函数，生成快照时调用，返回值保存在快照的name键下
+
+    参数:
+        name (str): 快照中的键
+        collector (callable): 无参数函数，返回可序列化为JSON的值
+    """
+    with _LOCK:
+        _COLLECTORS[name] = collector
+
+
+def snapshot():
+    """
+    返回当前的全部指标
+
+    返回:
+        dict: {"counters": {...}, 收集函数名: 收集结果, ...}
+    """
+    with _LOCK:
+        data = {"counters": dict(sorted(_COUNTERS.items()))}
+        collectors = list(_COLLECTORS.items())
+    for name, collector in collectors:
+        data[name] = collector()
+    return data
+
+
+def write_metrics(path):
+    """
+    将当前指标写入JSON文件
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, ensure_ascii=False, indent=2)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+游戏名称和游戏详情规范化工具
+提供全角/半角统一、繁体转简体、版本后缀去除和拼音键等文本处理函数，
+以及把发售日期、平台和评分整理为可以建立索引的规范值的函数
+"""
+
+import re
+import unicodedata
+from datetime import date
+
+# 可选依赖：OpenCC提供完整的繁简转换，pypinyin用于拼音匹配
+try:
+    import opencc
+    _OPENCC = opencc.OpenCC('t2s')
+except Exception:
+    _OPENCC = None
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+# 未安装OpenCC时使用的内置繁简对照表（覆盖游戏名中的常用字）
+_T2S_PAIRS = (
+    "傳传 說说 戰战 國国 龍龙 夢梦 劍剑 俠侠 實实 靈灵 鬥斗 門门 紀纪 錄录 記记 "
+    "獸兽 獵猎 機机 裝装 鐵铁 風风 雲云 電电 腦脑 島岛 聖圣 騎骑 惡恶 黨党 無无 "
+    "雙双 塵尘 極极 樂乐 園园 們们 個个 來来 時时 間间 與与 東东 車车 軍军 陣阵 "
+    "隊队 將将 師师 術术 獄狱 閃闪 擊击 槍枪 彈弹 爭争 動动 畫画 遊游 戲戏 藝艺 "
+    "歷历 險险 頭头 殺杀 絕绝 對对 幫帮 會会 燈灯 陽阳 陰阴 飛飞 鳥鸟 魚鱼 馬马 "
+    "貓猫 龜龟 蟲虫 災灾 難难 異异 變变 蹤踪 跡迹 過过 這这 還还 進进 運运 達达 "
+    "遠远 邊边 鄉乡 館馆 體体 勝胜 敗败 傑杰 偉伟 優优 寶宝 貝贝 賽赛 盜盗 獎奖 "
+    "歲岁 壽寿 學学 單单 號号 見见 覺觉 觀观 視视 親亲 語语 話话 詩诗 讀读 誰谁 "
+    "請请 諸诸 護护 衛卫 複复 製制 紅红 綠绿 藍蓝 黃黄 銀银 錢钱 鋼钢 鏈链 鎖锁 "
+    "鏡镜 長长 開开 關关 闖闯 陸陆 隱隐 雞鸡 離离 靜静 響响 頁页 題题 顏颜 類类 "
+    "願愿 飢饥 餓饿 驚惊 驗验 髮发 麗丽 點点 齊齐 齒齿 眾众 衆众 萬万 葉叶 蘭兰 "
+    "處处 虛虚 蠻蛮 衝冲 補补 襲袭 計计 討讨 訓训 設设 許许 證证 識识 議议 讓让 "
+    "負负 財财 貨货 質质 賊贼 賞赏 趙赵 軌轨 輕轻 載载 輪轮 轉转 辦办 農农 週周 "
+    "遺遗 郵邮 醫医 釋释 針针 鈴铃 銳锐 錯错 鍊炼 鍵键 鐘钟 鑽钻 閣阁 闘斗 際际 "
+    "隨随 雜杂 雖虽 霧雾 韓韩 頂顶 項项 順顺 預预 領领 頻频 顯显 飄飘 養养 騰腾 "
+    "驅驱 鬱郁 魯鲁 鳳凤 鴻鸿 鷹鹰 麥麦 龐庞 樹树 橋桥 殘残 殼壳 氣气 灣湾 滅灭 "
+    "漢汉 潛潜 濤涛 燒烧 爺爷 牆墙 獨独 環环 瑪玛 盡尽 監监 盤盘 碼码 確确 禮礼 "
+    "禦御 種种 穩稳 競竞 筆笔 築筑 簡简 糧粮 約约 級级 終终 組组 結结 統统 經经 "
+    "網网 緣缘 編编 練练 縱纵 總总 織织 繼继 續续 羅罗 義义 習习 聯联 聲声 聽听 "
+    "腳脚 興兴 舊旧 艦舰 莊庄 華华 裏里 誘诱 調调 論论 諾诺 謎谜 謀谋 讚赞 豐丰 "
+    "貴贵 買买 費费 賀贺 資资 躍跃 軟软 輝辉 輸输 辭辞 邏逻 鄭郑 釣钓 鍛锻 鎮镇 "
+    "鑰钥 闊阔 隻只 雛雏 韻韵 頓顿 顧顾 飯饭 餘余 駕驾 驕骄 髒脏 鯊鲨 鱗鳞 鳴鸣 "
+    "鴉鸦 齡龄 壞坏 夥伙 奪夺 奮奋 媽妈 孫孙 寧宁 屬属 幣币 幹干 廠厂 廣广 廳厅 "
+    "彌弥 彎弯 徑径 從从 徵征 憶忆 應应 懷怀 戀恋 戶户 擇择 擁拥 擔担 據据 擴扩 "
+    "攝摄 敵敌 數数 斷断 曆历 書书 構构 標标 權权 歐欧 決决 沒没 湯汤 溫温 滾滚 "
+    "濕湿 濟济 為为 烏乌 煙烟 熱热 爾尔 牽牵 狀状 獅狮 產产 畢毕 瘋疯 療疗 發发 "
+    "礦矿 禍祸 稱称 窮穷 竊窃 範范 簽签 紋纹 細细 絲丝 綁绑 線线 緊紧 縣县 繞绕 "
+    "纏缠 罰罚 舉举 蓋盖 蘇苏 蝦虾 蟻蚁 螢萤 蠍蝎 規规 訊讯 詳详 誌志 謝谢 譜谱 "
+    "貪贪 貿贸 賴赖 蹟迹 輔辅 輩辈 辯辩 遞递 適适 選选 遲迟 鄰邻 醜丑 釘钉 鋒锋 "
+    "錦锦 鍋锅 鎧铠 陳陈 階阶 隸隶 韌韧 頸颈 驛驿 鬧闹 鮮鲜 鵝鹅 麼么 黴霉 齣出 "
+    "嗎吗 糰团 團团 圍围 圖图 夠够 獻献 殭僵 屍尸 彙汇 復复 鍾钟 艷艳 淚泪 愛爱 "
+    "寫写 區区 嶼屿 曠旷 曉晓 礎础 擬拟 擲掷 獲获 鑄铸 靂雳 歸归 滿满 懸悬 蕩荡 "
+    "憑凭 讐仇 讎仇 誕诞 劇剧 劃划 勢势 勳勋 匯汇 協协 卻却 參参"
+)
+_T2S_TABLE = str.maketrans({
+    pair[0]: pair[1]
+    for pair in _T2S_PAIRS.split() if len(pair) == 2
+})
+
+# 书名号、引号等在匹配时无意义的符号
+_PUNCT_RE = re.compile(r"[\s\W_]+", re.UNICODE)
+
+# 包裹游戏名的书名号和引号
+_BRACKETS = "《》〈〉「」『』“”\"'"
+
+# 不影响查询结果的版本后缀（同一款游戏在IGN上只有一个页面）
+# 重制版、复刻版、决定版等通常是单独的游戏，不在此列
+EDITION_SUFFIXES = [
+    "数字豪华版", "豪华版", "完全版", "完整版", "年度游戏版", "年度版", "终极版", "黄金版",
+    "标准版", "典藏版", "珍藏版", "收藏版", "限定版", "季票版", "白金版", "中文版",
+    "简体中文版", "繁体中文版", "game of the year edition", "goty edition",
+    "goty", "deluxe edition", "ultimate edition", "gold edition",
+    "complete edition", "standard edition", "collector's edition"
+]
+_EDITION_RE = re.compile(
+    r"[\s:：\-–—·]*[(\[（【]?\s*(?:" +
+    "|".join(re.escape(suffix) for suffix in sorted(
+        EDITION_SUFFIXES, key=len, reverse=True)) + r")\s*[)\]）】]?$",
+    re.IGNORECASE)
+
+
+def to_halfwidth(text):
+    """
+    将全角字符统一为半角（NFKC规范化）
+
+    参数:
+        text (str): 原始文本
+
+    返回:
+        str: 规范化后的文本
+    """
+    return unicodedata.normalize('NFKC', text or '')
+
+
+def to_simplified(text):
+    """
+    繁体转简体，优先使用OpenCC，未安装时使用内置对照表
+
+    参数:
+        text (str): 原始文本
+
+    返回:
+        str: 简体文本
+    """
+    if not text:
+        return ''
+    if _OPENCC is not None:
+        return _OPENCC.convert(text)
+    return text.translate(_T2S_TABLE)
+
+
+def canonical_title(text):
+    """
+    将输入的中文游戏名整理为规范形式，用于查询和合并同一游戏的不同写法
+    统一全角/半角和繁简，去掉书名号、引号和末尾的版本后缀，合并多余空白
+
+    参数:
+        text (str): 原始游戏名，如 "《雙人成行》 豪华版"
+
+    返回:
+        str: 规范化后的游戏名，如 "双人成行"
+    """
+    title = to_simplified(to_halfwidth(text))
+    title = re.sub(r"\s+", " ", title).strip()
+    title = title.translate(str.maketrans('', '', _BRACKETS)).strip()
+    # 可能有多个版本后缀，如 "黄金版 中文版"
+    while True:
+        stripped = _EDITION_RE.sub('', title).strip()
+        if not stripped or stripped == title:
+            break
+        title = stripped
+    return title
+
+
+def title_key(text):
+    """
+    生成合并输入游戏名时使用的键，规范形式相同的游戏名会得到相同的键
+
+    参数:
+        text (str): 原始游戏名
+
+    返回:
+        str: 合并键
+    """
+    return match_key(canonical_title(text))
+
+
+def match_key(text):
+    """
+    生成用于精确匹配之外的宽松匹配键
+    统一全角/半角、繁简、大小写，并去除空白和标点（包括《》）
+
+    参数:
+        text (str): 游戏名
+
+    返回:
+        str: 匹配键
+    """
+    text = to_simplified(to_halfwidth(text)).lower()
+    return _PUNCT_RE.sub('', text)
+
+
+def pinyin_key(text):
+    """
+    生成忽略声调和用字差异的拼音匹配键
+    需要安装pypinyin，未安装时返回None
+
+    参数:
+        text (str): 游戏名（中文或拼音）
+
+    返回:
+        str: 拼音匹配键，无法生成时返回None
+    """
+    if lazy_pinyin is None:
+        return None
+    key = match_key(text)
+    if not key:
+        return None
+    return ''.join(lazy_pinyin(key)).lower()
+
+
+# 发售日期的精度
+PRECISIONS = ("day", "month", "quarter", "year")
+
+_MONTHS = {
+    name: index
+    for index, names in enumerate((
+        ("jan", "january"), ("feb", "february"), ("mar", "march"),
+        ("apr", "april"), ("may", ), ("jun", "june"), ("jul", "july"),
+        ("aug", "august"), ("sep", "sept", "september"), ("oct", "october"),
+        ("nov", "november"), ("dec", "december")), 1) for name in names
+}
+_MONTH_NAMES = "|".join(sorted(_MONTHS, key=len, reverse=True))
+
+_ISO_DATE_RE = re.compile(r'\b(\d{4})-(\d{1,2})(?:-(\d{1,2}))?')
+_ZH_DATE_RE = re.compile(r'(\d{4})\s*年(?:\s*(\d{1,2})\s*月(?:\s*(\d{1,2})\s*日)?)?')
+_MDY_RE = re.compile(r'\b(' + _MONTH_NAMES + r')\.?\s+(?:(\d{1,2})(?:st|nd|rd|th)?,?\s+)?(\d{4})\b',
+                     re.IGNORECASE)
+_DMY_RE = re.compile(r'\b(\d{1,2})\s+(' + _MONTH_NAMES + r')\.?,?\s+(\d{4})\b',
+                     re.IGNORECASE)
+_QUARTER_RE = re.compile(r'\bQ([1-4])\s*(\d{4})\b|\b(\d{4})\s*Q([1-4])\b',
+                         re.IGNORECASE)
+_YEAR_RE = re.compile(r'(?<!\d)((?:19|20)\d{2})(?!\d)')
+
+# 规范平台名 -> 各种写法（比较时使用match_key）
+PLATFORMS = {
+    "ps5": ("PlayStation 5", "PS5"),
+    "ps4": ("PlayStation 4", "PS4"),
+    "ps3": ("PlayStation 3", "PS3"),
+    "ps2": ("PlayStation 2", "PS2"),
+    "ps1": ("PlayStation", "PS1", "PSX", "PSOne"),
+    "ps-vita": ("PlayStation Vita", "PS Vita", "PSV", "Vita"),
+    "psp": ("PlayStation Portable", "PSP"),
+    "xbox-series": ("Xbox Series X|S", "Xbox Series X", "Xbox Series S",
+                    "Xbox Series X/S", "Xbox Series", "XSX"),
+    "xbox-one": ("Xbox One", "XB1", "XBO"),
+    "xbox-360": ("Xbox 360", "X360"),
+    "xbox": ("Xbox", ),
+    "switch-2": ("Nintendo Switch 2", "Switch 2", "NS2"),
+    "switch": ("Nintendo Switch", "Switch", "NS"),
+    "wii-u": ("Wii U", "Nintendo Wii U"),
+    "wii": ("Wii", "Nintendo Wii"),
+    "3ds": ("Nintendo 3DS", "3DS", "New Nintendo 3DS"),
+    "ds": ("Nintendo DS", "NDS", "DS"),
+    "gamecube": ("GameCube", "Nintendo GameCube", "NGC"),
+    "pc": ("PC", "Windows", "Windows PC", "Steam", "电脑"),
+    "mac": ("Mac", "macOS", "Macintosh", "OS X"),
+    "linux": ("Linux", "SteamOS"),
+    "ios": ("iOS", "iPhone", "iPad"),
+    "android": ("Android", ),
+    "stadia": ("Stadia", "Google Stadia"),
+}
+_PLATFORM_KEYS = {}
+for _platform_id, _names in PLATFORMS.items():
+    for _name in _names + (_platform_id, ):
+        _PLATFORM_KEYS.setdefault(match_key(_name), _platform_id)
+
+_SCORE_RE = re.compile(r'(\d+(?:\.\d+)?)\s*(?:/\s*(\d+(?:\.\d+)?))?')
+
+
+def _iso(year, month=1, day=1):
+    try:
+        return date(int(year), int(month), int(day)).isoformat()
+    except ValueError:
+        return None
+
+
+def parse_release_date(value):
+    """
+    将各种格式的发售日期整理为ISO日期和精度
+    支持 2025-04-10、2025-04-10T00:00:00Z、Apr 10, 2025、10 April 2025、April 2025、
+    2025年4月10日、Q2 2025、2025 等写法；只精确到月、季度或年时取该时段的第一天
+
+    参数:
+        value (str): 原始发售日期，如IGN返回的日期、网页中的文本或"未知"
+
+    返回:
+        tuple: (ISO日期如 "2025-04-01", 精度 day/month/quarter/year)，无法解析时为 (None, None)
+    """
+    text = to_halfwidth(str(value)) if value else ''
+    if not text:
+        return None, None
+
+    match = _ISO_DATE_RE.search(text) or _ZH_DATE_RE.search(text)
+    if match:
+        year, month, day = match.groups()
+        if day:
+            iso = _iso(year, month, day)
+            return iso, "day" if iso else None
+        if month:
+            iso = _iso(year, month)
+            return iso, "month" if iso else None
+        return _iso(year), "year"
+
+    match = _DMY_RE.search(text)
+    if match:
+        iso = _iso(match.group(3), _MONTHS[match.group(2).lower()],
+                   match.group(1))
+        return iso, "day" if iso else None
+
+    match = _MDY_RE.search(text)
+    if match:
+        month = _MONTHS[match.group(1).lower()]
+        if match.group(2):
+            iso = _iso(match.group(3), month, match.group(2))
+            return iso, "day" if iso else None
+        return _iso(match.group(3), month), "month"
+
+    match = _QUARTER_RE.search(text)
+    if match:
+        quarter = int(match.group(1) or match.group(4))
+        return _iso(match.group(2) or match.group(3),
+                    quarter * 3 - 2), "quarter"
+
+    match = _YEAR_RE.search(text)
+    if match:
+        return _iso(match.group(1)), "year"
+    return None, None
+
+
+def platform_id(name):
+    """
+    将平台名整理为规范的平台标识，如 "PlayStation 5" -> "ps5"
+
+    参数:
+        name (str): 平台名
+
+    返回:
+        str: PLATFORMS中的平台标识，无法识别时返回None
+    """
+    return _PLATFORM_KEYS.get(match_key(name)) if name else None
+
+
+def parse_score(value):
+    """
+    将评分整理为10分制的数字，如 "8"、"8.5/10"、"85/100"
+
+    参数:
+        value (str): 原始评分，未评分时为"未评分"
+
+    返回:
+        float: 评分，无法解析时返回None
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _SCORE_RE.search(to_halfwidth(str(value)) if value else '')
+    if not match:
+        return None
+    score = float(match.group(1))
+    if match.group(2):
+        scale = float(match.group(2))
+        if not scale:
+            return None
+        score = score * 10 / scale
+    return round(score, 2) if 0 <= score <= 10 else None
+
+
+def normalize_details(details):
+    """
+    规范化游戏详情中的发售日期、平台和评分，原始值保持不变
+
+    参数:
+        details (dict): 游戏详情
+
+    返回:
+        dict: {"release_date_iso", "release_date_precision", "platform_ids", "score_value"}
+    """
+    release_date_iso, precision = parse_release_date(
+        details.get('release_date'))
+    platforms = details.get('platforms') or []
+    if isinstance(platforms, str):
+        # LLM解析的结果中平台可能是一个字符串
+        platforms = re.split(r'\s*[,，、;；]\s*', platforms)
+    platform_ids = []
+    for platform in platforms:
+        normalized = platform_id(platform)
+        if normalized and normalized not in platform_ids:
+            platform_ids.append(normalized)
+    return {
+        "release_date_iso": release_date_iso,
+        "release_date_precision": precision,
+        "platform_ids": platform_ids,
+        "score_value": parse_score(details.get('score'))
+    }
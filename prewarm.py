@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IGN详情缓存预热
+在空闲时段按平台和年份抓取IGN游戏列表页（或导入导出的数据），以受控的速度获取每个游戏的详情，
+写入本地数据库的详情缓存和英文名索引；之后的查询在搜索和获取详情两步直接命中缓存
+
+用法:
+    python prewarm.py crawl --platform ps5 switch --year 2023 2024
+    python prewarm.py import ign_dump.jsonl
+    python prewarm.py status
+"""
+
+import argparse
+import json
+import logging
+import re
+import threading
+import time
+
+import requests
+
+from config import load_config
+from deadline import parse_duration
+from game_record import fetch_details_graphql, fetch_details_html, now_iso
+from log import setup_logging
+from query_hashes import DEFAULT_HEADERS
+from store import open_store, slug_from_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LISTING_URL = "https://www.ign.com/games/browse?platform={platform}&releaseYear={year}&page={page}"
+
+# 列表页中的游戏链接，__NEXT_DATA__中的斜杠可能被转义
+_SLUG_RE = re.compile(r'(?:https?:\\?/\\?/www\.ign\.com)?\\?/games\\?/([a-z0-9][a-z0-9-]*)(?![a-z0-9-])')
+
+# /games/ 下不是游戏的页面
+_NOT_GAMES = {"browse", "upcoming", "reviews", "new", "popular", "all"}
+
+# 每获取多少个游戏写入一次数据库
+_CHUNK_SIZE = 50
+
+
+class RateLimiter:
+    """
+    限制请求速度，可在多个线程间共享
+
+    参数:
+        rate (float): 每秒最多的请求数
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def listing_slugs(html):
+    """
+    从列表页中提取游戏slug
+
+    参数:
+        html (str): 列表页HTML
+
+    返回:
+        list: 按出现顺序排列、不重复的slug
+    """
+    slugs = []
+    for slug in _SLUG_RE.findall(html):
+        if slug not in _NOT_GAMES and slug not in slugs:
+            slugs.append(slug)
+    return slugs
+
+
+def crawl_listing(platform, year, limiter, config):
+    """
+    逐页抓取某个平台和年份的游戏列表，直到某一页没有新的游戏
+
+    参数:
+        platform (str): 列表地址中的平台，如 ps5
+        year (int): 发售年份
+        limiter (RateLimiter): 请求速度限制
+        config (dict): 配置字典
+
+    返回:
+        list: 游戏slug
+    """
+    prewarm_config = config.get("prewarm", {})
+    listing_url = prewarm_config.get("listing_url", DEFAULT_LISTING_URL)
+    max_pages = prewarm_config.get("max_pages", 20)
+
+    slugs = []
+    with requests.Session() as session:
+        for page in range(1, max_pages + 1):
+            url = listing_url.format(platform=platform, year=year, page=page)
+            limiter.wait()
+            try:
+                response = session.get(url, headers=DEFAULT_HEADERS, timeout=30)
+                if response.status_code == 404:
+                    break
+                response.raise_for_status()
+            except requests.RequestException as e:
+                logger.warning("获取列表页 %s 时出错: %s", url, e)
+                break
+            new = [slug for slug in listing_slugs(response.text)
+                   if slug not in slugs]
+            logger.info("%s %s 第%d页: %d 个游戏", platform, year, page, len(new))
+            if not new:
+                break
+            slugs.extend(new)
+    return slugs
+
+
+def fetch_details(slug, limiter):
+    """
+    从IGN获取一个游戏的详情（不使用缓存），GraphQL接口失败时爬取详情页
+
+    返回:
+        dict: 游戏详情，获取失败时返回None
+    """
+    game_url = f"https://www.ign.com/games/{slug}"
+    limiter.wait()
+    game_details = fetch_details_graphql(game_url, batched=False)
+    if not game_details:
+        limiter.wait()
+        game_details = fetch_details_html(game_url)
+    if game_details:
+        game_details['fetched_at'] = now_iso()
+    return game_details
+
+
+def prewarm(store, slugs, limiter, force=False, stop_at=None):
+    """
+    获取游戏详情并写入详情缓存
+
+    参数:
+        store (GameStore): 本地数据库
+        slugs (iterable): 游戏slug
+        limiter (RateLimiter): 请求速度限制
+        force (bool, optional): 重新获取已缓存的游戏
+        stop_at (float, optional): time.monotonic()到达该值后停止
+
+    返回:
+        dict: {"fetched", "failed", "skipped"} 各自的数量
+    """
+    cached = set() if force else store.cached_slugs()
+    counts = {"fetched": 0, "failed": 0, "skipped": 0}
+    pending = []
+    try:
+        for slug in slugs:
+            if slug in cached:
+                counts["skipped"] += 1
+                continue
+            if stop_at is not None and time.monotonic() >= stop_at:
+                logger.info("已到达预热时长，停止")
+                break
+            game_details = fetch_details(slug, limiter)
+            if not game_details:
+                counts["failed"] += 1
+                continue
+            cached.add(slug)
+            pending.append(game_details)
+            counts["fetched"] += 1
+            if len(pending) >= _CHUNK_SIZE:
+                store.cache_details(pending)
+                pending = []
+                logger.info("已获取 %d 个游戏的详情", counts["fetched"])
+    finally:
+        store.cache_details(pending)
+    return counts
+
+
+def load_dump(path):
+    """
+    读取导出的游戏数据：JSON数组、JSONL（每行一个游戏详情）或每行一个slug/详情页URL
+
+    返回:
+        tuple: (完整的游戏详情列表, 只有slug、需要获取详情的slug列表)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read().strip()
+    if text.startswith('['):
+        entries = json.loads(text)
+    else:
+        entries = [
+            json.loads(line) if line.startswith('{') else line
+            for line in (line.strip() for line in text.splitlines()) if line
+        ]
+
+    records = []
+    slugs = []
+    for entry in entries:
+        if isinstance(entry, str):
+            slug = slug_from_url(entry) or entry
+        else:
+            slug = entry.get('slug') or slug_from_url(entry.get('url'))
+            if slug and entry.get('english_name'):
+                record = dict(entry)
+                record.setdefault('url', f"https://www.ign.com/games/{slug}")
+                record.setdefault('fetched_at', now_iso())
+                records.append(record)
+                continue
+        if slug:
+            slugs.append(slug)
+    return records, slugs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='预先获取IGN游戏详情，填充本地详情缓存')
+    parser.add_argument('--db', help='数据库路径（默认使用配置中的store.path）')
+    parser.add_argument('--debug', action='store_true', help='输出调试日志')
+    parser.add_argument('--log-format',
+                        choices=['text', 'json'],
+                        help='日志格式（默认使用logging.format），日志输出到标准错误')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    crawl_parser = subparsers.add_parser('crawl', help='按平台和年份抓取IGN游戏列表')
+    crawl_parser.add_argument('--platform', nargs='+', required=True,
+                              help='平台，如 ps5 switch pc')
+    crawl_parser.add_argument('--year', nargs='+', type=int, required=True,
+                              help='发售年份，如 2023 2024')
+
+    import_parser = subparsers.add_parser('import', help='导入导出的游戏数据')
+    import_parser.add_argument('input', help='JSON/JSONL游戏详情，或每行一个slug/详情页URL的文本文件')
+
+    for sub in (crawl_parser, import_parser):
+        sub.add_argument('--rate', type=float,
+                         help='每秒最多请求IGN的次数（默认使用prewarm.rate）')
+        sub.add_argument('--duration', type=parse_duration,
+                         help='最多运行多久，如 6h，到时停止（已获取的详情会保存）')
+        sub.add_argument('--force', action='store_true', help='重新获取已缓存的游戏')
+
+    subparsers.add_parser('status', help='统计已缓存的游戏数')
+
+    args = parser.parse_args()
+    config = load_config()
+    setup_logging(args.debug, args.log_format, config)
+
+    with open_store(args.db, config) as store:
+        if args.command == 'status':
+            print(store.count_cached())
+            return
+
+        limiter = RateLimiter(args.rate or config.get("prewarm", {}).get(
+            "rate", 1.0))
+        stop_at = time.monotonic() + args.duration if args.duration else None
+        if args.command == 'crawl':
+            slugs = []
+            for platform in args.platform:
+                for year in args.year:
+                    slugs.extend(slug for slug in crawl_listing(
+                        platform, year, limiter, config) if slug not in slugs)
+        else:
+            records, slugs = load_dump(args.input)
+            if records:
+                logger.info("已导入 %d 个游戏的详情",
+                            store.cache_details(records))
+
+        counts = prewarm(store, slugs, limiter, args.force, stop_at)
+        logger.info("预热完成：获取 %d 个，失败 %d 个，已缓存跳过 %d 个，缓存共 %d 个游戏",
+                    counts["fetched"], counts["failed"], counts["skipped"],
+                    store.count_cached())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IGN GraphQL持久化查询哈希
+IGN重新部署后旧的查询哈希会失效（PersistedQueryNotFound），这里从IGN页面引用的
+JS文件中找出当前的哈希，缓存到本地文件，过期或失效时自动重新获取
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+
+from deadline import request_timeout
+from log import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 内置的查询哈希，没有缓存或获取失败时使用
+DEFAULT_HASHES = {
+    "SearchObjectsByName":
+    "e1c2e012a21b4a98aaa618ef1b43eb0cafe9136303274a34f5d9ea4f2446e884",
+    "GetObjectBySlug":
+    "e8a0b931f1c950df2bac5f0291ed08fe7c5cbc519a73fd4a20dc61c4996d3b4f"
+}
+DEFAULT_CLIENT_VERSION = "v0.90.0"
+
+DEFAULT_HEADERS = {
+    'User-Agent':
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36'
+}
+
+_CHUNK_RE = re.compile(r'src="([^"]*_next/static/chunks/[^"]+\.js)"')
+_NEXT_DATA_RE = re.compile(
+    r'<script id="__NEXT_DATA__" type="application/json">(.*?)</script>',
+    re.DOTALL)
+_HASH_RE = re.compile(r'["\']([a-f0-9]{64})["\']')
+
+# 操作名与哈希之间允许的最大距离（字符数）
+_MAX_DISTANCE = 400
+
+_INSTANCE = None
+_INSTANCE_LOCK = threading.Lock()
+
+
+def is_not_found(data):
+    """
+    判断GraphQL响应是否为持久化查询未找到（哈希已失效）
+    """
+    if not isinstance(data, dict):
+        return False
+    for error in data.get("errors") or []:
+        code = (error.get("extensions") or {}).get("code")
+        if (error.get("message") == "PersistedQueryNotFound"
+                or code == "PERSISTED_QUERY_NOT_FOUND"):
+            return True
+    return False
+
+
+def find_hashes(text, operations):
+    """
+    在JS文件内容中查找各操作对应的哈希
+    打包后的持久化查询清单中，操作名和哈希通常写在一起，取距离操作名最近的哈希
+
+    参数:
+        text (str): JS文件内容
+        operations (iterable): 操作名列表
+
+    返回:
+        dict: {操作名: 哈希}，只包含找到的操作
+    """
+    hashes = [(match.start(), match.group(1))
+              for match in _HASH_RE.finditer(text)]
+    if not hashes:
+        return {}
+
+    found = {}
+    for operation in operations:
+        best = None
+        for match in re.finditer(r'["\']' + re.escape(operation) + r'["\']',
+                                 text):
+            for position, value in hashes:
+                distance = abs(position - match.start())
+                if distance <= _MAX_DISTANCE and (best is None
+                                                  or distance < best[0]):
+                    best = (distance, value)
+        if best:
+            found[operation] = best[1]
+    return found
+
+
+def parse_page(html, page_url):
+    """
+    从IGN页面中提取JS文件地址和运行时配置
+
+    参数:
+        html (str): 页面HTML
+        page_url (str): 页面URL，用于补全相对地址
+
+    返回:
+        tuple: (JS文件URL列表, 客户端版本, GraphQL地址)
+    """
+    client_version = graph_api_url = None
+    asset_prefix = page_url
+    match = _NEXT_DATA_RE.search(html)
+    if match:
+        try:
+            next_data = json.loads(match.group(1))
+        except json.JSONDecodeError:
+            next_data = {}
+        runtime_config = next_data.get("runtimeConfig") or {}
+        client_version = runtime_config.get("RELEASE")
+        graph_api_url = runtime_config.get("GRAPH_API_URL")
+        asset_prefix = next_data.get("assetPrefix") or asset_prefix
+
+    chunks = []
+    for src in _CHUNK_RE.findall(html):
+        url = urljoin(asset_prefix.rstrip('/') + '/', src)
+        if url not in chunks:
+            chunks.append(url)
+    return chunks, client_version, graph_api_url
+
+
+def discover(page_url, html=None, operations=None, max_chunks=60, session=None):
+    """
+    从IGN页面引用的JS文件中查找当前的查询哈希
+
+    参数:
+        page_url (str): 任意IGN游戏页面的URL
+        html (str, optional): 已保存的页面HTML，提供时不再请求页面
+        operations (iterable, optional): 需要查找的操作名，默认为内置的全部操作
+        max_chunks (int, optional): 最多检查的JS文件数
+        session (requests.Session, optional): 复用的HTTP会话
+
+    返回:
+        dict: {"hashes": {...}, "client_version": ..., "graph_api_url": ...}
+    """
+    http = session or requests
+    operations = list(operations or DEFAULT_HASHES)
+    if html is None:
+        response = http.get(page_url,
+                            headers=DEFAULT_HEADERS,
+                            timeout=request_timeout())
+        response.raise_for_status()
+        html = response.text
+
+    chunks, client_version, graph_api_url = parse_page(html, page_url)
+    hashes = find_hashes(html, operations)
+    for chunk_url in chunks[:max_chunks]:
+        if len(hashes) == len(operations):
+            break
+        try:
+            response = http.get(chunk_url,
+                                headers=DEFAULT_HEADERS,
+                                timeout=request_timeout())
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logger.warning("获取JS文件时出错: %s: %s", chunk_url, e)
+            continue
+        for operation, value in find_hashes(response.text, operations).items():
+            hashes.setdefault(operation, value)
+
+    return {
+        "hashes": hashes,
+        "client_version": client_version,
+        "graph_api_url": graph_api_url
+    }
+
+
+class QueryHashes:
+    """
+    查询哈希的本地缓存，可在多个线程间共享
+
+    参数:
+        cache_path (str): 缓存文件路径
+        ttl_hours (float): 缓存有效期（小时），过期后下次使用时重新获取
+        page_url (str): 用于查找哈希的IGN页面
+        min_refresh_seconds (float): 两次重新获取之间的最短间隔，避免频繁请求
+    """
+
+    def __init__(self,
+                 cache_path,
+                 ttl_hours=24,
+                 page_url=None,
+                 min_refresh_seconds=300,
+                 max_chunks=60):
+        self.cache_path = cache_path
+        self.ttl_hours = ttl_hours
+        self.page_url = page_url
+        self.min_refresh_seconds = min_refresh_seconds
+        self.max_chunks = max_chunks
+        self.hashes = dict(DEFAULT_HASHES)
+        self.client_version = DEFAULT_CLIENT_VERSION
+        self.discovered_at = None
+        self._last_attempt = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("读取查询哈希缓存时出错: %s", e)
+            return
+        self.hashes.update(cached.get("hashes") or {})
+        self.client_version = cached.get("client_version") or self.client_version
+        self.discovered_at = cached.get("discovered_at")
+
+    def save(self):
+        if not self.cache_path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(
+                {
+                    "hashes": self.hashes,
+                    "client_version": self.client_version,
+                    "discovered_at": self.discovered_at
+                },
+                f,
+                ensure_ascii=False,
+                indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+    def is_stale(self):
+        if self.discovered_at is None:
+            return False
+        return time.time() - self.discovered_at >= self.ttl_hours * 3600
+
+    def get(self, operation):
+        """
+        返回操作的当前哈希，缓存过期时先尝试重新获取
+        """
+        if self.is_stale():
+            self.refresh()
+        return self.hashes.get(operation)
+
+    def refresh(self, html=None):
+        """
+        重新查找查询哈希并写入缓存
+        距上次尝试不足 min_refresh_seconds 时不再请求，多个线程同时调用时只请求一次
+
+        参数:
+            html (str, optional): 已保存的IGN页面HTML
+
+        返回:
+            bool: 是否有哈希发生了变化
+        """
+        with self._lock:
+            now = time.monotonic()
+            if (html is None and self._last_attempt is not None
+                    and now - self._last_attempt < self.min_refresh_seconds):
+                return False
+            self._last_attempt = now
+
+            logger.info("正在从IGN页面获取最新的GraphQL查询哈希")
+            try:
+                result = discover(self.page_url,
+                                  html=html,
+                                  max_chunks=self.max_chunks)
+            except requests.RequestException as e:
+                logger.warning("获取查询哈希时出错: %s", e)
+                return False
+
+            changed = {
+                operation: value
+                for operation, value in result["hashes"].items()
+                if self.hashes.get(operation) != value
+            }
+            self.hashes.update(result["hashes"])
+            self.client_version = (result["client_version"]
+                                   or self.client_version)
+            self.discovered_at = time.time()
+            try:
+                self.save()
+            except OSError as e:
+                logger.warning("保存查询哈希缓存时出错: %s", e)
+
+        if changed:
+            logger.info("查询哈希已更新: %s", ', '.join(changed))
+        elif not result["hashes"]:
+            logger.warning("未在IGN页面中找到查询哈希")
+        return bool(changed)
+
+
+def get_query_hashes(config=None):
+    """
+    获取共享的查询哈希缓存
+
+    参数:
+        config (dict, optional): 配置字典，为None时加载默认配置
+
+    返回:
+        QueryHashes: 查询哈希缓存
+    """
+    global _INSTANCE
+    with _INSTANCE_LOCK:
+        if _INSTANCE is not None:
+            return _INSTANCE
+
+    if config is None:
+        from config import load_config
+        config = load_config()
+    graphql_config = config.get("graphql", {})
+    cache_path = graphql_config.get("hash_cache", "ign_hashes.json")
+    if cache_path and not os.path.isabs(cache_path):
+        cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  cache_path)
+    instance = QueryHashes(
+        cache_path,
+        ttl_hours=graphql_config.get("hash_ttl_hours", 24),
+        page_url=graphql_config.get("discovery_page",
+                                    "https://www.ign.com/games/it-takes-two"),
+        min_refresh_seconds=graphql_config.get("min_refresh_seconds", 300),
+        max_chunks=graphql_config.get("discovery_max_chunks", 60))
+
+    with _INSTANCE_LOCK:
+        if _INSTANCE is None:
+            _INSTANCE = instance
+        return _INSTANCE
+
+
+def main():
+    parser = argparse.ArgumentParser(description='获取IGN GraphQL持久化查询哈希')
+    parser.add_argument('--html', help='已保存的IGN页面（如 "It Takes Two - IGN.html"）')
+    parser.add_argument('--debug', action='store_true', help='输出调试日志')
+    args = parser.parse_args()
+    setup_logging(args.debug)
+
+    query_hashes = get_query_hashes()
+    html = None
+    if args.html:
+        with open(args.html, 'r', encoding='utf-8') as f:
+            html = f.read()
+    query_hashes.refresh(html=html)
+    print(
+        json.dumps(
+            {
+                "hashes": query_hashes.hashes,
+                "client_version": query_hashes.client_version
+            },
+            ensure_ascii=False,
+            indent=2))
+    if not query_hashes.discovered_at:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP录制与回放
+录制模式下把所有对外请求（LLM、IGN、Jina）的响应写入归档文件；
+回放模式下不访问网络，从归档中返回响应，并可以按配置注入延迟、错误和超时，
+用于离线的可重现测试和吞吐量实验
+
+用法:
+    python batch.py run games.txt -o results.jsonl --record archive.jsonl
+    python batch.py run games.txt -o results.jsonl --replay archive.jsonl --workers 32
+"""
+
+import atexit
+import base64
+import hashlib
+import io
+import json
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# 响应体已经解码，回放时不再需要这些头
+_DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+_ORIGINAL_SEND = HTTPAdapter.send
+_ACTIVE = None
+
+
+def request_key(method, url, body):
+    """
+    归档中请求的键：方法、完整URL（含查询参数）和请求体的哈希，请求头（含API密钥）不参与也不保存
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    digest = hashlib.sha256(body or b'').hexdigest()
+    return f"{method} {url} {digest}"
+
+
+class Recorder:
+    """
+    录制对外请求的响应，可在多个线程间共享
+
+    参数:
+        path (str): 归档文件（JSONL，追加写入）
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def send(self, adapter, request, **kwargs):
+        start = time.monotonic()
+        response = _ORIGINAL_SEND(adapter, request, **kwargs)
+        # 读取完整的响应体（流式请求也一并读完），之后的iter_content/iter_lines读取的是这份内容
+        content = response.content
+        entry = {
+            "key": request_key(request.method, request.url, request.body),
+            "method": request.method,
+            "url": request.url,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in _DROPPED_HEADERS
+            },
+            "elapsed": round(time.monotonic() - start, 4)
+        }
+        try:
+            entry["text"] = content.decode('utf-8')
+        except UnicodeDecodeError:
+            entry["body_b64"] = base64.b64encode(content).decode('ascii')
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+        metrics.incr("replay.recorded")
+        return response
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class Replayer:
+    """
+    从归档中返回响应，不访问网络，可在多个线程间共享
+    同一个请求录制了多次时依次返回各次的响应（循环使用）
+
+    参数:
+        path (str): 归档文件
+        latency (str or float): 每个响应的延迟，"recorded" 使用录制时的耗时，或固定秒数
+        latency_scale (float): 延迟的倍数
+        error_rate (float): 以此概率返回HTTP 503
+        timeout_rate (float): 以此概率在请求的超时时间后抛出超时
+        seed (int, optional): 随机数种子，单线程回放时注入的错误可以重现
+    """
+
+    def __init__(self,
+                 path,
+                 latency="recorded",
+                 latency_scale=1.0,
+                 error_rate=0.0,
+                 timeout_rate=0.0,
+                 seed=None):
+        self.path = path
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self._random = random.Random(seed)
+        self._entries = {}
+        self._cursor = {}
+        self._lock = threading.Lock()
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["key"], []).append(entry)
+        logger.info("从 %s 载入 %d 个请求的响应", path,
+                    sum(len(entries) for entries in self._entries.values()))
+
+    def _next_entry(self, key):
+        with self._lock:
+            entries = self._entries.get(key)
+            roll = self._random.random()
+            if not entries:
+                return None, roll
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            return entries[index % len(entries)], roll
+
+    def send(self, adapter, request, timeout=None, **kwargs):
+        entry, roll = self._next_entry(
+            request_key(request.method, request.url, request.body))
+        if entry is None:
+            metrics.incr("replay.misses")
+            logger.warning("归档中没有该请求的响应: %s %s", request.method,
+                           request.url)
+            return self._response(request, 502, "Not Recorded", {}, b'', 0)
+
+        if self.latency == "recorded":
+            delay = entry.get("elapsed", 0) * self.latency_scale
+        else:
+            delay = float(self.latency) * self.latency_scale
+        read_timeout = timeout[1] if isinstance(timeout, tuple) else timeout
+
+        if roll < self.timeout_rate or (read_timeout is not None
+                                        and delay > read_timeout):
+            if roll < self.timeout_rate:
+                metrics.incr("replay.injected_timeouts")
+            time.sleep(read_timeout if read_timeout is not None else delay)
+            raise requests.ReadTimeout(f"回放超时: {request.url}",
+                                       request=request)
+        time.sleep(delay)
+
+        if roll < self.timeout_rate + self.error_rate:
+            metrics.incr("replay.injected_errors")
+            return self._response(request, 503, "Service Unavailable", {},
+                                  b'', delay)
+
+        metrics.incr("replay.hits")
+        if "body_b64" in entry:
+            body = base64.b64decode(entry["body_b64"])
+        else:
+            body = entry.get("text", "").encode('utf-8')
+        return self._response(request, entry["status"], entry.get("reason"),
+                              entry.get("headers") or {}, body, delay)
+
+    @staticmethod
+    def _response(request, status, reason, headers, body, delay):
+        response = requests.Response()
+        response.status_code = status
+        response.reason = reason
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(body)
+        response._content = body
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=delay)
+        return response
+
+    def close(self):
+        pass
+
+
+def _send(adapter, request, **kwargs):
+    return _ACTIVE.send(adapter, request, **kwargs)
+
+
+def install(record=None, replay=None, config=None):
+    """
+    开始录制或回放本进程中的所有HTTP请求，两者都为None时不做任何事
+    命令行入口在解析参数后调用
+
+    参数:
+        record (str, optional): 录制到的归档文件
+        replay (str, optional): 从中回放的归档文件
+        config (dict, optional): 配置字典，为None时加载默认配置（回放参数见 replay 配置）
+    """
+    global _ACTIVE
+    if not record and not replay:
+        return
+    if config is None:
+        from config import load_config
+        config = load_config()
+    uninstall()
+
+    if record:
+        _ACTIVE = Recorder(record)
+        logger.info("录制HTTP请求到 %s", record)
+    else:
+        replay_config = config.get("replay", {})
+        _ACTIVE = Replayer(replay,
+                           latency=replay_config.get("latency", "recorded"),
+                           latency_scale=replay_config.get("latency_scale", 1.0),
+                           error_rate=replay_config.get("error_rate", 0.0),
+                           timeout_rate=replay_config.get("timeout_rate", 0.0),
+                           seed=replay_config.get("seed"))
+    HTTPAdapter.send = _send
+    atexit.register(uninstall)
+
+
+def uninstall():
+    """
+    停止录制或回放，恢复正常的HTTP请求
+    """
+    global _ACTIVE
+    HTTPAdapter.send = _ORIGINAL_SEND
+    if _ACTIVE is not None:
+        _ACTIVE.close()
+        _ACTIVE = None
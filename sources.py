@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+游戏详情数据源
+将IGN GraphQL、IGN网页、Jina+LLM和本地目录统一为可插拔的数据源，
+可以按成本顺序依次尝试，也可以同时发起请求、采用最先返回的完整结果
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import wait
+
+import usage
+from deadline import current as current_deadline
+from deadline import submit
+from game_record import (extract_slug, fetch_details_graphql,
+                         fetch_details_html, get_game_details_llm)
+
+logger = logging.getLogger(__name__)
+
+# 判断结果是否完整时检查的字段和表示缺失的值
+REQUIRED_FIELDS = ['english_name', 'platforms', 'release_date']
+MISSING_VALUES = {None, "", "未知", "需要从页面内容中提取"}
+
+# 并发请求各数据源使用的线程池
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def is_complete(game_details):
+    """
+    判断游戏详情是否完整（英文名、平台和发售日期都已获取）
+    未评分的游戏也可能是完整结果，因此不检查评分
+    """
+    if not game_details:
+        return False
+    for field in REQUIRED_FIELDS:
+        value = game_details.get(field)
+        if isinstance(value, list):
+            if not value:
+                return False
+        elif value in MISSING_VALUES:
+            return False
+    return True
+
+
+class DetailSource:
+    """
+    游戏详情数据源
+
+    属性:
+        name (str): 数据源名称
+        cost (int): 相对成本，依次尝试时按成本从低到高
+        deadline (float): 单次获取的最长等待时间（秒）
+    """
+
+    name = "source"
+    cost = 0
+
+    def __init__(self, deadline=10.0):
+        self.deadline = deadline
+
+    def fetch(self, game_url, parse_executor=None):
+        """
+        获取游戏详情
+
+        参数:
+            game_url (str): 游戏详情页URL
+            parse_executor (Executor, optional): 执行页面解析的进程池
+
+        返回:
+            dict: 游戏详情，获取失败时返回None
+        """
+        raise NotImplementedError
+
+
+class LocalCatalogueSource(DetailSource):
+    """
+    本地目录：JSONL目录文件和本地数据库中已有的游戏记录
+    """
+
+    name = "local"
+    cost = 0
+
+    def __init__(self, deadline=1.0, catalogue_path=None, store_path=None):
+        super().__init__(deadline)
+        self.catalogue = {}
+        self.store = None
+        if catalogue_path and os.path.exists(catalogue_path):
+            with open(catalogue_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        slug = record.get('slug') or extract_slug(
+                            record.get('url'))
+                        if slug:
+                            self.catalogue[slug] = record
+        if store_path and os.path.exists(store_path):
+            from store import open_store
+            self.store = open_store(store_path)
+
+    def fetch(self, game_url, parse_executor=None):
+        slug = extract_slug(game_url)
+        if not slug:
+            return None
+        record = self.catalogue.get(slug)
+        if record is None and self.store is not None:
+            record = self.store.get_by_slug(slug)
+        if record is None:
+            return None
+        game_details = {
+            field: record.get(field)
+            for field in ('english_name', 'cover_image', 'platforms',
+                          'release_date', 'score')
+            if record.get(field) is not None
+        }
+        game_details['url'] = game_url
+        return game_details
+
+
+class IGNGraphQLSource(DetailSource):
+    name = "ign_graphql"
+    cost = 1
+
+    def fetch(self, game_url, parse_executor=None):
+        return fetch_details_graphql(game_url)
+
+
+class IGNHTMLSource(DetailSource):
+    name = "ign_html"
+    cost = 2
+
+    def fetch(self, game_url, parse_executor=None):
+        return fetch_details_html(game_url, parse_executor=parse_executor)
+
+
+class JinaLLMSource(DetailSource):
+    name = "jina_llm"
+    cost = 3
+
+    def fetch(self, game_url, parse_executor=None):
+        # 超出token预算时跳过，由其他数据源提供详情
+        if not usage.allow("api"):
+            return None
+        return get_game_details_llm(game_url, parse_executor=parse_executor)
+
+
+SOURCE_CLASSES = {
+    cls.name: cls
+    for cls in (LocalCatalogueSource, IGNGraphQLSource, IGNHTMLSource,
+                JinaLLMSource)
+}
+
+
+def build_sources(config=None):
+    """
+    根据配置创建数据源列表（按成本排序）
+
+    参数:
+        config (dict, optional): 配置字典，为None时加载默认配置
+
+    返回:
+        list: DetailSource列表
+    """
+    if config is None:
+        from config import load_config
+        config = load_config()
+
+    details_config = config.get("details", {})
+    deadlines = details_config.get("deadlines", {})
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+
+    sources = []
+    for name in details_config.get("sources",
+                                   ["local", "ign_graphql", "ign_html"]):
+        if name not in SOURCE_CLASSES:
+            logger.warning("未知的详情数据源: %s", name)
+            continue
+        kwargs = {}
+        if name in deadlines:
+            kwargs['deadline'] = deadlines[name]
+        if name == "local":
+            catalogue = details_config.get("catalogue")
+            if catalogue and not os.path.isabs(catalogue):
+                catalogue = os.path.join(base_dir, catalogue)
+            store_path = config.get("store", {}).get("path", "game_record.db")
+            if not os.path.isabs(store_path):
+                store_path = os.path.join(base_dir, store_path)
+            kwargs['catalogue_path'] = catalogue
+            kwargs['store_path'] = store_path
+        sources.append(SOURCE_CLASSES[name](**kwargs))
+    sources.sort(key=lambda source: source.cost)
+    return sources
+
+
+def _get_executor(max_workers):
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="detail-source")
+        return _EXECUTOR
+
+
+def _fetch_safely(source, game_url, parse_executor):
+    try:
+        return source.fetch(game_url, parse_executor=parse_executor)
+    except Exception as e:
+        logger.warning("数据源 %s 获取游戏详情时出错: %s", source.name, e)
+        return None
+
+
+def fetch_details(game_url,
+                  sources=None,
+                  strategy=None,
+                  config=None,
+                  parse_executor=None):
+    """
+    从多个数据源获取游戏详情
+
+    strategy为 sequential 时按成本从低到高依次尝试，每个数据源最多等待其deadline秒；
+    为 race 时同时请求所有数据源，采用最先返回的完整结果。
+    在设置了查询时限的上下文中调用时，等待时间不超过剩余的时限，
+    工作线程中的请求也使用同一时限
+    没有数据源返回完整结果时，返回成本最低的非空结果
+
+    参数:
+        game_url (str): 游戏详情页URL
+        sources (list, optional): DetailSource列表，为None时根据配置创建
+        strategy (str, optional): sequential 或 race，为None时使用配置
+        config (dict, optional): 配置字典，为None时加载默认配置
+        parse_executor (Executor, optional): 执行页面解析的进程池
+
+    返回:
+        dict: 游戏详情（包含 source 字段标明来源），全部失败时返回None
+    """
+    if not game_url:
+        return None
+    if config is None:
+        from config import load_config
+        config = load_config()
+    details_config = config.get("details", {})
+    if sources is None:
+        sources = build_sources(config)
+    sources = sorted(sources, key=lambda source: source.cost)
+    if strategy is None:
+        strategy = details_config.get("strategy", "sequential")
+
+    executor = _get_executor(details_config.get("race_workers", 16))
+    partial = {}
+    lookup_deadline = current_deadline()
+
+    def time_left(seconds):
+        # 不超过整个查询剩余的时间
+        if lookup_deadline is None:
+            return seconds
+        return min(seconds, lookup_deadline.stage_remaining())
+
+    def accept(source, game_details):
+        game_details = dict(game_details)
+        game_details['source'] = source.name
+        return game_details
+
+    if strategy == "race":
+        futures = {
+            submit(executor, _fetch_safely, source, game_url, parse_executor):
+            source
+            for source in sources
+        }
+        start = time.monotonic()
+        pending = set(futures)
+        while pending:
+            # 只等待仍在各自期限内的数据源
+            remaining = [
+                futures[future].deadline - (time.monotonic() - start)
+                for future in pending
+            ]
+            timeout = time_left(max(remaining))
+            if timeout <= 0:
+                break
+            done, pending = wait(pending,
+                                 timeout=timeout,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                source = futures[future]
+                if time.monotonic() - start > source.deadline:
+                    continue
+                game_details = future.result()
+                if is_complete(game_details):
+                    logger.debug("采用数据源 %s 的结果", source.name)
+                    return accept(source, game_details)
+                if game_details:
+                    partial[source] = game_details
+            pending = {
+                future
+                for future in pending
+                if time.monotonic() - start < futures[future].deadline
+            }
+    else:
+        for source in sources:
+            timeout = time_left(source.deadline)
+            if timeout <= 0:
+                logger.info("查询时限已到，不再尝试其他数据源")
+                break
+            future = submit(executor, _fetch_safely, source, game_url,
+                            parse_executor)
+            try:
+                game_details = future.result(timeout=timeout)
+            except FutureTimeoutError:
+                logger.info("数据源 %s 超时（%.1f秒）", source.name, timeout)
+                continue
+            if is_complete(game_details):
+                return accept(source, game_details)
+            if game_details:
+                partial[source] = game_details
+
+    if partial:
+        source = min(partial, key=lambda item: item.cost)
+        return accept(source, partial[source])
+    return None
@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+游戏记录的本地SQLite存储
+保存查询结果，并按slug、名称、平台和发售日期建立索引供后续查询。
+发售日期、平台和评分除原始值外还保存规范化的值（ISO日期、平台标识、数字评分），按条件查询时使用这些列的索引。
+另有按slug保存的IGN游戏详情缓存和英文名索引（由prewarm.py预先填充），查询时优先使用
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+from normalize import (match_key, normalize_details, parse_release_date,
+                       platform_id)
+
+# 存储的字段，其余字段保存在extra列中
+FIELDS = [
+    'chinese_name', 'translated_name', 'english_name', 'slug', 'platforms',
+    'release_date', 'score', 'cover_image', 'url', 'fetched_at'
+]
+
+# 由原始值计算出的规范化字段及其列类型（platform_ids同时保存在game_platforms中）
+NORMALIZED_COLUMNS = [('release_date_iso', 'TEXT'),
+                      ('release_date_precision', 'TEXT'),
+                      ('platform_ids', 'TEXT'), ('score_value', 'REAL')]
+NORMALIZED_FIELDS = [name for name, _ in NORMALIZED_COLUMNS]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    chinese_name TEXT NOT NULL UNIQUE,
+    translated_name TEXT,
+    english_name TEXT,
+    slug TEXT,
+    platforms TEXT,
+    release_date TEXT,
+    score TEXT,
+    cover_image TEXT,
+    url TEXT,
+    fetched_at TEXT,
+    extra TEXT,
+    release_date_iso TEXT,
+    release_date_precision TEXT,
+    platform_ids TEXT,
+    score_value REAL
+);
+CREATE INDEX IF NOT EXISTS idx_games_slug ON games (slug);
+CREATE INDEX IF NOT EXISTS idx_games_translated_name ON games (translated_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_games_english_name ON games (english_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_games_release_date ON games (release_date);
+
+CREATE TABLE IF NOT EXISTS game_platforms (
+    game_id INTEGER NOT NULL REFERENCES games (id) ON DELETE CASCADE,
+    platform TEXT NOT NULL,
+    platform_id TEXT,
+    PRIMARY KEY (game_id, platform)
+);
+CREATE INDEX IF NOT EXISTS idx_game_platforms_platform ON game_platforms (platform COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS ign_details (
+    slug TEXT PRIMARY KEY,
+    name_key TEXT,
+    details TEXT NOT NULL,
+    fetched_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ign_details_name_key ON ign_details (name_key);
+"""
+
+# 规范化字段的索引，在旧版本的数据库添加这些列之后创建
+NORMALIZED_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_games_release_date_iso ON games (release_date_iso);
+CREATE INDEX IF NOT EXISTS idx_games_score_value ON games (score_value);
+CREATE INDEX IF NOT EXISTS idx_game_platforms_platform_id ON game_platforms (platform_id);
+"""
+
+UPSERT_SQL = """
+INSERT INTO games (chinese_name, translated_name, english_name, slug, platforms,
+                   release_date, score, cover_image, url, fetched_at, extra,
+                   release_date_iso, release_date_precision, platform_ids, score_value)
+VALUES (:chinese_name, :translated_name, :english_name, :slug, :platforms,
+        :release_date, :score, :cover_image, :url, :fetched_at, :extra,
+        :release_date_iso, :release_date_precision, :platform_ids, :score_value)
+ON CONFLICT (chinese_name) DO UPDATE SET
+    translated_name = excluded.translated_name,
+    english_name = excluded.english_name,
+    slug = excluded.slug,
+    platforms = excluded.platforms,
+    release_date = excluded.release_date,
+    score = excluded.score,
+    cover_image = excluded.cover_image,
+    url = excluded.url,
+    fetched_at = excluded.fetched_at,
+    extra = excluded.extra,
+    release_date_iso = excluded.release_date_iso,
+    release_date_precision = excluded.release_date_precision,
+    platform_ids = excluded.platform_ids,
+    score_value = excluded.score_value
+"""
+
+
+_DETAIL_CACHE = None
+_DETAIL_CACHE_LOCK = threading.Lock()
+
+
+def slug_from_url(url):
+    """
+    从IGN详情页URL中提取游戏slug
+    """
+    match = re.search(r'/games/([^/?#]+)', url or '')
+    return match.group(1) if match else None
+
+
+def _to_row(record):
+    row = {field: record.get(field) for field in FIELDS}
+    row['slug'] = row['slug'] or slug_from_url(row['url'])
+    row['platforms'] = json.dumps(record.get('platforms') or [],
+                                  ensure_ascii=False)
+    extra = {
+        k: v
+        for k, v in record.items()
+        if k not in FIELDS and k not in NORMALIZED_FIELDS
+    }
+    row['extra'] = json.dumps(extra, ensure_ascii=False) if extra else None
+    # 规范化字段总是由原始值重新计算
+    row.update(normalize_details(record))
+    row['platform_ids'] = json.dumps(row['platform_ids'])
+    return row
+
+
+def _from_row(row):
+    record = {field: row[field] for field in FIELDS}
+    record['platforms'] = json.loads(row['platforms'] or '[]')
+    if row['extra']:
+        record.update(json.loads(row['extra']))
+    for field in NORMALIZED_FIELDS:
+        record[field] = row[field]
+    record['platform_ids'] = json.loads(row['platform_ids'] or '[]')
+    return record
+
+
+class GameStore:
+    """
+    游戏记录存储，可在多个线程间共享
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(SCHEMA)
+            self._migrate()
+            self._conn.executescript(NORMALIZED_INDEXES)
+
+    def _migrate(self):
+        """
+        为旧版本的数据库添加规范化字段的列，并由已有记录的原始值补全
+        """
+        columns = {
+            row['name']
+            for row in self._conn.execute("PRAGMA table_info(games)")
+        }
+        platform_columns = {
+            row['name']
+            for row in self._conn.execute("PRAGMA table_info(game_platforms)")
+        }
+        missing = [(name, column_type)
+                   for name, column_type in NORMALIZED_COLUMNS
+                   if name not in columns]
+        if not missing and 'platform_id' in platform_columns:
+            return
+
+        for name, column_type in missing:
+            self._conn.execute(
+                f"ALTER TABLE games ADD COLUMN {name} {column_type}")
+        if 'platform_id' not in platform_columns:
+            self._conn.execute(
+                "ALTER TABLE game_platforms ADD COLUMN platform_id TEXT")
+
+        rows = self._conn.execute(
+            "SELECT id, platforms, release_date, score FROM games").fetchall()
+        for row in rows:
+            platforms = json.loads(row['platforms'] or '[]')
+            normalized = normalize_details({
+                'platforms': platforms,
+                'release_date': row['release_date'],
+                'score': row['score']
+            })
+            self._conn.execute(
+                "UPDATE games SET release_date_iso = ?, release_date_precision = ?,"
+                " platform_ids = ?, score_value = ? WHERE id = ?",
+                (normalized['release_date_iso'],
+                 normalized['release_date_precision'],
+                 json.dumps(normalized['platform_ids']),
+                 normalized['score_value'], row['id']))
+            self._conn.executemany(
+                "UPDATE game_platforms SET platform_id = ? WHERE game_id = ? AND platform = ?",
+                [(platform_id(platform), row['id'], platform)
+                 for platform in platforms])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _upsert(self, record):
+        row = _to_row(record)
+        self._conn.execute(UPSERT_SQL, row)
+        game_id = self._conn.execute(
+            "SELECT id FROM games WHERE chinese_name = ?",
+            (row['chinese_name'], )).fetchone()['id']
+        self._conn.execute("DELETE FROM game_platforms WHERE game_id = ?",
+                           (game_id, ))
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO game_platforms (game_id, platform, platform_id)"
+            " VALUES (?, ?, ?)",
+            [(game_id, platform, platform_id(platform))
+             for platform in record.get('platforms') or []])
+
+    def upsert(self, record):
+        """
+        插入或更新一条游戏记录（以中文名为键）
+
+        参数:
+            record (dict): 查询结果
+        """
+        self.upsert_many([record])
+
+    def upsert_many(self, records):
+        """
+        在一个事务中批量插入或更新游戏记录
+
+        参数:
+            records (iterable): 查询结果列表
+
+        返回:
+            int: 写入的记录数
+        """
+        count = 0
+        with self._lock, self._conn:
+            for record in records:
+                if not record or not record.get('chinese_name'):
+                    continue
+                self._upsert(record)
+                count += 1
+        return count
+
+    def get(self, name):
+        """
+        按中文名、翻译名或英文名精确查找一条记录
+
+        参数:
+            name (str): 游戏名
+
+        返回:
+            dict: 游戏记录，未找到时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                """
+                SELECT * FROM games WHERE chinese_name = ?
+                UNION ALL
+                SELECT * FROM games WHERE english_name = ? COLLATE NOCASE
+                UNION ALL
+                SELECT * FROM games WHERE translated_name = ? COLLATE NOCASE
+                LIMIT 1
+                """, (name, name, name)).fetchone()
+        return _from_row(row) if row else None
+
+    def get_by_slug(self, slug):
+        """
+        按IGN slug查找一条记录
+
+        参数:
+            slug (str): 游戏slug
+
+        返回:
+            dict: 游戏记录，未找到时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM games WHERE slug = ? ORDER BY fetched_at DESC LIMIT 1",
+                (slug, )).fetchone()
+        return _from_row(row) if row else None
+
+    def query(self,
+              name=None,
+              search=None,
+              platform=None,
+              released_after=None,
+              released_before=None,
+              min_score=None,
+              limit=100):
+        """
+        按条件查询游戏记录
+
+        参数:
+            name (str, optional): 中文名、翻译名或英文名（精确匹配，使用索引）
+            search (str, optional): 名称中包含的文本（全表扫描）
+            platform (str, optional): 平台名称或平台标识，如 "PlayStation 5"、ps5
+            released_after (str, optional): 发售日期下限（含），如 2020-01-01
+            released_before (str, optional): 发售日期上限（含）
+            min_score (float, optional): 最低评分
+            limit (int, optional): 最大返回条数
+
+        返回:
+            list: 游戏记录列表，按发售日期倒序
+            （只精确到月、季度或年的日期按该时段的第一天比较和排序）
+        """
+        clauses = []
+        params = []
+        if name:
+            clauses.append(
+                "(chinese_name = ? OR english_name = ? COLLATE NOCASE"
+                " OR translated_name = ? COLLATE NOCASE)")
+            params += [name, name, name]
+        if search:
+            clauses.append(
+                "(chinese_name LIKE ? OR english_name LIKE ? OR translated_name LIKE ?)"
+            )
+            params += [f"%{search}%"] * 3
+        if platform:
+            normalized = platform_id(platform)
+            if normalized:
+                clauses.append(
+                    "id IN (SELECT game_id FROM game_platforms WHERE platform_id = ?)"
+                )
+                params.append(normalized)
+            else:
+                clauses.append(
+                    "id IN (SELECT game_id FROM game_platforms WHERE platform = ? COLLATE NOCASE)"
+                )
+                params.append(platform)
+        if released_after:
+            clauses.append("release_date_iso >= ?")
+            params.append(parse_release_date(released_after)[0]
+                          or released_after)
+        if released_before:
+            clauses.append("release_date_iso <= ?")
+            params.append(parse_release_date(released_before)[0]
+                          or released_before)
+        if min_score is not None:
+            clauses.append("score_value >= ?")
+            params.append(min_score)
+
+        sql = "SELECT * FROM games"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY release_date_iso DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_from_row(row) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def cache_details(self, records):
+        """
+        在一个事务中把IGN游戏详情写入按slug索引的缓存
+
+        参数:
+            records (iterable): 游戏详情列表，需要包含url
+
+        返回:
+            int: 写入的记录数
+        """
+        rows = []
+        for record in records:
+            slug = slug_from_url((record or {}).get('url'))
+            if not slug:
+                continue
+            english_name = record.get('english_name')
+            rows.append((slug, match_key(english_name) if english_name else None,
+                         json.dumps(record, ensure_ascii=False),
+                         record.get('fetched_at')))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO ign_details (slug, name_key, details, fetched_at)"
+                " VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def cached_details(self, slug, max_age_days=None):
+        """
+        按slug读取缓存的IGN游戏详情
+
+        参数:
+            slug (str): 游戏slug
+            max_age_days (float, optional): 缓存的最长保留时间（天），更早获取的详情视为不存在
+
+        返回:
+            dict: 游戏详情，未缓存或已过期时返回None
+        """
+        sql = "SELECT details FROM ign_details WHERE slug = ?"
+        params = [slug]
+        if max_age_days is not None:
+            oldest = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+            sql += " AND fetched_at >= ?"
+            params.append(oldest.replace(microsecond=0).isoformat())
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+        return json.loads(row['details']) if row else None
+
+    def cached_url(self, english_name):
+        """
+        按英文名查找缓存中的IGN详情页URL（忽略大小写、空白和标点）
+
+        参数:
+            english_name (str): 游戏英文名
+
+        返回:
+            str: 详情页URL，没有或有多个同名游戏时返回None
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT details FROM ign_details WHERE name_key = ? LIMIT 2",
+                (match_key(english_name), )).fetchall()
+        if len(rows) != 1:
+            return None
+        return json.loads(rows[0]['details']).get('url')
+
+    def cached_slugs(self):
+        """
+        返回详情缓存中所有的slug
+        """
+        with self._lock:
+            return {
+                row['slug']
+                for row in self._conn.execute("SELECT slug FROM ign_details")
+            }
+
+    def count_cached(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM ign_details").fetchone()[0]
+
+
+def open_store(path=None, config=None):
+    """
+    打开配置中指定的游戏记录数据库
+
+    参数:
+        path (str, optional): 数据库路径，为None时使用配置中的路径
+        config (dict, optional): 配置字典，为None时加载默认配置
+
+    返回:
+        GameStore: 存储对象
+    """
+    return GameStore(_store_path(path, config))
+
+
+def _store_path(path=None, config=None):
+    if path is None:
+        if config is None:
+            from config import load_config
+            config = load_config()
+        path = config.get("store", {}).get("path", "game_record.db")
+    if not os.path.isabs(path) and path != ':memory:':
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    return path
+
+
+def get_detail_cache(config=None):
+    """
+    获取查询时使用的IGN详情缓存（与游戏记录共用 store.path 数据库）
+
+    参数:
+        config (dict, optional): 配置字典，为None时加载默认配置
+
+    返回:
+        GameStore: 共享的存储对象，prewarm.use_cache 为false或数据库不存在时返回None
+    """
+    global _DETAIL_CACHE
+    if config is None:
+        from config import load_config
+        config = load_config()
+    if not config.get("prewarm", {}).get("use_cache", True):
+        return None
+
+    with _DETAIL_CACHE_LOCK:
+        if _DETAIL_CACHE is None:
+            path = _store_path(config=config)
+            # 查询时不创建数据库，没有预热过就不使用缓存
+            if path == ':memory:' or not os.path.exists(path):
+                return None
+            _DETAIL_CACHE = GameStore(path)
+        return _DETAIL_CACHE
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查询本地游戏记录数据库')
+    parser.add_argument('--db', help='数据库路径（默认使用配置中的store.path）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='导入JSONL查询结果')
+    import_parser.add_argument('input', help='JSONL文件')
+
+    get_parser = subparsers.add_parser('get', help='按名称或slug查找一条记录')
+    get_parser.add_argument('name', help='中文名、英文名或slug')
+
+    query_parser = subparsers.add_parser('query', help='按条件查询记录')
+    query_parser.add_argument('--name', help='游戏名（精确匹配）')
+    query_parser.add_argument('--search', help='名称中包含的文本')
+    query_parser.add_argument('--platform', help='平台，如 "PlayStation 5" 或 ps5')
+    query_parser.add_argument('--since', help='发售日期下限，如 2020-01-01')
+    query_parser.add_argument('--until', help='发售日期上限，如 2020-12-31')
+    query_parser.add_argument('--min-score', type=float, help='最低评分，如 8')
+    query_parser.add_argument('--limit', type=int, default=100, help='最大返回条数')
+
+    subparsers.add_parser('count', help='统计记录数')
+
+    args = parser.parse_args()
+
+    with open_store(args.db) as store:
+        if args.command == 'import':
+            with open(args.input, 'r', encoding='utf-8') as f:
+                count = store.upsert_many(
+                    json.loads(line) for line in f if line.strip())
+            print(f"已导入 {count} 条记录，数据库共 {store.count()} 条")
+        elif args.command == 'get':
+            record = store.get(args.name) or store.get_by_slug(args.name)
+            if not record:
+                print(f"数据库中未找到游戏 '{args.name}'", file=sys.stderr)
+                sys.exit(1)
+            print(json.dumps(record, ensure_ascii=False, indent=2))
+        elif args.command == 'query':
+            for record in store.query(name=args.name,
+                                      search=args.search,
+                                      platform=args.platform,
+                                      released_after=args.since,
+                                      released_before=args.until,
+                                      min_score=args.min_score,
+                                      limit=args.limit):
+                print(json.dumps(record, ensure_ascii=False))
+        else:
+            print(store.count())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM token用量统计与预算
+每次LLM调用的输入、输出token数和耗时按用途（search: 查找英文名，api: 解析页面）
+累计到本次运行的总量中，同时计入当前查询的用量。
+超出预算（llm.budget 中每个查询或整个运行的token上限）后不再调用LLM，
+调用方改用不需要LLM的方式：翻译只查对照表，详情直接从IGN获取
+"""
+
+import contextlib
+import contextvars
+import logging
+import threading
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ROLES = ("search", "api")
+
+# 当前查询的用量，随上下文传递到线程池中
+_CURRENT = contextvars.ContextVar("llm_usage", default=None)
+
+_TOTALS = {}
+_LOCK = threading.Lock()
+
+# 预算配置，首次使用时从配置文件读取
+_BUDGET = None
+_RUN_EXHAUSTED = False
+
+
+class LookupUsage:
+    """
+    单次查询的token用量
+
+    参数:
+        max_tokens (int, optional): 该查询最多使用的token数，None表示不限制
+    """
+
+    def __init__(self, max_tokens=None):
+        self.max_tokens = max_tokens
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def add(self, tokens):
+        with self._lock:
+            self.tokens += tokens
+
+    def exhausted(self):
+        return self.max_tokens is not None and self.tokens >= self.max_tokens
+
+
+def configure(config):
+    """
+    从配置中读取token预算
+    """
+    global _BUDGET
+    budget = config.get("llm", {}).get("budget", {})
+    _BUDGET = (budget.get("lookup_tokens"), budget.get("run_tokens"))
+
+
+def _budget():
+    if _BUDGET is None:
+        from config import load_config
+        configure(load_config())
+    return _BUDGET
+
+
+def estimate_tokens(text):
+    """
+    响应中没有usage时粗略估计token数：非ASCII字符（如中文）每个约1个token，
+    其余每4个字符约1个token
+    """
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+def estimate_messages(messages):
+    """
+    粗略估计对话消息的token数
+    """
+    return sum(estimate_tokens(message.get("content") or "")
+               for message in messages)
+
+
+@contextlib.contextmanager
+def track(max_tokens=None):
+    """
+    在当前上下文中统计一次查询的token用量
+
+    参数:
+        max_tokens (int, optional): 该查询的token上限，为None时使用 llm.budget.lookup_tokens
+
+    返回:
+        LookupUsage: 该查询的用量
+    """
+    if max_tokens is None:
+        max_tokens = _budget()[0]
+    lookup = LookupUsage(max_tokens)
+    token = _CURRENT.set(lookup)
+    try:
+        yield lookup
+    finally:
+        _CURRENT.reset(token)
+
+
+def record(role, prompt_tokens, completion_tokens, seconds, estimated=False):
+    """
+    记录一次LLM调用的用量
+
+    参数:
+        role (str): 用途，search 或 api
+        prompt_tokens (int): 输入token数
+        completion_tokens (int): 输出token数
+        seconds (float): 调用耗时（秒）
+        estimated (bool, optional): token数是否为估计值（响应中没有usage）
+    """
+    with _LOCK:
+        totals = _TOTALS.setdefault(role, {
+            "calls": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "seconds": 0.0,
+            "estimated_calls": 0
+        })
+        totals["calls"] += 1
+        totals["prompt_tokens"] += prompt_tokens
+        totals["completion_tokens"] += completion_tokens
+        totals["seconds"] += seconds
+        totals["estimated_calls"] += int(estimated)
+
+    lookup = _CURRENT.get()
+    if lookup is not None:
+        lookup.add(prompt_tokens + completion_tokens)
+    metrics.incr(f"llm.{role}.prompt_tokens", prompt_tokens)
+    metrics.incr(f"llm.{role}.completion_tokens", completion_tokens)
+    logger.debug("LLM调用 %s: 输入 %d，输出 %d tokens%s，耗时 %.2f秒",
+                 role,
+                 prompt_tokens,
+                 completion_tokens,
+                 "（估计）" if estimated else "",
+                 seconds,
+                 extra={
+                     "llm_role": role,
+                     "prompt_tokens": prompt_tokens,
+                     "completion_tokens": completion_tokens,
+                     "seconds": round(seconds, 3),
+                     "estimated": estimated
+                 })
+
+
+def run_tokens():
+    """
+    返回本次运行已使用的token总数
+    """
+    with _LOCK:
+        return sum(totals["prompt_tokens"] + totals["completion_tokens"]
+                   for totals in _TOTALS.values())
+
+
+def allow(role):
+    """
+    判断是否还可以调用LLM，超出当前查询或本次运行的token预算时返回False
+
+    参数:
+        role (str): 用途，search 或 api
+    """
+    global _RUN_EXHAUSTED
+    _, run_limit = _budget()
+    if run_limit is not None and run_tokens() >= run_limit:
+        if not _RUN_EXHAUSTED:
+            _RUN_EXHAUSTED = True
+            logger.warning("本次运行的LLM用量已达到预算（%d tokens），之后不再调用LLM",
+                           run_limit)
+        return False
+    lookup = _CURRENT.get()
+    if lookup is not None and lookup.exhausted():
+        logger.info("本次查询的LLM用量已达到预算（%d tokens），跳过%s调用",
+                    lookup.max_tokens, role)
+        return False
+    return True
+
+
+def summary():
+    """
+    返回本次运行各用途的用量
+
+    返回:
+        dict: {用途: {"calls", "prompt_tokens", "completion_tokens",
+            "seconds", "estimated_calls"}}
+    """
+    with _LOCK:
+        return {role: dict(totals) for role, totals in _TOTALS.items()}
+
+
+def format_summary():
+    """
+    将本次运行的用量格式化为一行文本，没有调用过LLM时返回None
+    """
+    parts = []
+    for role, totals in summary().items():
+        average = totals["seconds"] / totals["calls"]
+        parts.append(f"{role} 调用 {totals['calls']} 次，"
+                     f"输入 {totals['prompt_tokens']} / "
+                     f"输出 {totals['completion_tokens']} tokens，"
+                     f"平均 {average:.2f}秒")
+    return "；".join(parts) or None
+
+
+metrics.register("llm_usage", summary)
@@ -0,0 +1,738 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分布式查询队列
+多个工作进程从共享队列中领取游戏名，领取时获得有期限的租约，查询结果写回队列；
+工作进程中断后租约到期，游戏名会被其他进程重新领取。
+队列保存在SQLite数据库中，同一台机器上的进程可以直接打开数据库文件，
+其他节点通过 serve 子命令提供的HTTP接口访问（queue.path 设为 http://主机:端口）
+
+用法:
+    python workqueue.py add games.txt
+    python workqueue.py serve --port 8765
+    python workqueue.py work --queue http://queue-host:8765 --workers 8
+    python workqueue.py status --watch 30
+    python workqueue.py export -o results.jsonl --db game_record.db
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from config import load_config
+from deadline import parse_duration
+from log import setup_logging
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, lease_until);
+CREATE INDEX IF NOT EXISTS idx_jobs_worker ON jobs (worker, status);
+
+CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    seen_at REAL NOT NULL
+);
+"""
+
+# HTTP接口允许调用的方法
+REMOTE_METHODS = ("add", "claim", "extend", "complete", "fail", "release",
+                  "retry_failed", "stats")
+
+# 通过HTTP添加游戏名时每个请求包含的数量
+ADD_CHUNK = 1000
+
+
+class WorkQueue:
+    """
+    基于SQLite的查询队列，可在多个线程和同一台机器上的多个进程间共享
+
+    参数:
+        path (str): 数据库路径
+        lease_seconds (float): 租约期限，工作进程需在期限内续约或提交结果
+        max_attempts (int): 每个游戏名最多领取的次数，超过后标记为失败
+    """
+
+    def __init__(self, path, lease_seconds=300, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # 手动控制事务，领取时使用BEGIN IMMEDIATE避免两个进程领到同一个游戏名
+        self._conn = sqlite3.connect(path,
+                                     timeout=30,
+                                     isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _seen(self, conn, worker, now):
+        conn.execute(
+            "INSERT INTO workers (name, seen_at) VALUES (?, ?)"
+            " ON CONFLICT (name) DO UPDATE SET seen_at = excluded.seen_at",
+            (worker, now))
+
+    def add(self, titles):
+        """
+        添加游戏名，已在队列中的游戏名忽略
+
+        参数:
+            titles (iterable): 中文游戏名，可以是生成器
+
+        返回:
+            int: 新添加的数量
+        """
+        added = 0
+        titles = iter(titles)
+        while True:
+            chunk = [(title, time.time())
+                     for title in itertools.islice(titles, ADD_CHUNK)]
+            if not chunk:
+                return added
+            with self._transaction() as conn:
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO jobs (title, updated_at) VALUES (?, ?)",
+                    chunk)
+                added += conn.total_changes - before
+
+    def claim(self, worker, count=1):
+        """
+        领取待查询的游戏名，租约过期的游戏名也可以被领取
+
+        参数:
+            worker (str): 工作进程名称
+            count (int, optional): 最多领取的数量
+
+        返回:
+            list: [{"id": ..., "title": ...}]，队列中没有可领取的游戏名时为空
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._seen(conn, worker, now)
+            # 反复领取后都没有提交结果（如导致工作进程崩溃）的游戏名不再领取
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ?"
+                " WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, "租约多次过期", now, LEASED, now, self.max_attempts))
+            rows = conn.execute(
+                "SELECT id, title FROM jobs WHERE status = ?"
+                " UNION ALL"
+                " SELECT id, title FROM jobs WHERE status = ? AND lease_until < ?"
+                " LIMIT ?", (PENDING, LEASED, now, count)).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET status = ?, worker = ?, lease_until = ?,"
+                " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                [(LEASED, worker, now + self.lease_seconds, now, row['id'])
+                 for row in rows])
+        return [{"id": row['id'], "title": row['title']} for row in rows]
+
+    def extend(self, worker, ids):
+        """
+        为仍由该工作进程持有的游戏名续约
+
+        返回:
+            int: 续约成功的数量
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._seen(conn, worker, now)
+            before = conn.total_changes
+            conn.executemany(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ?"
+                " AND status = ?",
+                [(now + self.lease_seconds, job_id, worker, LEASED)
+                 for job_id in ids])
+            return conn.total_changes - before
+
+    def complete(self, worker, job_id, result):
+        """
+        提交查询结果；租约已过期但尚未被其他进程完成时结果同样有效
+
+        参数:
+            worker (str): 工作进程名称
+            job_id (int): 领取时返回的id
+            result (dict): 查询结果
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._seen(conn, worker, now)
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, result = ?, error = NULL,"
+                " lease_until = NULL, updated_at = ? WHERE id = ? AND status != ?",
+                (DONE, worker, json.dumps(result, ensure_ascii=False), now,
+                 job_id, DONE))
+
+    def fail(self, worker, job_id, error):
+        """
+        报告查询失败，未超过最大次数时放回队列等待重试
+
+        返回:
+            str: 游戏名的新状态，pending 或 failed；租约已被其他进程持有时为None
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._seen(conn, worker, now)
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND worker = ? AND status = ?",
+                (job_id, worker, LEASED)).fetchone()
+            if row is None:
+                return None
+            status = FAILED if row['attempts'] >= self.max_attempts else PENDING
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_until = NULL,"
+                " updated_at = ? WHERE id = ?", (status, error, now, job_id))
+        return status
+
+    def release(self, worker):
+        """
+        工作进程正常退出时归还持有的游戏名，不计入领取次数
+
+        返回:
+            int: 归还的数量
+        """
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_until = NULL,"
+                " attempts = attempts - 1, updated_at = ?"
+                " WHERE worker = ? AND status = ?",
+                (PENDING, time.time(), worker, LEASED))
+            return conn.total_changes - before
+
+    def retry_failed(self):
+        """
+        将失败的游戏名放回队列，领取次数清零
+
+        返回:
+            int: 放回的数量
+        """
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, updated_at = ?"
+                " WHERE status = ?", (PENDING, time.time(), FAILED))
+            return conn.total_changes - before
+
+    def stats(self):
+        """
+        返回队列进度
+
+        返回:
+            dict: 各状态的数量、租约已过期的数量和各工作进程的完成数
+        """
+        now = time.time()
+        with self._lock:
+            counts = dict(
+                self._conn.execute(
+                    "SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            expired = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND lease_until < ?",
+                (LEASED, now)).fetchone()[0]
+            per_worker = {
+                row['worker']: (row['done'], row['leased'])
+                for row in self._conn.execute(
+                    "SELECT worker, SUM(status = 'done') AS done,"
+                    " SUM(status = 'leased') AS leased FROM jobs"
+                    " WHERE worker IS NOT NULL GROUP BY worker")
+            }
+            workers = self._conn.execute(
+                "SELECT name, seen_at FROM workers ORDER BY name").fetchall()
+        stats = {status: counts.get(status, 0)
+                 for status in (PENDING, LEASED, DONE, FAILED)}
+        stats["total"] = sum(counts.values())
+        stats["expired"] = expired
+        stats["workers"] = [{
+            "name": row['name'],
+            "done": per_worker.get(row['name'], (0, 0))[0],
+            "leased": per_worker.get(row['name'], (0, 0))[1],
+            "idle_seconds": round(max(0, now - row['seen_at']), 1)
+        } for row in workers]
+        return stats
+
+    def results(self):
+        """
+        逐条产生已完成的查询结果
+
+        返回:
+            generator: 查询结果
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, result FROM jobs WHERE status = ? AND id > ?"
+                    " ORDER BY id LIMIT 500", (DONE, last_id)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield json.loads(row['result'])
+            last_id = rows[-1]['id']
+
+
+class RemoteQueue:
+    """
+    通过HTTP访问其他节点上 serve 子命令提供的队列，方法与WorkQueue相同
+
+    参数:
+        url (str): 队列服务地址，如 http://queue-host:8765
+        token (str, optional): 访问令牌，与服务端的queue.token一致
+    """
+
+    def __init__(self, url, token=None):
+        self.url = url.rstrip('/')
+        self._session = requests.Session()
+        if token:
+            self._session.headers['Authorization'] = f"Bearer {token}"
+
+    def close(self):
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _call(self, method, **kwargs):
+        response = self._session.post(f"{self.url}/{method}",
+                                      json=kwargs,
+                                      timeout=(5, 60))
+        response.raise_for_status()
+        return response.json()["result"]
+
+    def add(self, titles):
+        added = 0
+        titles = iter(titles)
+        while True:
+            chunk = list(itertools.islice(titles, ADD_CHUNK))
+            if not chunk:
+                return added
+            added += self._call("add", titles=chunk)
+
+    def claim(self, worker, count=1):
+        return self._call("claim", worker=worker, count=count)
+
+    def extend(self, worker, ids):
+        return self._call("extend", worker=worker, ids=ids)
+
+    def complete(self, worker, job_id, result):
+        return self._call("complete",
+                          worker=worker,
+                          job_id=job_id,
+                          result=result)
+
+    def fail(self, worker, job_id, error):
+        return self._call("fail", worker=worker, job_id=job_id, error=error)
+
+    def release(self, worker):
+        return self._call("release", worker=worker)
+
+    def retry_failed(self):
+        return self._call("retry_failed")
+
+    def stats(self):
+        return self._call("stats")
+
+
+def open_queue(location=None, config=None):
+    """
+    打开配置中指定的队列
+
+    参数:
+        location (str, optional): 数据库路径或 http:// 开头的队列服务地址，
+            为None时使用配置中的queue.path
+        config (dict, optional): 配置字典，为None时加载默认配置
+
+    返回:
+        WorkQueue 或 RemoteQueue: 队列对象
+    """
+    if config is None:
+        config = load_config()
+    queue_config = config.get("queue", {})
+    location = location or queue_config.get("path", "work_queue.db")
+    if location.startswith(("http://", "https://")):
+        return RemoteQueue(location, queue_config.get("token"))
+    if not os.path.isabs(location):
+        location = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                location)
+    return WorkQueue(location,
+                     lease_seconds=queue_config.get("lease_seconds", 300),
+                     max_attempts=queue_config.get("max_attempts", 3))
+
+
+class _QueueRequestHandler(BaseHTTPRequestHandler):
+    """
+    队列服务的HTTP接口：POST /<方法名>，请求体为JSON参数，响应为 {"result": ...}
+    """
+
+    queue = None
+    token = None
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') in ('', '/stats'):
+            self.path = '/stats'
+            self.do_POST()
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.token and (self.headers.get('Authorization')
+                           != f"Bearer {self.token}"):
+            self._send_json(401, {"error": "unauthorized"})
+            return
+        method = self.path.strip('/')
+        if method not in REMOTE_METHODS:
+            self._send_json(404, {"error": f"unknown method: {method}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            kwargs = json.loads(self.rfile.read(length) or b'{}')
+            result = getattr(self.queue, method)(**kwargs)
+        except (TypeError, ValueError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except sqlite3.Error as e:
+            logger.warning("队列操作 %s 出错: %s", method, e)
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, {"result": result})
+
+
+def serve(queue, host, port, token=None):
+    """
+    通过HTTP提供队列服务，供其他节点上的工作进程使用
+    """
+    handler = type("QueueRequestHandler", (_QueueRequestHandler, ), {
+        "queue": queue,
+        "token": token
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    logger.info("队列服务已启动: http://%s:%d（%s）", host, port, queue.path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def _iter_claimed(queue, worker, held):
+    """
+    逐个领取游戏名直到队列中没有可领取的游戏名，held记录已领取未提交的 {游戏名: id}
+    """
+    while True:
+        claimed = queue.claim(worker, 1)
+        if not claimed:
+            return
+        job = claimed[0]
+        held[job["title"]] = job["id"]
+        yield job["title"]
+
+
+def run_worker(queue,
+               worker,
+               method='original',
+               workers=4,
+               timeout=None,
+               window=None,
+               store=None,
+               follow=False,
+               poll_seconds=10,
+               renew_seconds=60):
+    """
+    从队列中领取游戏名并查询，结果写回队列
+
+    领取是按需进行的，持有的游戏名不超过window个；后台线程定期为持有的游戏名续约。
+    队列暂时为空时，follow为True则等待新的游戏名，否则结束
+
+    参数:
+        queue (WorkQueue 或 RemoteQueue): 队列
+        worker (str): 工作进程名称
+        method (str, optional): 获取详情的方法，original、llm 或 multi
+        workers (int, optional): 并发线程数
+        timeout (float, optional): 每个游戏的查询时限（秒）
+        window (int, optional): 最多同时持有的游戏名数，默认为workers的4倍
+        store (GameStore, optional): 同时将结果写入本地数据库
+        follow (bool, optional): 队列为空时是否继续等待
+        poll_seconds (float, optional): 等待新游戏名时的轮询间隔
+        renew_seconds (float, optional): 续约间隔，应明显短于queue.lease_seconds
+
+    返回:
+        dict: 本进程完成和失败的数量
+    """
+    from batch import iter_batch
+    from game_record import is_partial
+
+    held = {}
+    counts = {DONE: 0, FAILED: 0}
+    stopped = threading.Event()
+
+    def renew():
+        while not stopped.wait(renew_seconds):
+            ids = list(held.values())
+            if not ids:
+                continue
+            try:
+                queue.extend(worker, ids)
+            except (requests.RequestException, sqlite3.Error) as e:
+                logger.warning("续约失败: %s", e)
+
+    renewer = threading.Thread(target=renew, name="queue-renew", daemon=True)
+    renewer.start()
+    logger.info("工作进程 %s 开始领取游戏名", worker)
+    try:
+        while True:
+            for title, details in iter_batch(_iter_claimed(queue, worker, held),
+                                             method,
+                                             workers,
+                                             timeout=timeout,
+                                             window=window):
+                job_id = held.pop(title)
+                if details and not is_partial(details):
+                    queue.complete(worker, job_id, details)
+                    if store is not None:
+                        store.upsert(details)
+                    counts[DONE] += 1
+                    continue
+                if details:
+                    error = f"查询超时（{details['timeout_stage']}阶段）"
+                else:
+                    error = "查询失败"
+                if queue.fail(worker, job_id, error) == FAILED:
+                    logger.warning("%s: %s，已达到最大次数", title, error)
+                counts[FAILED] += 1
+            if not follow:
+                break
+            logger.debug("队列暂时为空，%g秒后重试", poll_seconds)
+            time.sleep(poll_seconds)
+    finally:
+        stopped.set()
+        held.clear()
+        with contextlib.suppress(requests.RequestException, sqlite3.Error):
+            released = queue.release(worker)
+            if released:
+                logger.info("已归还 %d 个未完成的游戏名", released)
+    logger.info("工作进程 %s 结束: 完成 %d 个，失败 %d 个", worker, counts[DONE],
+                counts[FAILED])
+    return counts
+
+
+def format_stats(stats, rate=None):
+    """
+    将队列进度格式化为便于阅读的文本
+    """
+    total = stats["total"] or 1
+    lines = [
+        f"共 {stats['total']} 个: 完成 {stats['done']}（{stats['done'] / total:.1%}），"
+        f"进行中 {stats['leased']}（租约过期 {stats['expired']}），"
+        f"等待 {stats['pending']}，失败 {stats['failed']}"
+    ]
+    if rate:
+        remaining = stats['pending'] + stats['leased']
+        lines.append(f"速度 {rate * 60:.1f} 个/分钟，预计剩余 "
+                     f"{remaining / rate / 60:.0f} 分钟")
+    for worker in stats["workers"]:
+        lines.append(f"  {worker['name']}: 完成 {worker['done']}，"
+                     f"持有 {worker['leased']}，"
+                     f"{worker['idle_seconds']:g}秒前活动")
+    return "\n".join(lines)
+
+
+def export(queue, output=None, db=None, config=None):
+    """
+    将已完成的查询结果写入JSONL文件和（或）SQLite数据库
+
+    返回:
+        int: 导出的结果数
+    """
+    from batch import RecordWriter
+    from store import open_store
+
+    store = open_store(db, config) if db else None
+    try:
+        if not output:
+            return store.upsert_many(queue.results())
+        count = 0
+        with RecordWriter(output, store) as writer:
+            for record in queue.results():
+                writer.write(record)
+                count += 1
+        return count
+    finally:
+        if store is not None:
+            store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分布式查询队列')
+    parser.add_argument('--queue',
+                        help='队列数据库路径或队列服务地址（默认使用queue.path）')
+    parser.add_argument('--debug', action='store_true', help='输出调试日志')
+    parser.add_argument('--log-format',
+                        choices=['text', 'json'],
+                        help='日志格式（默认使用logging.format），日志输出到标准错误')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    add_parser = subparsers.add_parser('add', help='添加游戏名')
+    add_parser.add_argument('input', help='游戏名列表文件，每行一个中文游戏名')
+
+    serve_parser = subparsers.add_parser('serve', help='通过HTTP向其他节点提供队列')
+    serve_parser.add_argument('--host', default='0.0.0.0', help='监听地址')
+    serve_parser.add_argument('--port', type=int, default=8765, help='监听端口')
+
+    work_parser = subparsers.add_parser('work', help='领取游戏名并查询')
+    work_parser.add_argument('--name', help='工作进程名称（默认为主机名-进程号）')
+    work_parser.add_argument('--method',
+                             choices=['original', 'llm', 'multi'],
+                             default='original',
+                             help='获取游戏详情的方法')
+    work_parser.add_argument('--workers', type=int, help='并发线程数')
+    work_parser.add_argument('--window', type=int, help='最多同时持有的游戏名数')
+    work_parser.add_argument('--timeout',
+                             type=parse_duration,
+                             help='每个游戏的查询时限，如 8s、500ms')
+    work_parser.add_argument('--db', help='同时将结果保存到本地SQLite数据库')
+    work_parser.add_argument('--follow',
+                             action='store_true',
+                             help='队列为空时继续等待新的游戏名')
+
+    status_parser = subparsers.add_parser('status', help='查看队列进度')
+    status_parser.add_argument('--watch',
+                               type=parse_duration,
+                               help='每隔一段时间刷新一次，如 30s')
+    status_parser.add_argument('--json', action='store_true', help='输出JSON')
+
+    subparsers.add_parser('retry', help='将失败的游戏名放回队列')
+
+    export_parser = subparsers.add_parser('export', help='导出已完成的查询结果')
+    export_parser.add_argument('-o', '--output', help='输出JSONL文件')
+    export_parser.add_argument('--db', help='写入SQLite数据库')
+
+    args = parser.parse_args()
+    config = load_config()
+    setup_logging(args.debug, args.log_format, config)
+    queue_config = config.get("queue", {})
+
+    with open_queue(args.queue, config) as queue:
+        if args.command == 'add':
+            with open(args.input, 'r', encoding='utf-8') as f:
+                added = queue.add(line.strip() for line in f if line.strip())
+            print(f"已添加 {added} 个游戏名，队列共 {queue.stats()['total']} 个")
+        elif args.command == 'serve':
+            if not isinstance(queue, WorkQueue):
+                parser.error("serve 需要本地队列数据库")
+            serve(queue, args.host, args.port, queue_config.get("token"))
+        elif args.command == 'work':
+            from store import open_store
+            name = args.name or f"{socket.gethostname()}-{os.getpid()}"
+            store = open_store(args.db, config) if args.db else None
+            try:
+                counts = run_worker(
+                    queue,
+                    name,
+                    method=args.method,
+                    workers=args.workers
+                    or config.get("batch", {}).get("workers", 4),
+                    timeout=args.timeout,
+                    window=args.window,
+                    store=store,
+                    follow=args.follow,
+                    poll_seconds=queue_config.get("poll_seconds", 10),
+                    renew_seconds=queue_config.get("lease_seconds", 300) / 3)
+            finally:
+                if store is not None:
+                    store.close()
+            if counts[FAILED]:
+                sys.exit(1)
+        elif args.command == 'status':
+            previous = None
+            while True:
+                stats = queue.stats()
+                now = time.monotonic()
+                if args.json:
+                    print(json.dumps(stats, ensure_ascii=False), flush=True)
+                else:
+                    rate = None
+                    if previous:
+                        rate = (stats['done'] - previous[1]) / (now - previous[0])
+                    print(format_stats(stats, rate), flush=True)
+                if not args.watch:
+                    break
+                previous = (now, stats['done'])
+                time.sleep(args.watch)
+                print(flush=True)
+        elif args.command == 'retry':
+            print(f"已将 {queue.retry_failed()} 个失败的游戏名放回队列")
+        else:
+            if not isinstance(queue, WorkQueue):
+                parser.error("export 需要本地队列数据库")
+            if not args.output and not args.db:
+                parser.error("需要指定 -o 或 --db")
+            count = export(queue, args.output, args.db, config)
+            print(f"已导出 {count} 条查询结果")
+
+
+if __name__ == '__main__':
+    main()